@@ -0,0 +1,48 @@
+""" Microbenchmark of the per message dispatch cost of the service loop """
+
+import timeit
+from service_framework.utils import handler_utils, logging_utils, service_utils
+
+
+def on_new_request(args, to_send, config):
+    """
+    Connection function doing no work, so only the dispatch cost is measured.
+    """
+    return args
+
+
+def get_item():
+    """
+    Get a replyer like polling list item (without a socket).
+    """
+    return {
+        'args_validator': lambda args: None,
+        'connection_function': None,
+        'model_function': on_new_request,
+        'return_validator': lambda return_args: None,
+        'return_function': lambda return_payload: None,
+    }
+
+
+def main(number=200000):
+    """
+    Compare "run_triggered_functions" with the compiled handler.
+    number::int Number of messages dispatched by each
+    """
+    logging_utils.setup_package_logger(console_loglevel='WARNING')
+    payload = {'args': {'to_echo': 'Hello!'}, 'workflow_id': 'workflow_id'}
+    item = get_item()
+    handler = handler_utils.get_handler(item, {}, {}, {})
+
+    run_triggered_functions_s = timeit.timeit(
+        lambda: service_utils.run_triggered_functions(item, payload, {}, {}, {}),
+        number=number
+    )
+    handler_s = timeit.timeit(lambda: handler.handle(payload), number=number)
+
+    print('run_triggered_functions: {:.2f} us/message'.format(1e6 * run_triggered_functions_s / number))
+    print('{}.handle: {:.2f} us/message'.format(type(handler).__name__, 1e6 * handler_s / number))
+
+
+if __name__ == '__main__':
+    main()
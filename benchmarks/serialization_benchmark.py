@@ -0,0 +1,71 @@
+""" Microbenchmark of packing and unpacking payloads of each size """
+
+import os
+import timeit
+from msgpack import packb, unpackb
+import numpy
+from service_framework.utils import msgpack_utils
+
+PAYLOAD_SIZES = (100, 10000, 1000000, 10000000)
+
+
+def get_payload(size, blob):
+    """
+    Get a payload like the ones sent by connections.
+    size::int Bytes of data in the payload
+    blob::bytes or numpy.ndarray The data of payloads over 100 bytes
+    return::{}
+    """
+    if size <= 100:
+        return {
+            'args': {'to_echo': 'Hello!', 'count': 12, 'price': 1.5, 'tags': ['a', 'b']},
+            'workflow_id': 'c5bd2e51-4e4c-4a4b-9f36-2a0c3f1b9a1e',
+        }
+
+    return {
+        'args': {'data': blob, 'count': 12},
+        'workflow_id': 'c5bd2e51-4e4c-4a4b-9f36-2a0c3f1b9a1e',
+    }
+
+
+def time_us(func, size):
+    """
+    func::def()
+    size::int Bytes of data in the payload (Bigger payloads are timed less)
+    return::float Microseconds per call
+    """
+    number = max(20, 10000000 // (size * 10))
+    return 1e6 * timeit.timeit(func, number=number) / number
+
+
+def main():
+    """
+    Compare a new packer (and unpacker) for each message with the reused
+    packers of "msg_pack", and with "msg_pack_frames" for numpy arrays.
+    Received messages are unpacked from a memoryview, like a zmq.Frame's buffer.
+    """
+    print('{:>10} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+        'bytes', 'packb', 'msg_pack', 'unpackb', 'msg_unpack', 'ndarray frames'
+    ))
+
+    for size in PAYLOAD_SIZES:
+        payload = get_payload(size, os.urandom(size))
+        packed = memoryview(msgpack_utils.msg_pack(payload))
+        array_payload = get_payload(size, numpy.frombuffer(os.urandom(size), 'uint8'))
+
+        def pack_and_unpack_frames(array_payload=array_payload):
+            frames = msgpack_utils.msg_pack_frames(array_payload)
+            return msgpack_utils.msg_unpack_frames(frames)
+
+        print('{:>10} {:>10.2f}us {:>10.2f}us {:>10.2f}us {:>10.2f}us {:>10.2f}us'.format(
+            size,
+            time_us(lambda: packb(payload, default=msgpack_utils.custom_encode, use_bin_type=True), size),
+            time_us(lambda: msgpack_utils.msg_pack(payload), size),
+            time_us(lambda: unpackb(packed, ext_hook=msgpack_utils.ext_decode, raw=False), size),
+            time_us(lambda: msgpack_utils.msg_unpack(packed), size),
+            time_us(pack_and_unpack_frames, size),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -30,7 +30,17 @@ def main():
         log_path=args.log_path,
         file_loglevel=args.file_loglevel,
         backup_count=args.backup_count,
-        service_loop_min_wait_time_s=args.service_loop_min_wait_time_s
+        async_logging=args.async_logging,
+        log_workflow_sample_rate=args.log_workflow_sample_rate,
+        log_rate_limit_per_s=args.log_rate_limit_per_s,
+        log_format=args.log_format,
+        service_loop_min_wait_time_s=args.service_loop_min_wait_time_s,
+        service_loop_wait_strategy=args.service_loop_wait_strategy,
+        service_loop_engine=args.service_loop_engine,
+        service_loop_num_worker_threads=args.service_loop_num_worker_threads,
+        service_loop_earliest_deadline_first=args.service_loop_earliest_deadline_first,
+        service_loop_stall_threshold_s=args.service_loop_stall_threshold_s,
+        num_worker_processes=args.num_worker_processes
     )
 
     if args.main_mode:
@@ -56,6 +66,33 @@ def get_arguments():
     parser.add_argument('-bc', '--backup_count', default=24, help='Num of hourly file backups')
     parser.add_argument('-f', '--file_loglevel', default='INFO', help='See name')
     parser.add_argument('-l', '--log_path', default=None, help='Log file path')
+    parser.add_argument(
+        '-al',
+        '--async_logging',
+        action='store_true',
+        help='Write logs on a background thread'
+    )
+    parser.add_argument(
+        '-ls',
+        '--log_workflow_sample_rate',
+        default=1,
+        type=int,
+        help='Only log (below WARNING) 1 in this many workflows'
+    )
+    parser.add_argument(
+        '-lr',
+        '--log_rate_limit_per_s',
+        default=None,
+        type=float,
+        help='Max logs (below WARNING) per second from each line of code'
+    )
+    parser.add_argument(
+        '-lf',
+        '--log_format',
+        default='text',
+        choices=('text', 'json', 'msgpack'),
+        help='Format of the logs, or one structured record per line'
+    )
     parser.add_argument(
         '-wt',
         '--service_loop_min_wait_time_s',
@@ -63,6 +100,48 @@ def get_arguments():
         type=float,
         help='Min wait time between each service loop'
     )
+    parser.add_argument(
+        '-ws',
+        '--service_loop_wait_strategy',
+        default='block',
+        choices=['spin', 'block', 'adaptive'],
+        help='How the service loop waits for new messages'
+    )
+    parser.add_argument(
+        '-e',
+        '--service_loop_engine',
+        default='sync',
+        choices=['sync', 'asyncio', 'threads', 'pipelined'],
+        help='Run the service loop by polling, on an asyncio event loop, with a thread pool '
+        'or with one handler thread'
+    )
+    parser.add_argument(
+        '-nw',
+        '--service_loop_num_worker_threads',
+        default=4,
+        type=int,
+        help='Number of threads running model functions with the "threads" engine'
+    )
+    parser.add_argument(
+        '-edf',
+        '--service_loop_earliest_deadline_first',
+        action='store_true',
+        help='Handle the messages received each loop by deadline instead of by connection'
+    )
+    parser.add_argument(
+        '-st',
+        '--service_loop_stall_threshold_s',
+        default=None,
+        type=float,
+        help='Log the stack of the service loop when handling a message takes longer than this'
+    )
+    parser.add_argument(
+        '-np',
+        '--num_worker_processes',
+        default=1,
+        type=int,
+        help='Number of processes to run the service on behind its addresses'
+    )
 
     args, unknown_args = parser.parse_known_args()
     print('Using Arguments:', args)
@@ -3,9 +3,21 @@
 from logging import getLogger
 import zmq
 
-from service_framework.utils.connection_utils import BaseConnection
-from service_framework.utils.msgpack_utils import msg_pack, msg_unpack
-from service_framework.utils.socket_utils import get_replyer_socket
+from service_framework.utils.connection_utils import (
+    BaseConnection,
+    BATCH_CREATION_ARGUMENTS,
+    POLLING_CREATION_ARGUMENTS,
+    get_batch_options,
+    get_polling_options
+)
+from service_framework.utils import logging_utils
+from service_framework.utils.codec_utils import (
+    decode_payload,
+    encode_payload,
+    get_codec_name,
+    get_compact_schemas
+)
+from service_framework.utils.socket_utils import get_router_socket, get_worker_socket
 
 LOG = getLogger(__name__)
 
@@ -22,6 +34,8 @@ class Replyer(BaseConnection):
         self.context = None
 
         self.on_new_req = model['required_creation_arguments']['connection_function']
+        self.codec_name = get_codec_name(model)
+        self.compact_schemas = get_compact_schemas(model)
         self.socket = None
 
     def __del__(self):
@@ -35,6 +49,7 @@ class Replyer(BaseConnection):
         provided addresses and throw an error if any are missing.
         As well as automatically generate documentation.
         NOTE: types must always be "str"
+        The "worker_backend" address is set by the worker pool for its workers.
         return = {
             'required_addresses': {
                 'req_address_name_1': str,
@@ -48,7 +63,7 @@ class Replyer(BaseConnection):
         """
         return {
             'required_addresses': {'replyer': str},
-            'optional_addresses': {},
+            'optional_addresses': {'worker_backend': str},
         }
 
     @staticmethod
@@ -96,6 +111,10 @@ class Replyer(BaseConnection):
             'optional_creation_arguments': {
                 'topic': str,
                 'is_x_pub': bool,
+                'codec': str,
+                'compact_args': bool,
+                **POLLING_CREATION_ARGUMENTS,
+                **BATCH_CREATION_ARGUMENTS,
             },
         }
 
@@ -105,22 +124,32 @@ class Replyer(BaseConnection):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([zmq.Frame]) -> payload,
+            'zero_copy': bool,
+            'max_messages_per_poll': int,
+            'priority': int,
+            'weight': float,
+            'batch_model_function': def(args_list, to_send, config) or None,
+            'max_batch_size': int,
+            'max_batch_wait_us': int,
             'arg_validator': def(args),
             'connection_function': def(args) -> args or None,
             'model_function': def(args, to_send, conifg) -> return_args or None,
             'return_validator': def(return_args)
-            'return_function': def(return_args),
+            'return_function': def(return_payload, socket=None),
         }]
         """
         return [{
             'inbound_socket': self.socket,
             'decode_message': self.decode_message,
+            'zero_copy': True,
             'args_validator': self.args_validator,
             'connection_function': None,
             'model_function': self.on_new_req,
             'return_validator': self.return_validator,
             'return_function': self.return_to_requester,
+            **get_polling_options(self.model),
+            **get_batch_options(self.model),
         }]
 
     def runtime_setup(self):
@@ -130,23 +159,56 @@ class Replyer(BaseConnection):
         """
         self.context = zmq.Context()
 
-        self.socket = get_replyer_socket(
+        if 'worker_backend' in self.addresses:
+            self.socket = get_worker_socket(self.addresses['worker_backend'], self.context)
+            return
+
+        self.socket = get_router_socket(
             self.addresses['replyer'],
             self.context
         )
 
-    @staticmethod
-    def decode_message(binary_message):
+    def decode_message(self, frames):
         """
-        Method used to take the obtained binary message from req socket and
-        convert it into a payload.
+        Method used to take the obtained frames from the router socket and
+        convert them into a payload. The routing envelope (every frame before
+        the empty delimiter) is kept on the payload so the reply can be routed
+        back to the right requester, even if replies are sent out of order.
+        Messages without the delimiter (ex. from a raw dealer) are dropped.
+        frames::[zmq.Frame] ex. [requester_identity, b'', *codec_frames]
+        return::{} The payload or None if the message is malformed
         """
-        return msg_unpack(binary_message)
+        delimiter_idx = next((idx for idx, frame in enumerate(frames) if not len(frame)), None)
 
-    def return_to_requester(self, payload):
+        if delimiter_idx is None:
+            LOG.error('Dropping message without an envelope delimiter: %s', frames)
+            return None
+
+        payload = decode_payload(
+            frames[delimiter_idx + 1:],
+            self.codec_name,
+            self.compact_schemas
+        )
+        payload['envelope'] = frames[:delimiter_idx]
+        return payload
+
+    def return_to_requester(self, payload, socket=None):
         """
         This method is passed with the socket for when a new message is recieved
         for the replyer socket.
+        payload = {
+            'return_args': {},
+            'workflow_id': str,
+            'envelope': [bytes],
+        }
+        socket::zmq.Context.Socket Socket to reply on (Defaults to the replyer's socket)
+        return::The result of the socket's send (A future if an asyncio socket)
         """
-        LOG.debug('Sending Return Payload...')
-        self.socket.send(msg_pack(payload))
+        if logging_utils.DEBUG_ENABLED:
+            LOG.debug('Sending Return Payload...')
+        envelope = payload.pop('envelope')
+        socket = socket if socket is not None else self.socket
+        return socket.send_multipart(
+            envelope + [b''] + encode_payload(payload, self.codec_name, self.compact_schemas),
+            copy=False
+        )
@@ -3,9 +3,16 @@
 from logging import getLogger
 import zmq
 
-from service_framework.utils.msgpack_utils import msg_pack, msg_unpack
+from service_framework.utils.codec_utils import decode_payload, get_codec_name, get_compact_schemas
+from service_framework.utils.msgpack_utils import msg_pack
 from service_framework.utils.socket_utils import get_subscriber_socket
-from service_framework.utils.connection_utils import BaseConnection
+from service_framework.utils.connection_utils import (
+    BaseConnection,
+    BATCH_CREATION_ARGUMENTS,
+    POLLING_CREATION_ARGUMENTS,
+    get_batch_options,
+    get_polling_options
+)
 
 LOG = getLogger(__name__)
 
@@ -20,6 +27,8 @@ class Subscriber(BaseConnection):
         self.connection_addressses = connection_addresses
         self.context = None
         self.model = model
+        self.codec_name = get_codec_name(model)
+        self.compact_schemas = get_compact_schemas(model)
         self.socket = None
 
     def __del__(self):
@@ -111,7 +120,11 @@ class Subscriber(BaseConnection):
             },
             'optional_creation_arguments': {
                 'is_binder': bool,
-                'topic': str
+                'topic': str,
+                'codec': str,
+                'compact_args': bool,
+                **POLLING_CREATION_ARGUMENTS,
+                **BATCH_CREATION_ARGUMENTS,
             },
         }
 
@@ -121,7 +134,14 @@ class Subscriber(BaseConnection):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([zmq.Frame]) -> payload,
+            'zero_copy': bool,
+            'max_messages_per_poll': int,
+            'priority': int,
+            'weight': float,
+            'batch_model_function': def(args_list, to_send, config) or None,
+            'max_batch_size': int,
+            'max_batch_wait_us': int,
             'args_validator': def(args),
 
             'connection_function': def(args) -> args or None,
@@ -134,11 +154,14 @@ class Subscriber(BaseConnection):
         return [{
             'inbound_socket': self.socket,
             'decode_message': self._decode_message,
+            'zero_copy': True,
             'args_validator': self.args_validator,
             'connection_function': None,
             'model_function': self.model['required_creation_arguments']['connection_function'],
             'return_validator': None,
             'return_function': None,
+            **get_polling_options(self.model),
+            **get_batch_options(self.model),
         }]
 
     def runtime_setup(self):
@@ -154,21 +177,22 @@ class Subscriber(BaseConnection):
             self.model
         )
 
-    def _decode_message(self, binary_message):
+    def _decode_message(self, frames):
         """
-        this method is needed to take the binary message from the inbound
-        socket and convert it into a payload for the service framework to
+        this method is needed to take the frames from the inbound
+        socket and convert them into a payload for the service framework to
         then handle.
+        frames::[zmq.Frame] The codec's frames (The first after the topic)
         """
         opt_args = self.model.get('optional_creation_arguments', {})
         topic = opt_args.get('topic', '')
-        topic_bytes = msg_pack(topic)
 
         if topic:
-            msg_only = binary_message[len(topic_bytes):]
-            return msg_unpack(msg_only)
+            binary_message = getattr(frames[0], 'buffer', frames[0])
+            msg_only = binary_message[len(msg_pack(topic)):]
+            return decode_payload([msg_only] + frames[1:], self.codec_name, self.compact_schemas)
 
-        return msg_unpack(binary_message)
+        return decode_payload(frames, self.codec_name, self.compact_schemas)
 
     @staticmethod
     def _setup_subscriber_socket(address, context, model):
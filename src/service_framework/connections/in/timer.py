@@ -0,0 +1,370 @@
+""" File to house a Timer Connection """
+
+from datetime import datetime, timedelta
+from logging import getLogger
+import math
+import time
+import uuid
+import zmq
+
+from service_framework.utils.connection_utils import (
+    BaseConnection,
+    POLLING_CREATION_ARGUMENTS,
+    get_connection_args_validator,
+    get_polling_options
+)
+from service_framework.utils.msgpack_utils import msg_pack, msg_unpack_frames
+
+LOG = getLogger(__name__)
+
+TICK_ARGUMENTS = {
+    'scheduled_time': float,
+    'fire_time': float,
+}
+# (Min, Max) of each cron field: minute, hour, day of month, month, day of week
+CRON_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+MAX_CRON_SEARCH_DAYS = 5 * 366
+
+
+class Timer(BaseConnection):
+    """
+    Inbound connection that calls its connection function on a fixed interval
+    or on a cron schedule. Each fire sends a tick on an inproc socket that's
+    polled with the service's other inbound sockets, so timed and message
+    driven work share the service loop's thread. The service loop shortens
+    its poll timeout to the next fire, so no extra thread is used.
+    """
+    def __init__(self, model, addresses):
+        super().__init__(model, addresses)
+        self.addresses = addresses
+        self.model = model
+        self.context = None
+        self.socket = None
+        self.tick_socket = None
+
+        self.on_tick = model['required_creation_arguments']['connection_function']
+        self.args_validator = get_connection_args_validator({'required_arguments': TICK_ARGUMENTS})
+
+        opt_args = model.get('optional_creation_arguments', {})
+        self.interval_s = opt_args.get('interval_s')
+        self.cron_fields = parse_cron(opt_args['cron']) if 'cron' in opt_args else None
+        self.fire_on_start = opt_args.get('fire_on_start', False)
+        self._validate_schedule()
+
+        self.next_fire_time = None
+        self.next_scheduled_time = None
+        self.is_tick_pending = False
+
+    def __del__(self):
+        if getattr(self, 'socket', None) is not None:
+            self.socket.close()
+        if getattr(self, 'tick_socket', None) is not None:
+            self.tick_socket.close()
+
+    @staticmethod
+    def get_addresses_model():
+        """
+        This is needed so the BaseConnector can validate the
+        provided addresses and throw an error if any are missing.
+        As well as automatically generate documentation.
+        NOTE: types must always be "str"
+        return = {
+            'required_addresses': {
+                'req_address_name_1': str,
+                'req_address_name_2': str,
+            },
+            'optional_addresses': {
+                'opt_address_name_1': str,
+                'opt_address_name_2': str,
+            },
+        }
+        """
+        return {
+            'required_addresses': {},
+            'optional_addresses': {},
+        }
+
+    @staticmethod
+    def get_connection_arguments_model():
+        """
+        This is needed so the BaseConnection can validate the provided
+        model explicitly state the arguments to be passed on each
+        send message.
+        return = {
+            'required_connection_arguments': {
+                'required_connection_arg_1': type,
+                'required_connection_arg_2': type,
+            },
+            'optional_connection_arguments': {
+                'optional_connection_arg_1': type,
+                'optional_connection_arg_2': type,
+            },
+        }
+        """
+        return {
+            'required_connection_arguments': {},
+            'optional_connection_arguments': {},
+        }
+
+    @staticmethod
+    def get_creation_arguments_model():
+        """
+        This is needed so the BaseConnection can validate the provided
+        creation arguments as well as for auto documentation.
+        return = {
+            'required_creation_arguments': {
+                'required_creation_arg_1': type,
+                'required_creation_arg_2': type,
+            },
+            'optional_creation_arguments': {
+                'optional_creation_arg_1': type,
+                'optional_creation_arg_2': type,
+            },
+        }
+        """
+        return {
+            'required_creation_arguments': {
+                'connection_function': lambda args, to_send, config: True,
+            },
+            'optional_creation_arguments': {
+                'interval_s': (int, float),
+                'cron': str,
+                'fire_on_start': bool,
+                **POLLING_CREATION_ARGUMENTS,
+            },
+        }
+
+    def get_inbound_sockets_and_triggered_functions(self):
+        """
+        Method needed so the service framework knows which sockets to listen
+        for new messages and what functions to call when a message appears.
+        return [{
+            'inbound_socket': zmq.Context.Socket,
+            'decode_message': def([zmq.Frame]) -> payload,
+            'zero_copy': bool,
+            'timer_function': def(now) -> timeout_ms,
+            'max_messages_per_poll': int,
+            'priority': int,
+            'weight': float,
+            'arg_validator': def(args),
+            'connection_function': def(args) -> args or None,
+            'model_function': def(args, to_send, conifg) -> return_args or None,
+            'return_validator': def(return_args)
+            'return_function': def(return_payload),
+        }]
+        """
+        return [{
+            'inbound_socket': self.socket,
+            'decode_message': self.decode_message,
+            'zero_copy': True,
+            'timer_function': self.fire_due_tick,
+            'args_validator': self.args_validator,
+            'connection_function': None,
+            'model_function': self.on_tick,
+            'return_validator': None,
+            'return_function': None,
+            **get_polling_options(self.model),
+        }]
+
+    def runtime_setup(self):
+        """
+        Method called directly after instantiation to conduct all
+        runtime required setup. I.E. Setting up a zmq.Context().
+        """
+        self.context = zmq.Context()
+        address = 'inproc://timer_{}'.format(uuid.uuid4())
+
+        self.socket = self.context.socket(zmq.PAIR)
+        self.socket.bind(address)
+        self.tick_socket = self.context.socket(zmq.PAIR)
+        self.tick_socket.connect(address)
+
+        self._schedule_first_fire(time.monotonic())
+
+    def fire_due_tick(self, now):
+        """
+        Called by the service loop before each poll. Sends a tick if the
+        next fire is due, then schedules the one after it. Fires are
+        scheduled from the previous scheduled time (not from when it was
+        handled) so the timer doesn't drift. Fires missed while the service
+        was busy (or while the last tick wasn't handled yet) are skipped.
+        now::float time.monotonic()
+        return::int Time until the next fire (ms)
+        """
+        if now >= self.next_fire_time:
+            if self.is_tick_pending:
+                LOG.debug('Skipping timer fire, last tick not handled yet')
+            else:
+                self.is_tick_pending = True
+                self.tick_socket.send(msg_pack(self.next_scheduled_time))
+
+            self._schedule_next_fire(now)
+
+        return max(0, math.ceil((self.next_fire_time - now) * 1000))
+
+    def decode_message(self, frames):
+        """
+        Method used to take a tick from the inbound socket and convert it
+        into a payload. Each fire gets a new workflow id.
+        frames::[zmq.Frame]
+        return::{}
+        """
+        self.is_tick_pending = False
+
+        return {
+            'args': {
+                'scheduled_time': msg_unpack_frames(frames),
+                'fire_time': time.time(),
+            },
+            'workflow_id': str(uuid.uuid4()),
+        }
+
+    def _schedule_first_fire(self, now):
+        """
+        now::float time.monotonic()
+        """
+        wall_now = time.time()
+
+        if self.fire_on_start:
+            self.next_scheduled_time = wall_now
+        elif self.cron_fields is not None:
+            self.next_scheduled_time = get_next_cron_time(self.cron_fields, wall_now)
+        else:
+            self.next_scheduled_time = wall_now + self.interval_s
+
+        self.next_fire_time = now + self.next_scheduled_time - wall_now
+
+    def _schedule_next_fire(self, now):
+        """
+        now::float time.monotonic()
+        """
+        if self.cron_fields is not None:
+            wall_now = time.time()
+            self.next_scheduled_time = get_next_cron_time(
+                self.cron_fields,
+                max(self.next_scheduled_time, wall_now)
+            )
+            self.next_fire_time = now + self.next_scheduled_time - wall_now
+            return
+
+        num_intervals = 1
+
+        if now - self.next_fire_time >= self.interval_s:
+            num_intervals += int((now - self.next_fire_time) // self.interval_s)
+            LOG.debug('Timer missed %s fires', num_intervals - 1)
+
+        self.next_fire_time += num_intervals * self.interval_s
+        self.next_scheduled_time += num_intervals * self.interval_s
+
+    def _validate_schedule(self):
+        """
+        Make sure the timer has one (valid) schedule.
+        """
+        if (self.interval_s is None) == (self.cron_fields is None):
+            err = 'Timer needs exactly one of "interval_s" or "cron", got model: {}'
+            err = err.format(self.model)
+            LOG.error(err)
+            raise ValueError(err)
+
+        if self.interval_s is not None and self.interval_s <= 0:
+            err = 'Timer "interval_s" must be positive, got "{}"!'.format(self.interval_s)
+            LOG.error(err)
+            raise ValueError(err)
+
+
+def parse_cron(cron):
+    """
+    Parse a cron schedule with the 5 standard fields (minute, hour, day of
+    month, month and day of week). Each field can be "*", a number, a range
+    "a-b", a step "*/n" or "a-b/n", or a comma separated list of them.
+    Days of week are 0-6 from Sunday (7 is also Sunday).
+    cron::str ex. "*/15 9-17 * * 1-5"
+    return::(set, set, set, set, set, bool) The allowed values of each field and
+        if both day fields are restricted (Then a day matching either is used)
+    """
+    fields = cron.split()
+
+    if len(fields) != len(CRON_FIELD_RANGES):
+        err = 'Cron "{}" needs {} fields!'.format(cron, len(CRON_FIELD_RANGES))
+        LOG.error(err)
+        raise ValueError(err)
+
+    allowed = []
+    for field, (min_value, max_value) in zip(fields, CRON_FIELD_RANGES):
+        max_value = 7 if max_value == 6 else max_value
+        values = set()
+
+        for part in field.split(','):
+            values |= parse_cron_part(part, min_value, max_value, cron)
+
+        allowed.append(values)
+
+    if 7 in allowed[4]:
+        allowed[4] = (allowed[4] - {7}) | {0}
+
+    is_either_day = fields[2] != '*' and fields[4] != '*'
+    return (*allowed, is_either_day)
+
+
+def parse_cron_part(part, min_value, max_value, cron):
+    """
+    part::str One comma separated part of a cron field ex. "1-5/2"
+    min_value::int
+    max_value::int
+    cron::str The whole cron schedule (For errors)
+    return::set The allowed values
+    """
+    try:
+        base, _, step = part.partition('/')
+        step = int(step) if step else 1
+
+        if base == '*':
+            start, end = min_value, max_value
+        elif '-' in base:
+            start, end = (int(value) for value in base.split('-'))
+        else:
+            start = end = int(base)
+
+    except ValueError:
+        start, end, step = None, None, None
+
+    if start is None or step < 1 or start < min_value or end > max_value or start > end:
+        err = 'Cron part "{}" of "{}" is invalid!'.format(part, cron)
+        LOG.error(err)
+        raise ValueError(err)
+
+    return set(range(start, end + 1, step))
+
+
+def get_next_cron_time(cron_fields, after_time):
+    """
+    Get the next time (in local time) matching the cron schedule.
+    cron_fields::tuple From "parse_cron"
+    after_time::float Epoch seconds the next time must be after
+    return::float Epoch seconds
+    """
+    minutes, hours, days, months, weekdays, is_either_day = cron_fields
+    current = datetime.fromtimestamp(after_time).replace(second=0, microsecond=0)
+    current += timedelta(minutes=1)
+    last = current + timedelta(days=MAX_CRON_SEARCH_DAYS)
+
+    while current < last:
+        is_day_of_month = current.day in days
+        is_day_of_week = (current.weekday() + 1) % 7 in weekdays
+        is_day = (
+            (is_day_of_month or is_day_of_week) if is_either_day
+            else (is_day_of_month and is_day_of_week)
+        )
+
+        if current.month not in months or not is_day:
+            current = current.replace(hour=0, minute=0) + timedelta(days=1)
+        elif current.hour not in hours:
+            current = current.replace(minute=0) + timedelta(hours=1)
+        elif current.minute not in minutes:
+            current += timedelta(minutes=1)
+        else:
+            return current.timestamp()
+
+    err = 'No time matches the cron schedule in the next {} days!'.format(MAX_CRON_SEARCH_DAYS)
+    LOG.error(err)
+    raise ValueError(err)
@@ -1,5 +1,6 @@
 """ File to house a connection that hits external services """
 
+import asyncio
 from logging import getLogger
 from service_framework.utils.connection_utils import BaseConnection
 
@@ -92,7 +93,7 @@ class ExternalRequest(BaseConnection):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([bytes]) -> payload,
             'arg_validator': def(args),
             'connection_function': def(args) -> args or None,
             'model_function': def(args, to_send, conifg) -> return_args or None,
@@ -109,3 +110,11 @@ class ExternalRequest(BaseConnection):
         """
         response = self.func_to_call(**payload['args'])
         return {'return_args': response}
+
+    async def send_async(self, payload):
+        """
+        External calls are usually blocking I/O, so they are run in the event
+        loop's default executor instead of on the event loop itself.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.send, payload)
@@ -1,10 +1,13 @@
 """ File to house the Publisher Connection """
 
 from logging import getLogger
+import threading
 import zmq
 
+from service_framework.utils import logging_utils
+from service_framework.utils.codec_utils import encode_payload, get_codec_name, get_compact_schemas
 from service_framework.utils.msgpack_utils import msg_pack
-from service_framework.utils.socket_utils import get_publisher_socket
+from service_framework.utils.socket_utils import ThreadSockets, get_publisher_socket
 from service_framework.utils.connection_utils import BaseConnection
 
 LOG = getLogger(__name__)
@@ -13,6 +16,9 @@ LOG = getLogger(__name__)
 class Publisher(BaseConnection):
     """
     This class is used to send a message to multiple subscribers.
+    A connecting (XPUB) publisher gives each thread sending its own socket.
+    A binding publisher can only have one socket, so sends from different
+    threads take turns on it. (A send only queues the message, so it's quick)
     """
     def __init__(self, model, connection_addresses):
         super().__init__(model, connection_addresses)
@@ -20,10 +26,16 @@ class Publisher(BaseConnection):
         self.context = None
         self.model = model
         self.topic = self._setup_topic(model)
+        self.codec_name = get_codec_name(model)
+        self.compact_schemas = get_compact_schemas(model)
+        self.thread_sockets = None
         self.socket = None
+        self.socket_lock = threading.Lock()
 
     def __del__(self):
-        if hasattr(self, 'socket') and self.socket:
+        if getattr(self, 'thread_sockets', None) is not None:
+            self.thread_sockets.close()
+        if getattr(self, 'socket', None) is not None:
             self.socket.close()
 
     @staticmethod
@@ -93,6 +105,8 @@ class Publisher(BaseConnection):
                 'topic': str,
                 'is_x_pub': bool,
                 'wait_after_creation_s': float,
+                'codec': str,
+                'compact_args': bool,
             },
         }
 
@@ -102,7 +116,7 @@ class Publisher(BaseConnection):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([bytes]) -> payload,
             'args_validator': def(args),
             'connection_function': def(args) -> args or None,
             'model_function': def(args, to_send, conifg) -> return_args or None,
@@ -118,31 +132,50 @@ class Publisher(BaseConnection):
         runtime required setup. I.E. Setting up a zmq.Context().
         """
         self.context = zmq.Context()
-
-        self.socket = self._setup_publisher_socket(
-            self.connection_addresses['publisher'],
-            self.context,
-            self.model
+        opt_args = self.model.get('optional_creation_arguments', {})
+
+        if not opt_args.get('is_x_pub', False):
+            self.socket = self._setup_publisher_socket(
+                self.connection_addresses['publisher'],
+                self.context,
+                self.model
+            )
+            return
+
+        self.thread_sockets = ThreadSockets(
+            lambda: self._setup_publisher_socket(
+                self.connection_addresses['publisher'],
+                self.context,
+                self.model
+            )
         )
+        self.thread_sockets.get()
 
     def send(self, payload):
         """
         Method needed for child connection classes to update.
         """
-        LOG.debug(
-            'Attempting to send connection payload "%s" to address "%s" w/ topic "%s"',
-            payload,
-            self.connection_addresses['publisher'],
-            self.topic
-        )
+        if logging_utils.DEBUG_ENABLED:
+            LOG.debug(
+                'Attempting to send connection payload "%s" to address "%s" w/ topic "%s"',
+                payload,
+                self.connection_addresses['publisher'],
+                self.topic
+            )
+
+        to_send = encode_payload(payload, self.codec_name, self.compact_schemas)
 
         if self.topic:
-            to_send = msg_pack(self.topic) + msg_pack(payload)
+            to_send[0] = msg_pack(self.topic) + to_send[0]
+
+        if self.thread_sockets is not None:
+            self.thread_sockets.get().send_multipart(to_send, copy=False)
         else:
-            to_send = msg_pack(payload)
+            with self.socket_lock:
+                self.socket.send_multipart(to_send, copy=False)
 
-        self.socket.send(to_send)
-        LOG.debug('Sent payload!')
+        if logging_utils.DEBUG_ENABLED:
+            LOG.debug('Sent payload!')
 
     @staticmethod
     def _setup_publisher_socket(address, context, model):
@@ -1,11 +1,23 @@
 """ File to house a requester connection """
 
+import asyncio
+import itertools
 from logging import getLogger
 import zmq
+import zmq.asyncio
 
 from service_framework.utils.connection_utils import BaseConnection
-from service_framework.utils.msgpack_utils import msg_pack, msg_unpack
-from service_framework.utils.socket_utils import get_requester_socket
+from service_framework.utils.codec_utils import (
+    decode_payload,
+    encode_payload,
+    get_codec_name,
+    get_compact_schemas
+)
+from service_framework.utils.socket_utils import (
+    ThreadSockets,
+    get_dealer_socket,
+    get_requester_socket
+)
 
 LOG = getLogger(__name__)
 
@@ -13,17 +25,26 @@ LOG = getLogger(__name__)
 class Requester(BaseConnection):
     """
     Needed to automatically generate all connection functions/sockets so external
-    calls will be properly handled.
+    calls will be properly handled. Each thread sending gets its own socket,
+    so the main thread and the service loop (or its workers) can send at once.
     """
     def __init__(self, model, addresses):
         super().__init__(model, addresses)
         self.addresses = addresses
+        self.codec_name = get_codec_name(model)
+        self.compact_schemas = get_compact_schemas(model)
         self.context = None
-        self.socket = None
+        self.thread_sockets = None
+
+        self.async_context = None
+        self.async_socket = None
+        self.async_reply_task = None
+        self.pending_requests = {}
+        self.request_ids = itertools.count()
 
     def __del__(self):
-        if hasattr(self, 'socket') and self.socket:
-            self.socket.close()
+        if getattr(self, 'thread_sockets', None) is not None:
+            self.thread_sockets.close()
 
     @staticmethod
     def get_addresses_model():
@@ -88,7 +109,10 @@ class Requester(BaseConnection):
         """
         return {
             'required_creation_arguments': {},
-            'optional_creation_arguments': {},
+            'optional_creation_arguments': {
+                'codec': str,
+                'compact_args': bool,
+            },
         }
 
     def get_inbound_sockets_and_triggered_functions(self):
@@ -97,7 +121,7 @@ class Requester(BaseConnection):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([bytes]) -> payload,
             'arg_validator': def(args),
             'connection_function': def(args) -> args or None,
             'model_function': def(args, to_send, conifg) -> return_args or None,
@@ -105,13 +129,6 @@ class Requester(BaseConnection):
             'return_function': def(return_args),
         }]
         """
-        self.context = zmq.Context()
-
-        self.socket = get_requester_socket(
-            self.addresses['requester'],
-            self.context
-        )
-
         return []
 
     def runtime_setup(self):
@@ -120,16 +137,79 @@ class Requester(BaseConnection):
         runtime required setup. I.E. Setting up a zmq.Context().
         """
         self.context = zmq.Context()
-
-        self.socket = get_requester_socket(
-            self.addresses['requester'],
-            self.context
+        self.thread_sockets = ThreadSockets(
+            lambda: get_requester_socket(self.addresses['requester'], self.context)
         )
+        self.thread_sockets.get()
 
     def send(self, payload):
         """
         This is needed to wrap socket calls. So all calls to the connection
         will be properly formatted.
         """
-        self.socket.send(msg_pack(payload))
-        return msg_unpack(self.socket.recv())
+        socket = self.thread_sockets.get()
+        socket.send_multipart(
+            encode_payload(payload, self.codec_name, self.compact_schemas),
+            copy=False
+        )
+        return decode_payload(
+            socket.recv_multipart(copy=False),
+            self.codec_name,
+            self.compact_schemas
+        )
+
+    async def send_async(self, payload):
+        """
+        Used by the asyncio service loop. Requests are sent on a dealer socket
+        with a request id frame so many requests can be in flight at once and
+        each reply is matched back to its request.
+        """
+        if self.async_socket is None:
+            self._setup_async_socket()
+
+        request_id = str(next(self.request_ids)).encode()
+        future = asyncio.get_running_loop().create_future()
+        self.pending_requests[request_id] = future
+
+        await self.async_socket.send_multipart(
+            [request_id, b''] + encode_payload(payload, self.codec_name, self.compact_schemas),
+            copy=False
+        )
+        return await future
+
+    async def _receive_async_replies(self):
+        """
+        Resolve the pending request matching each reply received on the
+        dealer socket. The socket is closed once the event loop cancels this task.
+        """
+        try:
+            while True:
+                request_id, _, *frames = await self.async_socket.recv_multipart(copy=False)
+                request_id = request_id.bytes
+                future = self.pending_requests.pop(request_id, None)
+
+                if future is None or future.done():
+                    LOG.warning('Got reply for unknown request id "%s"', request_id)
+                    continue
+
+                future.set_result(decode_payload(frames, self.codec_name, self.compact_schemas))
+
+        finally:
+            LOG.debug('Closing async requester socket...')
+            self.async_socket.close(linger=0)
+            self.async_context.term()
+            self.async_socket = None
+            self.async_context = None
+            self.pending_requests = {}
+
+    def _setup_async_socket(self):
+        """
+        Lazily create the dealer socket (and the task reading its replies)
+        on the running event loop.
+        """
+        self.async_context = zmq.asyncio.Context()
+        self.async_socket = get_dealer_socket(
+            self.addresses['requester'],
+            self.async_context
+        )
+        self.async_reply_task = asyncio.ensure_future(self._receive_async_replies())
@@ -1,7 +1,8 @@
 """ File to house the service class """
 
 from multiprocessing import Process
-from service_framework.utils import service_utils
+import os
+from service_framework.utils import service_utils, worker_pool_utils
 
 
 class Service:
@@ -19,7 +20,17 @@ class Service:
                  log_path=None,
                  file_loglevel='INFO',
                  backup_count=24,
-                 service_loop_min_wait_time_s=0):
+                 async_logging=False,
+                 log_workflow_sample_rate=1,
+                 log_rate_limit_per_s=None,
+                 log_format='text',
+                 service_loop_min_wait_time_s=0,
+                 service_loop_wait_strategy='block',
+                 service_loop_engine='sync',
+                 service_loop_num_worker_threads=4,
+                 service_loop_earliest_deadline_first=False,
+                 service_loop_stall_threshold_s=None,
+                 num_worker_processes=1):
         """
         service_path = './services/other_folder/service_file.py'
         config = {
@@ -38,18 +49,57 @@ class Service:
         log_path::str The location of the folder to output logs (if used, None to disable)
         file_loglevel::str The level of the file logger (if used)
         backup_count::int Number of hours that should be saved for file logger
+        async_logging::bool Write logs on a background thread instead of the thread
+            logging, dropping (and counting) logs if it falls too far behind
+        log_workflow_sample_rate::int Only log (below WARNING) 1 in this many workflows
+        log_rate_limit_per_s::float Max logs (below WARNING) per second from each line
+            of code (None for no limit)
+        log_format::str Format of the logs 'text', or one structured record per line
+            'json': JSON lines (Also used for the console with 'msgpack')
+            'msgpack': msgpack maps, for the smallest log files
+        service_loop_min_wait_time_s::float Time to sleep between each service loop
+        service_loop_wait_strategy::str How the service loop waits for new messages
+            'spin': Never block, lowest latency but 100% CPU while idle
+            'block': Block until a message arrives, ~0% CPU while idle
+            'adaptive': Spin while messages are flowing, block once idle
+        service_loop_engine::str What runs the service loop
+            'sync': Poll the inbound sockets and handle one message at a time
+            'asyncio': Run on an asyncio event loop, "async def" functions can await to_send
+            'threads': Poll the inbound sockets and run model functions on a thread pool
+            'pipelined': Poll and decode on one thread, run model functions in order on another
+        service_loop_num_worker_threads::int Number of threads for the 'threads' engine
+        service_loop_earliest_deadline_first::bool Handle the messages received each
+            loop by their deadline instead of by connection (Not with the 'asyncio' engine)
+        service_loop_stall_threshold_s::float Log the stack of the service loop when handling
+            one message takes longer than this (None to disable, not with the 'asyncio' engine)
+        num_worker_processes::int Number of processes to run the service on (Not as main)
+            Above 1 the replyer addresses are bound once and each request is
+            handed to the least loaded worker process.
         """
         self.logger_args_dict = {
             'console_loglevel': console_loglevel,
             'log_path': log_path,
             'file_loglevel': file_loglevel,
-            'backup_count': backup_count
+            'backup_count': backup_count,
+            'async_logging': async_logging,
+            'log_workflow_sample_rate': log_workflow_sample_rate,
+            'log_rate_limit_per_s': log_rate_limit_per_s,
+            'log_format': log_format,
+            'service_name': get_service_name(service_path if service_path else service_module),
         }
 
         self.service_definition = service_path if service_path else service_module
         self.addresses = addresses
         self.config = config
-        self.service_loop_min_wait_time_s = service_loop_min_wait_time_s
+        self.service_loop_args_dict = {
+            'min_wait_time_s': service_loop_min_wait_time_s,
+            'wait_strategy': service_loop_wait_strategy,
+            'engine': service_loop_engine,
+            'num_worker_threads': service_loop_num_worker_threads,
+            'earliest_deadline_first': service_loop_earliest_deadline_first,
+            'stall_threshold_s': service_loop_stall_threshold_s,
+        }
+        self.num_worker_processes = num_worker_processes
 
         self.process = None
 
@@ -61,6 +111,7 @@ class Service:
         """
         This method is used to encapsulate the running of the service main.
         """
+        self._validate_not_worker_pool()
         target = service_utils.entrance_point
         args = (
             self.service_definition,
@@ -68,7 +119,7 @@ class Service:
             self.addresses,
             self.logger_args_dict,
             True,
-            self.service_loop_min_wait_time_s
+            self.service_loop_args_dict
         )
         self._run_target_in_background(target, args)
 
@@ -76,49 +127,68 @@ class Service:
         """
         This method is used to run the service here and block.
         """
+        self._validate_not_worker_pool()
         service_utils.entrance_point(
             self.service_definition,
             self.config,
             self.addresses,
             self.logger_args_dict,
             True,
-            self.service_loop_min_wait_time_s
+            self.service_loop_args_dict
         )
 
     def run_service(self):
         """
         This method is used to encapsulate the running of the service itself.
         """
-        target = service_utils.entrance_point
-        args = (
-            self.service_definition,
-            self.config,
-            self.addresses,
-            self.logger_args_dict,
-            False,
-            self.service_loop_min_wait_time_s
-        )
-        self._run_target_in_background(target, args)
+        self._run_target_in_background(*self._get_service_target_and_args())
 
     def run_service_blocking(self):
         """
         This method is used to run the service here and block.
         """
-        service_utils.entrance_point(
+        target, args = self._get_service_target_and_args()
+        target(*args)
+
+    def stop_service(self):
+        """
+        This method is used to stop a currently running service.
+        """
+        self.process.terminate()
+        self.process = None
+
+    def _get_service_target_and_args(self):
+        """
+        Get the function (and its arguments) that runs the service, on a
+        worker pool if more than one worker process is used.
+        return::(def, tuple(obj))
+        """
+        if self.num_worker_processes > 1:
+            return worker_pool_utils.entrance_point, (
+                self.service_definition,
+                self.config,
+                self.addresses,
+                self.logger_args_dict,
+                self.num_worker_processes,
+                self.service_loop_args_dict
+            )
+
+        return service_utils.entrance_point, (
             self.service_definition,
             self.config,
             self.addresses,
             self.logger_args_dict,
             False,
-            self.service_loop_min_wait_time_s
+            self.service_loop_args_dict
         )
 
-    def stop_service(self):
+    def _validate_not_worker_pool(self):
         """
-        This method is used to stop a currently running service.
+        Worker pools can only run regular services, a main function would be
+        run once per worker.
         """
-        self.process.terminate()
-        self.process = None
+        if self.num_worker_processes > 1:
+            raise RuntimeError('Services with multiple worker processes can\'t be run as main!')
 
     def _run_target_in_background(self, target, args):
         """
@@ -133,3 +203,14 @@ class Service:
             args=args
         )
         self.process.start()
+
+
+def get_service_name(service_definition):
+    """
+    service_definition::obj Either the path of the service file or the service module
+    return::str The name of the service file (without ".py") or module
+    """
+    if isinstance(service_definition, str):
+        return os.path.splitext(os.path.basename(service_definition))[0]
+
+    return getattr(service_definition, '__name__', None)
@@ -0,0 +1,263 @@
+""" File to house the asyncio service loop """
+
+import asyncio
+import inspect
+import time
+import zmq.asyncio
+from service_framework.utils import ingress_utils, logging_utils, service_utils
+
+LOG = logging_utils.get_logger()
+
+
+def run_service_async(connections,
+                      config,
+                      logger_args_dict,
+                      max_in_flight=1000,
+                      stop_check_interval_s=0.1):
+    """
+    Run the service loop on an asyncio event loop instead of polling. Every
+    inbound socket is read by its own task and each message is handled in a
+    new task, so "async def" connection functions awaiting "to_send" can keep
+    many downstream calls in flight at once.
+    connections = {
+        'in': {
+            'connection_name': BaseInConnector(),
+        }
+        'out': {
+            'connection_name': BaseOutConnector(),
+        },
+    }
+    config = {
+        'config_1': 'thingy',
+        'config_2': 12345
+    }
+    logger_args_dict = {
+        console_loglevel: str,
+        log_path: str,
+        file_loglevel: str,
+        backup_count: int,
+    }
+    max_in_flight::int Max number of messages being handled at once
+    stop_check_interval_s::float How often to check if the service should stop
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    try:
+        loop.run_until_complete(run_service_coroutine(
+            connections,
+            config,
+            logger_args_dict,
+            max_in_flight,
+            stop_check_interval_s
+        ))
+    finally:
+        loop.close()
+
+
+async def run_service_coroutine(connections,
+                                config,
+                                logger_args_dict,
+                                max_in_flight=1000,
+                                stop_check_interval_s=0.1):
+    """
+    The coroutine run by "run_service_async", see it for the arguments.
+    Any exception raised while handling a message stops the service and is
+    re-raised here, the same as the regular service loop.
+    """
+    LOG.debug('Extracting Sockets to Read...')
+    polling_list = service_utils.get_polling_list(connections)
+
+    if not polling_list:
+        LOG.debug('Not Starting Async Service Loop due to no polling list...')
+        return
+
+    in_flight = asyncio.Semaphore(max_in_flight)
+    handler_tasks = set()
+    local_state = {'error': None}
+
+    def on_task_done(task):
+        """
+        Keep track of the finished task and save its error (if any) so the
+        service can be stopped.
+        """
+        if task in handler_tasks:
+            handler_tasks.discard(task)
+            in_flight.release()
+
+        if not task.cancelled() and task.exception() is not None:
+            local_state['error'] = task.exception()
+
+    def start_handler_task(item, payload, async_socket):
+        """
+        Handle the payload in its own task so the reader can keep receiving.
+        """
+        task = asyncio.ensure_future(run_triggered_functions_async(
+            item,
+            payload,
+            async_socket,
+            connections,
+            config,
+            logger_args_dict
+        ))
+        handler_tasks.add(task)
+        task.add_done_callback(on_task_done)
+
+    LOG.debug('Starting Async Service Loop...')
+    for item in polling_list:
+        task = asyncio.ensure_future(read_inbound_socket(item, in_flight, start_handler_task))
+        task.add_done_callback(on_task_done)
+
+        if item.get('timer_function'):
+            task = asyncio.ensure_future(run_timer(item['timer_function']))
+            task.add_done_callback(on_task_done)
+
+    while service_utils.RUN_FLAG and local_state['error'] is None:
+        await asyncio.sleep(stop_check_interval_s)
+
+    LOG.debug('Stopping Async Service Loop...')
+    tasks_to_cancel = [
+        task for task in asyncio.all_tasks()
+        if task is not asyncio.current_task()
+    ]
+    for task in tasks_to_cancel:
+        task.cancel()
+    await asyncio.gather(*tasks_to_cancel, return_exceptions=True)
+
+    if local_state['error'] is not None:
+        raise local_state['error']
+
+
+async def run_timer(timer_function):
+    """
+    Keep firing a timed connection's timer when due. (Its ticks are then
+    received by its "read_inbound_socket" task)
+    timer_function::def(now) -> timeout_ms
+    """
+    while True:
+        timeout_ms = timer_function(time.monotonic())
+        await asyncio.sleep(timeout_ms / 1000)
+
+
+async def read_inbound_socket(item, in_flight, start_handler_task):
+    """
+    Keep receiving messages on the item's socket and start a handler task for
+    each one. Waits for a free "in_flight" slot before each receive so a slow
+    service pushes back on its senders instead of queueing without bound.
+    item = {
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        ...
+    }
+    in_flight::asyncio.Semaphore
+    start_handler_task::def(item, payload, async_socket)
+    """
+    async_socket = zmq.asyncio.Socket.shadow(item['inbound_socket'].underlying)
+    copy = not item.get('zero_copy', False)
+
+    while True:
+        await in_flight.acquire()
+
+        try:
+            frames = await async_socket.recv_multipart(copy=copy)
+        except BaseException:
+            in_flight.release()
+            raise
+
+        payload = item['decode_message'](frames)
+
+        if payload is None:
+            in_flight.release()
+            continue
+
+        start_handler_task(item, payload, async_socket)
+
+
+async def run_triggered_functions_async(current_polled,
+                                        payload,
+                                        async_socket,
+                                        connections,
+                                        config,
+                                        logger_args_dict):
+    """
+    The asyncio version of "service_utils.run_triggered_functions".
+    "async def" model functions are awaited and given an awaitable "to_send",
+    regular model functions are called as is with the regular "to_send".
+    current_polled = {
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        'args_validator': def(args),
+        'connection_function': def(args) -> args or None,
+        'model_function': def(args, to_send, conifg) -> return_args or None,
+        'return_validator': def(return_args)
+        'return_function': def(return_payload, socket=None),
+    }
+    payload = {
+        'args': {},
+        'workflow_id': str,
+    }
+    async_socket::zmq.asyncio.Socket The asyncio socket the payload was received on
+    """
+    debug_enabled = logging_utils.DEBUG_ENABLED
+
+    if debug_enabled:
+        LOG.debug('Got Payload: %s', payload)
+    if ingress_utils.is_expired(payload):
+        return_payload = ingress_utils.get_expired_return_payload(current_polled, payload)
+        if return_payload is not None:
+            await_result = current_polled['return_function'](return_payload, async_socket)
+            if inspect.isawaitable(await_result):
+                await await_result
+        return
+
+    args = payload.get('args')
+    workflow_id = payload.get('workflow_id')
+
+    token = logging_utils.set_new_workflow_id_on_logger(
+        workflow_id,
+        logger_args_dict,
+        current_polled.get('connection_name')
+    )
+
+    try:
+        if debug_enabled:
+            LOG.debug('Validating Args for the model function: %s', args)
+        if current_polled.get('args_validator', None):
+            current_polled['args_validator'](args)
+
+        if debug_enabled:
+            LOG.debug('Running Connection/State Function (if applicable)')
+        post_func = current_polled.get('connection_function', None)
+        args = args if post_func is None else post_func(args)
+
+        return_args = args
+        model_function = current_polled.get('model_function', None)
+        if model_function:
+            is_async = inspect.iscoroutinefunction(model_function)
+            to_send = service_utils.setup_to_send(
+                connections,
+                logger_args_dict,
+                workflow_id=workflow_id,
+                increment_id=True,
+                is_async=is_async,
+                deadline=payload.get('deadline')
+            )
+
+            return_args = model_function(args, to_send, config)
+            if is_async:
+                return_args = await return_args
+
+        if current_polled.get('return_function', None):
+            if current_polled.get('return_validator', None):
+                if debug_enabled:
+                    LOG.debug('Validating Returned Args: %s', return_args)
+                current_polled['return_validator'](return_args)
+
+            sent = current_polled['return_function'](
+                service_utils.get_return_payload(payload, return_args),
+                async_socket
+            )
+            if inspect.isawaitable(sent):
+                await sent
+    finally:
+        logging_utils.reset_workflow_id_on_logger(token)
@@ -0,0 +1,344 @@
+""" File to house the codecs connections send their payloads with """
+
+import json
+import logging
+import pickle
+import struct
+from msgpack import ExtType
+from service_framework.utils.msgpack_utils import (
+    MISSING_EXT_CODE,
+    msg_pack,
+    msg_pack_frames,
+    msg_unpack,
+    msg_unpack_frames
+)
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CODEC = 'msgpack'
+# Never the first byte of a msgpack message, so a header frame can't be mistaken for one
+CODEC_HEADER_MARKER = b'\xc1'
+BYTES_TYPES = (bytes, bytearray, memoryview)
+CODECS = {}
+# Struct format of each type compact args can be struct packed with
+STRUCT_FORMATS = {bool: '?', int: 'q', float: 'd'}
+MISSING = ExtType(MISSING_EXT_CODE, b'')
+
+
+def register_codec(codec_name, encode, decode, is_trusted_only=False):
+    """
+    Add a codec connections can select with their "codec" creation argument.
+    Every message of a codec (other than the default) starts with a header
+    frame holding its name, so the receiving end knows how to decode it.
+    codec_name::str
+    encode::def(payload) -> [bytes] The frames of the payload
+    decode::def([bytes or zmq.Frame]) -> payload
+    is_trusted_only::bool Only decoded by connections with this codec selected
+        (ex. pickle, which can run code while decoding)
+    """
+    CODECS[codec_name] = {
+        'encode': encode,
+        'decode': decode,
+        'is_trusted_only': is_trusted_only,
+    }
+
+
+def get_codec_name(model):
+    """
+    Get the codec a connection sends its payloads with.
+    model = {
+        'connection_type': str,
+        'optional_creation_arguments': {
+            'codec': str,
+        },
+        ...
+    }
+    return::str
+    """
+    codec_name = model.get('optional_creation_arguments', {}).get('codec', DEFAULT_CODEC)
+
+    if codec_name not in CODECS:
+        err = 'Codec "{}" is not one of the registered codecs: {}'.format(
+            codec_name,
+            list(CODECS)
+        )
+        LOG.error(err)
+        raise ValueError(err)
+
+    return codec_name
+
+
+def encode_payload(payload, codec_name, compact_schemas=None):
+    """
+    payload::{}
+    codec_name::str
+    compact_schemas::{} From "get_compact_schemas" (None to send args as is)
+    return::[bytes] The frames to send (Send with "copy=False")
+    """
+    if compact_schemas is not None:
+        payload = compact_payload(payload, compact_schemas)
+
+    frames = CODECS[codec_name]['encode'](payload)
+
+    if codec_name == DEFAULT_CODEC:
+        return frames
+
+    return [CODEC_HEADER_MARKER + codec_name.encode()] + frames
+
+
+def decode_payload(frames, codec_name, compact_schemas=None):
+    """
+    Decode the frames with the codec named in their header frame (The
+    default codec if no header). Codecs that are trusted only are only
+    decoded if they're the receiving connection's own codec.
+    frames::[bytes or zmq.Frame]
+    codec_name::str The codec of the receiving connection
+    compact_schemas::{} From "get_compact_schemas" (None if args are sent as is)
+    return::{}
+    """
+    header = getattr(frames[0], 'buffer', frames[0])
+
+    if not header or header[:1] != CODEC_HEADER_MARKER:
+        payload = CODECS[DEFAULT_CODEC]['decode'](frames)
+    else:
+        payload = decode_header_codec(frames, codec_name)
+
+    if compact_schemas is not None:
+        expand_payload(payload, compact_schemas)
+
+    return payload
+
+
+def decode_header_codec(frames, codec_name):
+    """
+    frames::[bytes or zmq.Frame] Starting with the codec's header frame
+    codec_name::str The codec of the receiving connection
+    return::{}
+    """
+    header = getattr(frames[0], 'buffer', frames[0])
+
+    sent_codec_name = bytes(header[1:]).decode()
+    codec = CODECS.get(sent_codec_name)
+
+    if codec is None or (codec['is_trusted_only'] and sent_codec_name != codec_name):
+        err = 'Can not decode a message sent with codec "{}" on a "{}" connection!'.format(
+            sent_codec_name,
+            codec_name
+        )
+        LOG.error(err)
+        raise ValueError(err)
+
+    return codec['decode'](frames[1:])
+
+
+def get_compact_schemas(model):
+    """
+    Get the field order of the args (and return args) sent by a connection
+    with the "compact_args" creation argument, derived from its model so
+    both ends agree without sending any keys. Args are sent as a list of
+    their values, or as a struct packed record if every arg is a required
+    bool, int (64 bit) or float.
+    model = {
+        'connection_type': str,
+        'optional_creation_arguments': {
+            'compact_args': bool,
+        },
+        'required_arguments': {},
+        'optional_arguments': {},
+        'required_return_arguments': {},
+        'optional_return_arguments': {},
+        ...
+    }
+    return = {
+        'args': {
+            'fields': [str],
+            'num_required': int,
+            'struct': struct.Struct or None,
+        },
+        'return_args': {...},
+    } # None if the connection's args aren't compacted (Nor are args without any fields)
+    """
+    if not model.get('optional_creation_arguments', {}).get('compact_args', False):
+        return None
+
+    compact_schemas = {
+        'args': get_compact_schema(
+            model.get('required_arguments', {}),
+            model.get('optional_arguments', {})
+        ),
+        'return_args': get_compact_schema(
+            model.get('required_return_arguments', {}),
+            model.get('optional_return_arguments', {})
+        ),
+    }
+    return {
+        args_key: schema for args_key, schema in compact_schemas.items()
+        if schema['fields']
+    }
+
+
+def get_compact_schema(required_args, optional_args):
+    """
+    Fields are sorted by name (required first), so the order doesn't
+    depend on the order the model was written in.
+    required_args::{str: type}
+    optional_args::{str: type}
+    return::{} See "get_compact_schemas"
+    """
+    for key in list(required_args) + list(optional_args):
+        if not isinstance(key, str):
+            err = 'Compact args need the name of each arg, got key "{}"!'.format(key)
+            LOG.error(err)
+            raise ValueError(err)
+
+    fields = sorted(required_args) + sorted(optional_args)
+    record_struct = None
+
+    if fields and not optional_args and all(
+            isinstance(required_args[field], type) and required_args[field] in STRUCT_FORMATS
+            for field in fields):
+        record_struct = struct.Struct(
+            '<' + ''.join(STRUCT_FORMATS[required_args[field]] for field in fields)
+        )
+
+    return {
+        'fields': fields,
+        'num_required': len(required_args),
+        'struct': record_struct,
+    }
+
+
+def compact_payload(payload, compact_schemas):
+    """
+    payload::{}
+    compact_schemas::{} From "get_compact_schemas"
+    return::{} A copy of the payload with its args (and return args) compacted
+    """
+    payload = dict(payload)
+
+    for args_key, schema in compact_schemas.items():
+        args = payload.get(args_key)
+
+        if not isinstance(args, dict):
+            continue
+
+        if schema['struct'] is not None:
+            payload[args_key] = schema['struct'].pack(*[args[field] for field in schema['fields']])
+            continue
+
+        values = [args.get(field, MISSING) for field in schema['fields']]
+        while len(values) > schema['num_required'] and values[-1] is MISSING:
+            values.pop()
+
+        payload[args_key] = values
+
+    return payload
+
+
+def expand_payload(payload, compact_schemas):
+    """
+    Turn compacted args (and return args) back into dicts. Args sent as
+    dicts (ex. from a connection without "compact_args") are left as is.
+    payload::{} Updated in place
+    compact_schemas::{} From "get_compact_schemas"
+    """
+    for args_key, schema in compact_schemas.items():
+        args = payload.get(args_key)
+
+        if args is None or isinstance(args, dict):
+            continue
+
+        if schema['struct'] is not None:
+            payload[args_key] = dict(zip(schema['fields'], schema['struct'].unpack(args)))
+            continue
+
+        expanded = payload[args_key] = dict(zip(schema['fields'], args))
+
+        # Only optional args can be missing
+        for field in schema['fields'][schema['num_required']:len(args)]:
+            value = expanded[field]
+
+            if isinstance(value, ExtType) and value.code == MISSING_EXT_CODE:
+                del expanded[field]
+
+
+def bytes_encode(payload):
+    """
+    Send each bytes value of the payload's args (or return args) untouched
+    as its own frame, the rest of the payload is packed with msgpack.
+    payload::{}
+    return::[bytes]
+    """
+    payload = dict(payload)
+    blob_keys = []
+    blobs = []
+
+    for args_key in ('args', 'return_args'):
+        if not isinstance(payload.get(args_key), dict):
+            continue
+
+        args = payload[args_key] = dict(payload[args_key])
+        for key, value in list(args.items()):
+            if isinstance(value, BYTES_TYPES):
+                blob_keys.append((args_key, key))
+                blobs.append(args.pop(key))
+
+    return [msg_pack([payload, blob_keys])] + blobs
+
+
+def bytes_decode(frames):
+    """
+    frames::[bytes or zmq.Frame] From "bytes_encode"
+    return::{}
+    """
+    payload, blob_keys = msg_unpack(getattr(frames[0], 'buffer', frames[0]))
+
+    for (args_key, key), frame in zip(blob_keys, frames[1:]):
+        payload[args_key][key] = getattr(frame, 'bytes', frame)
+
+    return payload
+
+
+def json_encode(payload):
+    """
+    payload::{} Only JSON values (ex. no sets or bytes)
+    return::[bytes]
+    """
+    return [json.dumps(payload, separators=(',', ':')).encode()]
+
+
+def json_decode(frames):
+    """
+    frames::[bytes or zmq.Frame] From "json_encode"
+    return::{}
+    """
+    return json.loads(bytes(getattr(frames[0], 'buffer', frames[0])))
+
+
+def pickle5_encode(payload):
+    """
+    Pickle the payload, with the buffers of objects supporting pickle
+    protocol 5 (ex. numpy arrays) sent as their own frames without a copy.
+    payload::{}
+    return::[bytes or memoryview]
+    """
+    buffers = []
+    pickled = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+    return [pickled] + [buffer.raw() for buffer in buffers]
+
+
+def pickle5_decode(frames):
+    """
+    frames::[bytes or zmq.Frame] From "pickle5_encode"
+    return::{}
+    """
+    buffers = [getattr(frame, 'buffer', frame) for frame in frames]
+    return pickle.loads(buffers[0], buffers=buffers[1:])
+
+
+register_codec(DEFAULT_CODEC, msg_pack_frames, msg_unpack_frames)
+register_codec('bytes', bytes_encode, bytes_decode)
+register_codec('json', json_encode, json_decode)
+
+if pickle.HIGHEST_PROTOCOL >= 5:
+    register_codec('pickle5', pickle5_encode, pickle5_decode, is_trusted_only=True)
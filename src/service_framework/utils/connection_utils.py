@@ -3,11 +3,32 @@
 from abc import ABC, abstractmethod
 import logging
 
+from .ingress_utils import validate_overflow_policy
 from .validation_utils import validate_args
 from .utils import import_python_file_from_module, snake_case_to_capital_case
 
 LOG = logging.getLogger(__name__)
 
+POLLING_CREATION_ARGUMENTS = {
+    'max_messages_per_poll': int,
+    'max_queue_size': int,
+    'overflow_policy': str,
+    'priority': int,
+    'weight': float,
+}
+BATCH_CREATION_ARGUMENTS = {
+    'batch_connection_function': lambda args_list, to_send, config: True,
+    'max_batch_size': int,
+    'max_batch_wait_us': int,
+}
+POLLING_OPTION_DEFAULTS = {
+    'max_messages_per_poll': 1,
+    'max_queue_size': 0,
+    'overflow_policy': 'block',
+    'priority': 0,
+    'weight': 1.0,
+}
+
 
 def get_connection_args_validator(model):
     """
@@ -52,6 +73,47 @@ def get_connection_return_validator(model):
     return validator
 
 
+def get_batch_options(model):
+    """
+    Get the options the service loop uses to handle an inbound connection's
+    messages in micro batches (if it has a "batch_connection_function").
+    batch_connection_function::def(args_list, to_send, config) -> return_args_list or None
+    max_batch_size::int Max messages handled by each call (> 0)
+    max_batch_wait_us::int Max time the first message of a batch waits for more (>= 0)
+    model = {
+      'connection_type': 'subscriber | replyer | etc',
+      ...
+    }
+    return = {
+        'batch_model_function': def(args_list, to_send, config) or None,
+        'max_batch_size': int,
+        'max_batch_wait_us': int,
+    }
+    """
+    opt_args = model.get('optional_creation_arguments', {})
+    batch_options = {
+        'batch_model_function': opt_args.get('batch_connection_function'),
+        'max_batch_size': opt_args.get('max_batch_size', 64),
+        'max_batch_wait_us': opt_args.get('max_batch_wait_us', 0),
+    }
+
+    if batch_options['max_batch_size'] <= 0:
+        err = 'Batch option "max_batch_size" must be positive, got "{}"!'.format(
+            batch_options['max_batch_size']
+        )
+        LOG.error(err)
+        raise ValueError(err)
+
+    if batch_options['max_batch_wait_us'] < 0:
+        err = 'Batch option "max_batch_wait_us" can\'t be negative, got "{}"!'.format(
+            batch_options['max_batch_wait_us']
+        )
+        LOG.error(err)
+        raise ValueError(err)
+
+    return batch_options
+
+
 def get_connection(model, side, connection_addresses):
     """
     model = {
@@ -83,6 +145,53 @@ def get_connection(model, side, connection_addresses):
     return connection
 
 
+def get_polling_options(model):
+    """
+    Get the options the service loop uses to schedule an inbound connection.
+    max_messages_per_poll::int Max messages handled each time the socket is ready (> 0)
+    max_queue_size::int Size of the connection's ingress queue (0 for no queue)
+    overflow_policy::str What to do when the ingress queue is full
+        ('block', 'drop_oldest', 'drop_newest' or 'reject')
+    priority::int Ready connections with a higher priority are handled first
+    weight::float Share of messages taken relative to other connections (> 0)
+    model = {
+      'connection_type': 'subscriber | replyer | etc',
+      ...
+    }
+    return = {
+        'max_messages_per_poll': int,
+        'max_queue_size': int,
+        'overflow_policy': str,
+        'priority': int,
+        'weight': float,
+    }
+    """
+    opt_args = model.get('optional_creation_arguments', {})
+    polling_options = {
+        key: opt_args.get(key, default)
+        for key, default in POLLING_OPTION_DEFAULTS.items()
+    }
+
+    for key in ('max_messages_per_poll', 'weight'):
+        if polling_options[key] <= 0:
+            err = 'Polling option "{}" must be positive, got "{}"!'.format(
+                key,
+                polling_options[key]
+            )
+            LOG.error(err)
+            raise ValueError(err)
+
+    if polling_options['max_queue_size'] < 0:
+        err = 'Polling option "max_queue_size" can\'t be negative, got "{}"!'.format(
+            polling_options['max_queue_size']
+        )
+        LOG.error(err)
+        raise ValueError(err)
+
+    validate_overflow_policy(polling_options['overflow_policy'])
+    return polling_options
+
+
 def setup_connections(connection_models, addresses):
     """
     connection_models = {
@@ -271,7 +380,7 @@ class BaseConnection(ABC):
         for new messages and what functions to call when a message appears.
         return [{
             'inbound_socket': zmq.Context.Socket,
-            'decode_message': def(bytes) -> payload,
+            'decode_message': def([bytes]) -> payload (None to drop the message),
             'arg_validator': def(args),
             'model_function': def(args, to_send, config) -> return_args or None,
             'connection_function': def(args, to_send, config) -> return_args or None,
@@ -296,6 +405,13 @@ class BaseConnection(ABC):
         LOG.error(error)
         raise RuntimeError(error)
 
+    async def send_async(self, payload):
+        """
+        Method used by the asyncio service loop to send. Child classes whose
+        send can block should override this so the event loop isn't blocked.
+        """
+        return self.send(payload)
+
     def _validate_connection_addresses(self, connection_addresses):
         """
         connection_addresses = {
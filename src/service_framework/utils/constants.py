@@ -1,3 +1,4 @@
 """ File to contain constants """
 
 PACKAGE_LOGGER_NAME = 'service_framework'
+WORKER_READY_MESSAGE = b'READY'
@@ -0,0 +1,445 @@
+""" File to house the handlers compiled from the polling list """
+
+from abc import ABC, abstractmethod
+import time
+import uuid
+from service_framework.utils import ingress_utils, logging_utils, service_utils
+
+LOG = logging_utils.get_logger()
+
+
+def get_handler(item, connections, config, logger_args_dict):
+    """
+    Compile a polling list item into the handler the service loop calls for
+    each of its messages. The hooks are looked up once here, and the
+    handler with the fast path made for the hooks present is picked.
+    item = {
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        'args_validator': def(args),
+        'connection_function': def(args) -> args or None,
+        'model_function': def(args, to_send, conifg) -> return_args or None,
+        'return_validator': def(return_args)
+        'return_function': def(return_args),
+    }
+    connections = {
+        'in': {
+            'connection_name': BaseInConnector(),
+        }
+        'out': {
+            'connection_name': BaseOutConnector(),
+        },
+    }
+    config = {
+        'config_1': 'thingy',
+        'config_2': 12345
+    }
+    logger_args_dict = {
+        console_loglevel: str,
+        log_path: str,
+        file_loglevel: str,
+        backup_count: int,
+    }
+    return::BaseHandler
+    """
+    if item.get('batch_model_function') is not None:
+        LOG.debug('Using "BatchHandler" for polled item: %s', item)
+        return BatchHandler(item, connections, config, logger_args_dict)
+
+    hooks = tuple(
+        item.get(hook) is not None
+        for hook in ('args_validator', 'connection_function', 'model_function', 'return_function')
+    )
+    handler_class = HANDLER_CLASSES.get(hooks, GenericHandler)
+
+    if handler_class is ReplyHandler and item.get('return_validator') is None:
+        handler_class = GenericHandler
+
+    LOG.debug('Using "%s" for polled item: %s', handler_class.__name__, item)
+    return handler_class(item, connections, config, logger_args_dict)
+
+
+class BaseHandler(ABC):
+    """
+    Holds everything needed to handle a message of a polling list item, so
+    handling a message is a handful of attribute loads.
+    """
+    __slots__ = (
+        'item',
+        'args_validator',
+        'connection_function',
+        'model_function',
+        'return_validator',
+        'return_function',
+        'connections',
+        'config',
+        'logger_args_dict',
+        'connection_name',
+    )
+
+    def __init__(self, item, connections, config, logger_args_dict):
+        """
+        See "get_handler" for the arguments.
+        """
+        self.item = item
+        self.args_validator = item.get('args_validator')
+        self.connection_function = item.get('connection_function')
+        self.model_function = item.get('model_function')
+        self.return_validator = item.get('return_validator')
+        self.return_function = item.get('return_function')
+        self.connections = connections
+        self.config = config
+        self.logger_args_dict = logger_args_dict
+        self.connection_name = item.get('connection_name')
+
+    def handle(self, payload):
+        """
+        Run every function triggered by the payload and send back the
+        returned payload (if applicable).
+        payload = {
+            'args': {},
+            'workflow_id': str,
+        }
+        """
+        return_payload = self.get_return_payload(payload)
+
+        if return_payload is not None:
+            self.return_function(return_payload)
+
+    @abstractmethod
+    def get_return_payload(self, payload):
+        """
+        Run every function triggered by the payload without sending anything
+        back. Safe to call off of the thread polling the socket.
+        payload = {
+            'args': {},
+            'workflow_id': str,
+        }
+        return::{} The payload for the return function (None if no return function)
+        """
+
+
+class GenericHandler(BaseHandler):
+    """
+    Handles any combination of hooks, the same way "run_triggered_functions"
+    does, with the hooks bound once in "__init__" instead of looked up per message.
+    """
+    __slots__ = ()
+
+    def get_return_payload(self, payload):
+        if ingress_utils.is_expired(payload):
+            return ingress_utils.get_expired_return_payload(self.item, payload)
+
+        args = payload.get('args')
+        workflow_id = payload.get('workflow_id')
+        token = logging_utils.set_new_workflow_id_on_logger(
+            workflow_id,
+            self.logger_args_dict,
+            self.connection_name
+        )
+
+        try:
+            if self.args_validator is not None:
+                self.args_validator(args)
+
+            if self.connection_function is not None:
+                args = self.connection_function(args)
+
+            return_args = args
+            if self.model_function is not None:
+                return_args = self.model_function(
+                    args,
+                    service_utils.ToSend(
+                        self.connections,
+                        self.logger_args_dict,
+                        workflow_id,
+                        deadline=payload.get('deadline')
+                    ),
+                    self.config
+                )
+
+            return_payload = None
+            if self.return_function is not None:
+                if self.return_validator is not None:
+                    self.return_validator(return_args)
+
+                return_payload = service_utils.get_return_payload(payload, return_args)
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+        return return_payload
+
+
+class ModelHandler(BaseHandler):
+    """
+    Fast path for items with an args validator and a model function, but
+    nothing to return. (ex. Subscribers)
+    """
+    __slots__ = ()
+
+    def handle(self, payload):
+        self.get_return_payload(payload)
+
+    def get_return_payload(self, payload):
+        if ingress_utils.is_expired(payload):
+            return ingress_utils.get_expired_return_payload(self.item, payload)
+
+        args = payload.get('args')
+        workflow_id = payload.get('workflow_id')
+        token = logging_utils.set_new_workflow_id_on_logger(
+            workflow_id,
+            self.logger_args_dict,
+            self.connection_name
+        )
+
+        try:
+            self.args_validator(args)
+            self.model_function(
+                args,
+                service_utils.ToSend(
+                    self.connections,
+                    self.logger_args_dict,
+                    workflow_id,
+                    deadline=payload.get('deadline')
+                ),
+                self.config
+            )
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+
+class ReplyHandler(BaseHandler):
+    """
+    Fast path for items with an args validator, a model function, a return
+    validator and a return function. (ex. Replyers)
+    """
+    __slots__ = ()
+
+    def get_return_payload(self, payload):
+        if ingress_utils.is_expired(payload):
+            return ingress_utils.get_expired_return_payload(self.item, payload)
+
+        args = payload.get('args')
+        workflow_id = payload.get('workflow_id')
+        token = logging_utils.set_new_workflow_id_on_logger(
+            workflow_id,
+            self.logger_args_dict,
+            self.connection_name
+        )
+
+        try:
+            self.args_validator(args)
+            return_args = self.model_function(
+                args,
+                service_utils.ToSend(
+                    self.connections,
+                    self.logger_args_dict,
+                    workflow_id,
+                    deadline=payload.get('deadline')
+                ),
+                self.config
+            )
+            self.return_validator(return_args)
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+        return service_utils.get_return_payload(payload, return_args)
+
+
+class BatchHandler(BaseHandler):
+    """
+    Collects the messages of an item with a "batch_model_function" into
+    micro batches, so the model function is called once per batch with the
+    list of args. A batch is handled once it has "max_batch_size" messages,
+    or its first message has waited "max_batch_wait_us".
+    """
+    __slots__ = (
+        'batch_model_function',
+        'max_batch_size',
+        'max_batch_wait_s',
+        'batch',
+        'batch_start_time',
+    )
+
+    def __init__(self, item, connections, config, logger_args_dict):
+        super().__init__(item, connections, config, logger_args_dict)
+        self.batch_model_function = item['batch_model_function']
+        self.max_batch_size = item.get('max_batch_size', 64)
+        self.max_batch_wait_s = item.get('max_batch_wait_us', 0) / 1e6
+        self.batch = []
+        self.batch_start_time = 0
+
+    def handle(self, payload):
+        """
+        Add the payload to the current batch, handling the batch if full.
+        See "BaseHandler.handle"
+        """
+        batch = self.add(payload)
+
+        if batch is not None:
+            self.handle_batch(batch)
+
+    def get_return_payload(self, payload):
+        return_payloads = self.get_return_payloads([payload])
+        return return_payloads[0] if return_payloads else None
+
+    def add(self, payload):
+        """
+        Add the payload to the current batch. Expired payloads are dropped
+        here, so they don't hold up a batch.
+        payload = {
+            'args': {},
+            'workflow_id': str,
+        }
+        return::[payload] The full batch to handle (None if not full yet)
+        """
+        if ingress_utils.is_expired(payload):
+            return_payload = ingress_utils.get_expired_return_payload(self.item, payload)
+            if return_payload is not None:
+                self.return_function(return_payload)
+            return None
+
+        if not self.batch:
+            self.batch_start_time = time.monotonic()
+
+        self.batch.append(payload)
+
+        if len(self.batch) < self.max_batch_size:
+            return None
+
+        return self.pop_batch()
+
+    def pop_batch(self):
+        """
+        return::[payload] The current batch, which is then started over
+        """
+        batch = self.batch
+        self.batch = []
+        return batch
+
+    def pop_due_batch(self, now):
+        """
+        now::float time.monotonic()
+        return::[payload] The current batch if it has waited long enough (else None)
+        """
+        if self.batch and now - self.batch_start_time >= self.max_batch_wait_s:
+            return self.pop_batch()
+
+        return None
+
+    def get_timeout_ms(self, now):
+        """
+        now::float time.monotonic()
+        return::int Time until the current batch is due (None if no batch)
+        """
+        if not self.batch:
+            return None
+
+        remaining_s = self.batch_start_time + self.max_batch_wait_s - now
+        return max(0, int(remaining_s * 1000))
+
+    def handle_batch(self, batch):
+        """
+        Run the batch model function and send back each returned payload
+        (if applicable).
+        batch::[payload]
+        """
+        for return_payload in self.get_return_payloads(batch):
+            self.return_function(return_payload)
+
+    def get_return_payloads(self, batch):
+        """
+        Run the batch model function on the args of the batch without sending
+        anything back. Every args (and return args) are validated before
+        (and after) the call. Safe to call off of the thread polling the socket.
+        batch::[payload]
+        return::[{}] The payload for the return function of each message
+            (Empty if no return function)
+        """
+        batch_workflow_id = str(uuid.uuid4())
+        token = logging_utils.set_new_workflow_id_on_logger(
+            batch_workflow_id,
+            self.logger_args_dict,
+            self.connection_name
+        )
+
+        try:
+            if logging_utils.DEBUG_ENABLED:
+                LOG.debug(
+                    'Handling batch of workflow ids: %s',
+                    [payload.get('workflow_id') for payload in batch]
+                )
+
+            args_list = [payload.get('args') for payload in batch]
+            for args in args_list:
+                self.args_validator(args)
+
+            deadlines = [payload['deadline'] for payload in batch if 'deadline' in payload]
+            return_args_list = self.batch_model_function(
+                args_list,
+                service_utils.ToSend(
+                    self.connections,
+                    self.logger_args_dict,
+                    batch_workflow_id,
+                    deadline=min(deadlines) if deadlines else None
+                ),
+                self.config
+            )
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+        if self.return_function is None:
+            return []
+
+        if not isinstance(return_args_list, list) or len(return_args_list) != len(batch):
+            err = 'Batch connection function must return a list of {} return args, got: {}'
+            err = err.format(len(batch), return_args_list)
+            LOG.error(err)
+            raise ValueError(err)
+
+        for return_args in return_args_list:
+            self.return_validator(return_args)
+
+        return [
+            service_utils.get_return_payload(payload, return_args)
+            for payload, return_args in zip(batch, return_args_list)
+        ]
+
+
+def get_batch_handlers(polling_list):
+    """
+    polling_list = [{
+        'handler': BaseHandler,
+        ...
+    }]
+    return::[BatchHandler] The batch handlers of the polling list
+    """
+    return [
+        item['handler'] for item in polling_list
+        if isinstance(item['handler'], BatchHandler)
+    ]
+
+
+def get_batch_timeout_ms(batch_handlers, timeout_ms, now):
+    """
+    Shorten the service loop's poll timeout so no batch waits past its
+    "max_batch_wait_us".
+    batch_handlers::[BatchHandler]
+    timeout_ms::int The poll timeout of the wait strategy
+    now::float time.monotonic()
+    return::int
+    """
+    for handler in batch_handlers:
+        batch_timeout_ms = handler.get_timeout_ms(now)
+
+        if batch_timeout_ms is not None and batch_timeout_ms < timeout_ms:
+            timeout_ms = batch_timeout_ms
+
+    return timeout_ms
+
+
+HANDLER_CLASSES = {
+    # (args_validator, connection_function, model_function, return_function)
+    (True, False, True, False): ModelHandler,
+    (True, False, True, True): ReplyHandler,
+}
@@ -0,0 +1,244 @@
+""" File to house the bounded ingress queues of inbound connections """
+
+from collections import deque
+import time
+import zmq
+from service_framework.utils import logging_utils
+
+LOG = logging_utils.get_logger()
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'reject')
+SHED_MESSAGE_COUNTS = {}
+REJECTED_ERROR = 'Service overloaded, request rejected!'
+DEADLINE_EXCEEDED_ERROR = 'Deadline exceeded, request dropped!'
+
+
+def add_ingress_queues(polling_list):
+    """
+    Add a bounded ingress queue to each item of the polling list with a
+    positive "max_queue_size".
+    polling_list = [{
+        'inbound_socket': zmq.Context.Socket,
+        'max_queue_size': int,
+        'overflow_policy': str,
+        ...
+    }]
+    return::[{}] The items with an ingress queue
+    """
+    queued_items = []
+
+    for item in polling_list:
+        if not item.get('max_queue_size', 0):
+            continue
+
+        item['ingress_queue'] = deque()
+        queued_items.append(item)
+
+    return queued_items
+
+
+def get_queued_items(queued_items, ready_items):
+    """
+    Get the items that still have queued messages but weren't polled ready,
+    so they are handled even though their sockets are empty.
+    queued_items::[{}] From "add_ingress_queues"
+    ready_items::[{}] The items polled ready
+    return::[{}]
+    """
+    return [
+        item for item in queued_items
+        if item['ingress_queue'] and all(item is not ready for ready in ready_items)
+    ]
+
+
+def ingest(item):
+    """
+    Receive the waiting messages of the item's socket into its ingress queue,
+    applying its overflow policy once the queue is full. At most
+    "max_queue_size" messages are received each call, so a socket that never
+    empties doesn't starve the other sockets (and timers) of the service loop.
+    'block': Stop receiving, the rest wait in zmq (and push back on senders)
+    'drop_oldest': Shed the oldest queued message to make room
+    'drop_newest': Shed the new message
+    'reject': Reply with an error to the new message (Same as 'drop_newest'
+              for connections without replies)
+    Shed messages of connections with replies (ex. replyers) are always
+    replied to with the 'reject' error, so their requesters aren't left waiting.
+    item = {
+        'inbound_socket': zmq.Context.Socket,
+        'ingress_queue': deque,
+        'max_queue_size': int,
+        'overflow_policy': str,
+        'decode_message': def([bytes]) -> payload,
+        'return_function': def(return_payload),
+        ...
+    }
+    """
+    socket = item['inbound_socket']
+    ingress_queue = item['ingress_queue']
+    max_queue_size = item['max_queue_size']
+    overflow_policy = item['overflow_policy']
+    copy = not item.get('zero_copy', False)
+
+    for _ in range(max_queue_size):
+        if overflow_policy == 'block' and len(ingress_queue) >= max_queue_size:
+            return
+
+        try:
+            frames = socket.recv_multipart(zmq.NOBLOCK, copy=copy)
+        except zmq.Again:
+            return
+
+        if len(ingress_queue) < max_queue_size:
+            ingress_queue.append(frames)
+            continue
+
+        record_shed_message(item.get('connection_name'))
+
+        if overflow_policy == 'drop_oldest':
+            ingress_queue.append(frames)
+            frames = ingress_queue.popleft()
+
+        reject_message(item, frames)
+
+
+def reject_message(item, frames):
+    """
+    Reply to a message with an error, without handling it.
+    item::{} See "ingest"
+    frames::[bytes]
+    """
+    if item.get('return_function') is None:
+        return
+
+    payload = item['decode_message'](frames)
+
+    if payload is None:
+        return
+
+    item['return_function'](get_error_return_payload(payload, REJECTED_ERROR))
+
+
+def get_error_return_payload(payload, error):
+    """
+    Create the payload sent back, instead of return args, when a message
+    isn't handled.
+    payload = {
+        'args': {},
+        'workflow_id': str,
+        'envelope': [bytes], # Only on connections that route replies
+    }
+    error::str
+    return::{}
+    """
+    return_payload = {'error': error, 'workflow_id': payload.get('workflow_id')}
+
+    if 'envelope' in payload:
+        return_payload['envelope'] = payload['envelope']
+
+    return return_payload
+
+
+def get_deadline_sort_key(item_and_payload):
+    """
+    Sort key to handle payloads earliest deadline first. Payloads without a
+    deadline go last.
+    item_and_payload::({}, payload)
+    return::float
+    """
+    deadline = item_and_payload[1].get('deadline')
+    return float('inf') if deadline is None else deadline
+
+
+def get_expired_return_payload(item, payload):
+    """
+    Count an expired payload as shed and get the fast timeout reply to send
+    back instead of handling it.
+    item = {
+        'connection_name': str,
+        'return_function': def(return_payload),
+        ...
+    }
+    payload::{} See "get_error_return_payload"
+    return::{} The timeout reply (None if the item doesn't reply)
+    """
+    if logging_utils.DEBUG_ENABLED:
+        LOG.debug('Dropping expired payload: %s', payload)
+    record_shed_message(item.get('connection_name'))
+
+    if item.get('return_function') is None:
+        return None
+
+    return get_error_return_payload(payload, DEADLINE_EXCEEDED_ERROR)
+
+
+def is_expired(payload):
+    """
+    Check if the payload's deadline (if any) has passed. Deadlines are epoch
+    seconds, so the hosts' clocks are expected to be in sync.
+    payload = {
+        'deadline': float,
+        ...
+    }
+    return::bool
+    """
+    deadline = payload.get('deadline')
+    return deadline is not None and time.time() > deadline
+
+
+def validate_overflow_policy(overflow_policy):
+    """
+    overflow_policy::str One of OVERFLOW_POLICIES
+    """
+    if overflow_policy not in OVERFLOW_POLICIES:
+        err = 'Overflow policy "{}" not one of {}!'.format(overflow_policy, OVERFLOW_POLICIES)
+        LOG.error(err)
+        raise ValueError(err)
+
+
+def get_shed_message_counts():
+    """
+    Get the number of messages shed (dropped or rejected) by each inbound
+    connection in this process.
+    return::{connection_name::str: int}
+    """
+    return dict(SHED_MESSAGE_COUNTS)
+
+
+def get_shed_message_counts_logger(log_interval_s=60):
+    """
+    Create the function the service loop calls to periodically log (and then
+    reset) the shed message counts, so an overloaded service is visible.
+    log_interval_s::float Time between each log of the counts
+    return::def(now) Where now is time.monotonic()
+    """
+    local_state = {'last_log_time': time.monotonic()}
+
+    def log_shed_message_counts(now):
+        """
+        Log the counts if at least log_interval_s has passed since the last log.
+        now::float time.monotonic()
+        """
+        if now - local_state['last_log_time'] < log_interval_s:
+            return
+
+        local_state['last_log_time'] = now
+
+        if SHED_MESSAGE_COUNTS:
+            LOG.warning('Overloaded! Shed messages by connection: %s', get_shed_message_counts())
+            reset_shed_message_counts()
+
+    return log_shed_message_counts
+
+
+def record_shed_message(connection_name):
+    """
+    connection_name::str Name of the connection the message was shed from
+    """
+    SHED_MESSAGE_COUNTS[connection_name] = SHED_MESSAGE_COUNTS.get(connection_name, 0) + 1
+
+
+def reset_shed_message_counts():
+    """
+    Clear all of the shed message counts.
+    """
+    SHED_MESSAGE_COUNTS.clear()
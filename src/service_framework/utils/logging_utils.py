@@ -1,21 +1,38 @@
 """ File for housing logging utilities """
 
+from contextvars import ContextVar
+import atexit
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+import queue
+import threading
+import time
+import zlib
+from msgpack import packb
 from service_framework.utils.constants import PACKAGE_LOGGER_NAME
 
+WORKFLOW_ID = ContextVar('workflow_id', default=None)
+CONNECTION_NAME = ContextVar('connection_name', default=None)
+PACKAGE_LOGGER = logging.getLogger(PACKAGE_LOGGER_NAME)
+# Checked before building debug logs on the hot path, see "refresh_debug_enabled"
+DEBUG_ENABLED = False
+LOG_FORMATS = ('text', 'json', 'msgpack')
+
 
 class WorkflowIdFilter(logging.Filter):
     """
     This filter is used to inject workflow id into the logging stream
-    when a workflow id is present...
+    when a workflow id is present... The workflow id is read from the
+    "WORKFLOW_ID" context variable, so each thread and asyncio task logs
+    its own workflow id. The connection name and a monotonic timestamp are
+    also added for the structured log formats, since they must be read on
+    the thread logging.
     """
-    def __init__(self, workflow_id, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.workflow_id = workflow_id
-
     def filter(self, record):
-        record.workflow_id = self.workflow_id
+        record.workflow_id = WORKFLOW_ID.get()
+        record.connection_name = CONNECTION_NAME.get()
+        record.monotonic = time.monotonic()
         return True
 
     def __repr__(self):
@@ -23,10 +40,367 @@ class WorkflowIdFilter(logging.Filter):
         return super_repr + ' FILTER: workflow_id'
 
 
-def set_new_workflow_id_on_logger(workflow_id, logger_args_dict):
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON line (str) or msgpack map (bytes) of
+    its fields, so the logs can be parsed without regexes. Skips the text
+    formatter's time formatting, "time" is epoch seconds and "monotonic" is
+    time.monotonic() (For ordering and durations within one process).
+    """
+    def __init__(self, log_format, service_name=None):
+        """
+        log_format::str Either 'json' or 'msgpack'
+        service_name::str Added to every record
+        """
+        super().__init__()
+        self.log_format = log_format
+        self.service_name = service_name
+
+    def format(self, record):
+        structured = {
+            'time': record.created,
+            'monotonic': getattr(record, 'monotonic', None),
+            'level': record.levelname,
+            'service': self.service_name,
+            'connection': getattr(record, 'connection_name', None),
+            'workflow_id': getattr(record, 'workflow_id', None),
+            'message': record.getMessage(),
+        }
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            structured['exception'] = record.exc_text
+
+        if self.log_format == 'msgpack':
+            return packb(structured, default=str, use_bin_type=True)
+
+        return json.dumps(structured, default=str)
+
+
+class BufferedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """
+    Hourly rotated log file (like the text log file) that buffers the
+    formatted records and writes them in chunks of "flush_size_bytes", or
+    after "flush_interval_s" at most. Records at ERROR and above are written
+    right away. JSON records are written one per line, msgpack records back
+    to back (msgpack.Unpacker reads them back one by one).
+    """
+    def __init__(self, log_path, backup_count, flush_size_bytes=65536, flush_interval_s=1):
+        """
+        log_path::str
+        backup_count::int Number of hourly log files to keep
+        flush_size_bytes::int Write once this many bytes are buffered
+        flush_interval_s::float Max time a record waits in the buffer
+        """
+        super().__init__(log_path, when='h', backupCount=backup_count, delay=True)
+        self.stream = self._open()
+        self.flush_size_bytes = flush_size_bytes
+        self.flush_interval_s = flush_interval_s
+        self.buffer = []
+        self.buffer_size = 0
+        self.stop_event = threading.Event()
+        self.flush_thread = threading.Thread(
+            target=self._flush_periodically,
+            name='LogFlusher',
+            daemon=True
+        )
+        self.flush_thread.start()
+
+    def _open(self):
+        return open(self.baseFilename, 'ab')
+
+    def emit(self, record):
+        try:
+            formatted = self.format(record)
+            if isinstance(formatted, str):
+                formatted = formatted.encode() + b'\n'
+
+            self.buffer.append(formatted)
+            self.buffer_size += len(formatted)
+
+            if self.buffer_size >= self.flush_size_bytes or record.levelno >= logging.ERROR:
+                self.flush()
+        except Exception: # pylint: disable=broad-except
+            self.handleError(record)
+
+    def flush(self):
+        """
+        Write every buffered record, rotating the file first if it's time.
+        """
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+
+            if self.shouldRollover(None):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+
+            self.stream.write(b''.join(self.buffer))
+            self.stream.flush()
+            self.buffer = []
+            self.buffer_size = 0
+        finally:
+            self.release()
+
+    def close(self):
+        self.stop_event.set()
+        self.flush()
+        super().close()
+
+    def _flush_periodically(self):
+        """
+        Run on the flush thread until the handler is closed.
+        """
+        while not self.stop_event.wait(self.flush_interval_s):
+            self.flush()
+
+
+class LogQueueListener(QueueListener):
+    """
+    Listener that waits for room to queue its stop sentinel, so it can be
+    stopped while the (bounded) queue is full.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queues log records for a background listener thread, which formats and
+    writes them with the actual handlers, so the thread logging never waits
+    on a terminal or disk. Records are dropped (and counted) instead of
+    blocking when the bounded queue is full, and the number dropped is
+    logged once the queue has room again.
+    """
+    def __init__(self, log_queue, handlers):
+        """
+        log_queue::queue.Queue A bounded queue
+        handlers::[logging.Handler] The handlers the listener thread writes with
+        """
+        super().__init__(log_queue)
+        self.num_dropped = 0
+        self.num_dropped_unreported = 0
+        self.listener = LogQueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop_listener)
+
+    def enqueue(self, record):
+        if self.num_dropped_unreported:
+            self._enqueue_dropped_warning()
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.num_dropped += 1
+            self.num_dropped_unreported += 1
+
+    def stop_listener(self):
+        """
+        Write every queued record, then stop the listener thread and close its handlers.
+        """
+        if self.listener is None:
+            return
+
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+        self.listener = None
+        atexit.unregister(self.stop_listener)
+
+    def close(self):
+        self.stop_listener()
+        super().close()
+
+    def _enqueue_dropped_warning(self):
+        """
+        Queue a warning with the number of records dropped since the last one (if there's room).
+        """
+        record = logging.LogRecord(
+            PACKAGE_LOGGER_NAME,
+            logging.WARNING,
+            __file__,
+            0,
+            'Log queue full, dropped %s log records!',
+            (self.num_dropped_unreported,),
+            None
+        )
+        record.workflow_id = None
+
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            return
+
+        self.num_dropped_unreported = 0
+
+
+class LogSamplingFilter(logging.Filter):
+    """
+    Thins out the per-message log records (below WARNING) of a busy service.
+    "workflow_sample_rate": Only 1 in N workflows is logged. Workflows are
+        picked by a stable hash of their workflow id (without the "_<n>"
+        suffixes added by to_send), so every service keeps every record of
+        the same workflows. Records outside of a workflow are kept.
+    "rate_limit_per_s": Each call site (file and line) gets a token bucket
+        refilled at this rate (up to "burst" tokens), each record takes a token.
+    The number of records suppressed is logged (at WARNING) along with the
+    first record (kept or not) after each "summary_interval_s".
+    Added to the package logger's handlers, so records of its child loggers
+    are sampled too. A record is only sampled once, whichever handlers see it.
+    """
+    def __init__(self,
+                 workflow_sample_rate=1,
+                 rate_limit_per_s=None,
+                 burst=None,
+                 summary_interval_s=60):
+        """
+        workflow_sample_rate::int Log 1 in this many workflows (1 logs every workflow)
+        rate_limit_per_s::float Max records per second of each call site (None for no limit)
+        burst::float Max records of a call site at once (Defaults to "rate_limit_per_s")
+        summary_interval_s::float Min time between each log of the suppressed counts
+        """
+        super().__init__(name='log_sampling')
+
+        if workflow_sample_rate < 1:
+            err = 'Workflow sample rate must be at least 1, got "{}"!'.format(workflow_sample_rate)
+            PACKAGE_LOGGER.error(err)
+            raise ValueError(err)
+
+        if rate_limit_per_s is not None and rate_limit_per_s <= 0:
+            err = 'Log rate limit must be positive, got "{}"!'.format(rate_limit_per_s)
+            PACKAGE_LOGGER.error(err)
+            raise ValueError(err)
+
+        self.workflow_sample_rate = workflow_sample_rate
+        self.rate_limit_per_s = rate_limit_per_s
+        self.burst = max(1, burst if burst is not None else (rate_limit_per_s or 1))
+        self.summary_interval_s = summary_interval_s
+        self.lock = threading.Lock()
+        # {(pathname, lineno): [tokens, last_refill_time]}
+        self.buckets = {}
+        self.num_unsampled = 0
+        # {(pathname, lineno): int}
+        self.num_rate_limited = {}
+        self.last_summary_time = time.monotonic()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        is_kept = getattr(record, 'is_sampled', None)
+        if is_kept is None:
+            is_kept = record.is_sampled = self.is_record_sampled(record)
+
+        return is_kept
+
+    def is_record_sampled(self, record):
+        """
+        record::logging.LogRecord Below WARNING
+        return::bool If the record is logged
+        """
+        now = time.monotonic()
+
+        if now - self.last_summary_time >= self.summary_interval_s:
+            self._log_summary(now)
+
+        if not self.is_workflow_sampled(WORKFLOW_ID.get()):
+            with self.lock:
+                self.num_unsampled += 1
+            return False
+
+        if self.rate_limit_per_s is not None:
+            return self._take_token(record, now)
+
+        return True
+
+    def is_workflow_sampled(self, workflow_id):
+        """
+        workflow_id::str
+        return::bool If the workflow's records are logged
+        """
+        if self.workflow_sample_rate == 1 or workflow_id is None:
+            return True
+
+        root_workflow_id = str(workflow_id).split('_', 1)[0]
+        return zlib.crc32(root_workflow_id.encode()) % self.workflow_sample_rate == 0
+
+    def _take_token(self, record, now):
+        """
+        record::logging.LogRecord
+        now::float time.monotonic()
+        return::bool If the call site had a token left
+        """
+        call_site = (record.pathname, record.lineno)
+
+        with self.lock:
+            bucket = self.buckets.get(call_site)
+
+            if bucket is None:
+                bucket = self.buckets[call_site] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_limit_per_s)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+
+            self.num_rate_limited[call_site] = self.num_rate_limited.get(call_site, 0) + 1
+            return False
+
+    def _log_summary(self, now):
+        """
+        Log (and then reset) the suppressed counts, if any.
+        now::float time.monotonic()
+        """
+        with self.lock:
+            if now - self.last_summary_time < self.summary_interval_s:
+                return
+
+            elapsed_s = now - self.last_summary_time
+            self.last_summary_time = now
+            num_unsampled = self.num_unsampled
+            num_rate_limited = self.num_rate_limited
+            self.num_unsampled = 0
+            self.num_rate_limited = {}
+
+        if not num_unsampled and not num_rate_limited:
+            return
+
+        PACKAGE_LOGGER.warning(
+            'Suppressed log records in the last %.0fs: %s from unsampled workflows, '
+            'rate limited by call site: %s',
+            elapsed_s,
+            num_unsampled,
+            {
+                '{}:{}'.format(pathname, lineno): count
+                for (pathname, lineno), count in num_rate_limited.items()
+            }
+        )
+
+
+def get_dropped_log_record_count():
+    """
+    Get the number of log records the package logger dropped because its
+    async logging queue was full. (Always 0 without async logging)
+    return::int
+    """
+    return sum(
+        handler.num_dropped for handler in PACKAGE_LOGGER.handlers
+        if isinstance(handler, DroppingQueueHandler)
+    )
+
+
+def set_new_workflow_id_on_logger(workflow_id, logger_args_dict, connection_name=None):
     """
     This is used to set the workflow id when a new message has arrived.
     Or, when done processing a new message that has arrived.
+    Only the current thread's (or asyncio task's) workflow id is changed,
+    and the logger's handlers are only touched if it was never set up.
     workflow_id::str
     logger_args_dict = {
         console_loglevel: str,
@@ -34,52 +408,152 @@ def set_new_workflow_id_on_logger(workflow_id, logger_args_dict):
         file_loglevel: str,
         backup_count: int,
     }
+    connection_name::str Name of the connection the message came from (or is sent to)
+    return::(contextvars.Token, contextvars.Token) Pass to "reset_workflow_id_on_logger"
+        to restore the workflow id (and connection name) set before this one
+    """
+    if not PACKAGE_LOGGER.handlers:
+        setup_package_logger(**logger_args_dict)
+
+    return WORKFLOW_ID.set(workflow_id), CONNECTION_NAME.set(connection_name)
+
+
+def reset_workflow_id_on_logger(token):
+    """
+    Restore the workflow id that was set before "set_new_workflow_id_on_logger"
+    returned the token. (ex. The handled message's id once a to_send is done)
+    token::(contextvars.Token, contextvars.Token)
+    """
+    workflow_id_token, connection_name_token = token
+    WORKFLOW_ID.reset(workflow_id_token)
+    CONNECTION_NAME.reset(connection_name_token)
+
+
+def reset_package_logger(**logger_args_dict):
+    """
+    Close and remove the package logger's handlers and set it up again with
+    the provided arguments. Used when a service starts, since the handlers
+    are otherwise left as is for the rest of the process.
+    logger_args_dict = {
+        console_loglevel: str,
+        log_folder: None,
+        file_loglevel: str,
+        backup_count: int,
+    }
     """
     logger = logging.getLogger(PACKAGE_LOGGER_NAME)
-    logger.handlers = []
-    setup_package_logger(workflow_id, **logger_args_dict)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    return setup_package_logger(**logger_args_dict)
 
 
 def setup_package_logger(workflow_id=None,
                          console_loglevel='INFO',
                          log_path=None,
                          file_loglevel='INFO',
-                         backup_count=24):
+                         backup_count=24,
+                         async_logging=False,
+                         log_queue_size=10000,
+                         log_workflow_sample_rate=1,
+                         log_rate_limit_per_s=None,
+                         log_format='text',
+                         service_name=None):
     """
-    Pass
+    Set up the package logger's handlers (if not already set up).
+    async_logging::bool Format and write log records on a background thread
+        instead of the thread logging (See "DroppingQueueHandler")
+    log_queue_size::int Max log records waiting for the background thread
+    log_workflow_sample_rate::int Only log (below WARNING) 1 in this many workflows
+    log_rate_limit_per_s::float Max records (below WARNING) per second of each
+        call site (See "LogSamplingFilter")
+    log_format::str One of LOG_FORMATS, 'json' and 'msgpack' write one structured
+        record per line to a buffered log file (See "StructuredFormatter")
+    service_name::str Added to each structured record
     """
     logger = logging.getLogger(PACKAGE_LOGGER_NAME)
-    logger.setLevel('DEBUG')
+    WORKFLOW_ID.set(workflow_id)
 
     if logger.handlers:
         logger.debug('"%s" already setup - skipping logger...', PACKAGE_LOGGER_NAME)
         return logger
 
+    if log_format not in LOG_FORMATS:
+        err = 'Log format "{}" not one of {}!'.format(log_format, LOG_FORMATS)
+        logger.error(err)
+        raise ValueError(err)
+
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(workflow_id)s - %(levelname)s - %(message)s'
     )
+    if log_format != 'text':
+        # Binary msgpack can't be read on a console, so it's sent JSON instead
+        console_formatter = StructuredFormatter('json', service_name)
+        file_formatter = StructuredFormatter(log_format, service_name)
+    else:
+        console_formatter = file_formatter = formatter
+
+    handlers = []
 
     if console_loglevel:
         console_handler = logging.StreamHandler()
         console_handler.setLevel(console_loglevel)
-        console_handler.setFormatter(formatter)
-        console_handler.addFilter(WorkflowIdFilter(workflow_id, name='workflow_id'))
-        logger.addHandler(console_handler)
+        console_handler.setFormatter(console_formatter)
+        handlers.append(console_handler)
 
     if log_path:
-        file_handler = TimedRotatingFileHandler(
-            log_path,
-            when='h',
-            backupCount=backup_count
-        )
+        if log_format != 'text':
+            file_handler = BufferedTimedRotatingFileHandler(log_path, backup_count)
+        else:
+            file_handler = TimedRotatingFileHandler(
+                log_path,
+                when='h',
+                backupCount=backup_count
+            )
         file_handler.setLevel(file_loglevel)
-        file_handler.setFormatter(formatter)
-        file_handler.addFilter(WorkflowIdFilter(workflow_id, name='workflow_id'))
-        logger.addHandler(file_handler)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+
+    if async_logging and handlers:
+        # The workflow id is read by the thread logging, the listener thread has its own
+        queue_handler = DroppingQueueHandler(queue.Queue(log_queue_size), handlers)
+        queue_handler.setLevel(min(handler.level for handler in handlers))
+        handlers = [queue_handler]
 
+    # Logger filters aren't run for records of child loggers, handler filters are
+    log_sampling_filter = None
+    if log_workflow_sample_rate != 1 or log_rate_limit_per_s is not None:
+        log_sampling_filter = LogSamplingFilter(
+            workflow_sample_rate=log_workflow_sample_rate,
+            rate_limit_per_s=log_rate_limit_per_s
+        )
+
+    for handler in handlers:
+        handler.addFilter(WorkflowIdFilter(name='workflow_id'))
+        if log_sampling_filter is not None:
+            handler.addFilter(log_sampling_filter)
+        logger.addHandler(handler)
+
+    # Records below every handler's level are dropped before a LogRecord is made
+    logger.setLevel(min(handler.level for handler in handlers) if handlers else logging.NOTSET)
+    refresh_debug_enabled()
     return logger
 
 
+def refresh_debug_enabled():
+    """
+    Cache if the package logger logs DEBUG records in "DEBUG_ENABLED", so the
+    hot path can skip building its debug logs with one check. Call this after
+    changing the level of the package logger (or its parents) directly.
+    return::bool
+    """
+    global DEBUG_ENABLED
+    DEBUG_ENABLED = PACKAGE_LOGGER.isEnabledFor(logging.DEBUG)
+    return DEBUG_ENABLED
+
+
 def get_logger():
     """
     This function is used to get the service framework package level logger...
@@ -1,35 +1,78 @@
 """ File to House a Custom Msgpack Wrapper """
 
 from decimal import Decimal
+import threading
 from uuid import UUID
-from msgpack import packb, unpackb
+from msgpack import ExtType, Packer, Unpacker, packb, unpackb
 import numpy
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+DECIMAL_EXT_CODE = 1
+SET_EXT_CODE = 2
+UUID_EXT_CODE = 3
+NUMPY_NDARRAY_EXT_CODE = 4
+NUMPY_NDARRAY_FRAME_EXT_CODE = 5
+# Left as an ExtType by "ext_decode", marks optional args not sent in compact args
+MISSING_EXT_CODE = 6
+# Also decode the marker dicts used before the ext types, see "set_legacy_unpacking"
+LEGACY_UNPACKING = False
+# Each thread's packers, see "get_packer"
+PACKERS = threading.local()
 
 
 def custom_encode(obj):
     """
     Custom function to enhance msgpack encoding.
     obj::Object An object
-    return::{} Stringified object in a msgpack dict if a custom object
+    return::msgpack.ExtType The object as a msgpack extension type if a custom object
     """
     if isinstance(obj, Decimal):
-        return {'__decimal__': True, 'as_str': str(obj)}
+        return ExtType(DECIMAL_EXT_CODE, str(obj).encode())
 
     if isinstance(obj, set):
-        return {'__set__': True, 'value': list(obj)}
+        # Not "msg_pack", the thread's packer is still packing the set's parent
+        return ExtType(SET_EXT_CODE, packb(list(obj), default=custom_encode, use_bin_type=True))
 
     if isinstance(obj, UUID):
-        return {'__uuid__': True, 'as_str': str(obj)}
+        return ExtType(UUID_EXT_CODE, obj.bytes)
 
     if isinstance(obj, numpy.ndarray):
-        return {'__numpy.ndarray__': True, 'as_bytes': obj.tobytes()}
+        validate_numpy_ndarray(obj)
+        header = packb([get_dtype_descr(obj.dtype), obj.shape], use_bin_type=True)
+        return ExtType(NUMPY_NDARRAY_EXT_CODE, header + obj.tobytes())
 
     return obj
 
 
+def ext_decode(code, data):
+    """
+    Custom function to decode the msgpack extension types of "custom_encode".
+    code::int The extension type's code
+    data::bytes
+    return::Object The decoded object (The ExtType itself if an unknown code)
+    """
+    if code == DECIMAL_EXT_CODE:
+        return Decimal(data.decode())
+
+    if code == SET_EXT_CODE:
+        return set(msg_unpack(data))
+
+    if code == UUID_EXT_CODE:
+        return UUID(bytes=data)
+
+    if code == NUMPY_NDARRAY_EXT_CODE:
+        unpacker = Unpacker(raw=False)
+        unpacker.feed(data)
+        descr, shape = unpacker.unpack()
+        return numpy.frombuffer(data, get_dtype(descr), offset=unpacker.tell()).reshape(shape)
+
+    return ExtType(code, data)
+
+
 def custom_decode(obj):
     """
-    Custom function to enchance msgpack decoding.
+    Custom function to enchance msgpack decoding. Decodes the marker dicts
+    custom objects were encoded as before the extension types.
     obj::{} A dictionary representition of an object already unwrapped by msgpack
     return::Object The decoded object if a custom object
     """
@@ -52,11 +95,175 @@ def msg_pack(obj):
     """
     Custom msgpack packing method
     """
-    return packb(obj, default=custom_encode, use_bin_type=True)
+    return get_packer().pack(obj)
 
 
 def msg_unpack(packb_obj):
     """
-    Custom msgpack unpacking method
+    Custom msgpack unpacking method. Unpacks straight from the given buffer,
+    unlike a reused "Unpacker" which first copies each message into its own.
+    packb_obj::bytes or memoryview (ex. A zmq.Frame's buffer)
+    """
+    if LEGACY_UNPACKING:
+        return unpackb(packb_obj, ext_hook=ext_decode, object_hook=custom_decode, raw=False)
+
+    return unpackb(packb_obj, ext_hook=ext_decode, raw=False)
+
+
+def msg_pack_frames(obj):
+    """
+    Custom msgpack packing method for multipart messages. Numpy arrays aren't
+    copied into the packed message, each array's memory is its own frame
+    after it and the packed message only holds its dtype, shape and strides.
+    Send the frames with "copy=False" so zmq doesn't copy the arrays either.
+    obj::Object
+    return::[bytes or numpy.ndarray] The packed object followed by each array
+    """
+    frames_encoder = get_frames_encoder()
+    frames = frames_encoder.frames = [None]
+
+    try:
+        frames[0] = frames_encoder.packer.pack(obj)
+    finally:
+        frames_encoder.frames = None
+
+    return frames
+
+
+def msg_unpack_frames(frames):
+    """
+    Custom msgpack unpacking method for the frames of "msg_pack_frames".
+    Each numpy array is made over the memory of its frame, without a copy.
+    frames::[bytes or zmq.Frame] (Received with "copy=False" for no copies)
+    return::Object
+    """
+    buffers = [getattr(frame, 'buffer', frame) for frame in frames]
+
+    def decode(code, data):
+        if code != NUMPY_NDARRAY_FRAME_EXT_CODE:
+            return ext_decode(code, data)
+
+        frame_idx, descr, shape, strides = unpackb(data, raw=False)
+        return numpy.ndarray(shape, get_dtype(descr), buffer=buffers[frame_idx + 1], strides=strides)
+
+    if LEGACY_UNPACKING:
+        return unpackb(buffers[0], ext_hook=decode, object_hook=custom_decode, raw=False)
+
+    return unpackb(buffers[0], ext_hook=decode, raw=False)
+
+
+class FramesEncoder:
+    """
+    Packer default function for "msg_pack_frames", which collects each
+    numpy array into the frames of the message being packed.
+    """
+    __slots__ = ('packer', 'frames')
+
+    def __init__(self):
+        self.packer = Packer(default=self.encode, use_bin_type=True)
+        self.frames = None
+
+    def encode(self, obj):
+        """
+        obj::Object
+        return::msgpack.ExtType The object as a msgpack extension type if a custom object
+        """
+        if not isinstance(obj, numpy.ndarray):
+            return custom_encode(obj)
+
+        validate_numpy_ndarray(obj)
+        if not (obj.flags.c_contiguous or obj.flags.f_contiguous):
+            obj = numpy.ascontiguousarray(obj)
+
+        header = [len(self.frames) - 1, get_dtype_descr(obj.dtype), obj.shape, obj.strides]
+        # A 1-D view of the array's memory (in memory order), not a copy
+        self.frames.append(obj.ravel(order='K'))
+        return ExtType(NUMPY_NDARRAY_FRAME_EXT_CODE, packb(header, use_bin_type=True))
+
+
+def get_packer():
+    """
+    Get this thread's packer for "msg_pack". Packers are reused, so their
+    buffer isn't allocated (and grown) again for each message, but can't
+    be shared by threads.
+    return::msgpack.Packer
+    """
+    packer = getattr(PACKERS, 'packer', None)
+
+    if packer is None:
+        packer = PACKERS.packer = Packer(default=custom_encode, use_bin_type=True)
+
+    return packer
+
+
+def get_frames_encoder():
+    """
+    Get this thread's encoder (and its packer) for "msg_pack_frames".
+    return::FramesEncoder
+    """
+    frames_encoder = getattr(PACKERS, 'frames_encoder', None)
+
+    if frames_encoder is None:
+        frames_encoder = PACKERS.frames_encoder = FramesEncoder()
+
+    return frames_encoder
+
+
+def validate_numpy_ndarray(obj):
+    """
+    Only arrays of plain values can be sent, arrays of objects hold pointers.
+    obj::numpy.ndarray
+    """
+    if obj.dtype.hasobject:
+        raise TypeError('Can not pack numpy arrays with a "{}" dtype!'.format(obj.dtype))
+
+
+def get_dtype_descr(dtype):
+    """
+    The str of a structured dtype is only its size (ex. "|V12"), so its
+    fields are sent instead.
+    dtype::numpy.dtype
+    return::str or [] ex. "<f8" or [('x', '<i4'), ('y', '<f8')]
+    """
+    if dtype.names is None:
+        return dtype.str
+
+    return dtype_to_descr(dtype)
+
+
+def get_dtype(descr):
+    """
+    descr::str or [] From "get_dtype_descr" (With its tuples unpacked as lists)
+    return::numpy.dtype
+    """
+    if isinstance(descr, str):
+        return numpy.dtype(descr)
+
+    return descr_to_dtype(get_descr_fields(descr))
+
+
+def get_descr_fields(descr):
+    """
+    Turn the fields of an unpacked structured dtype descr back into tuples.
+    descr::[[name, format, shape]] (shape is optional, format is nested fields if a list)
+    return::[(name, format, shape)]
+    """
+    fields = []
+
+    for name, field_format, *shape in descr:
+        name = tuple(name) if isinstance(name, list) else name
+        field_format = get_descr_fields(field_format) if isinstance(field_format, list) else field_format
+        fields.append((name, field_format, *[tuple(dims) for dims in shape]))
+
+    return fields
+
+
+def set_legacy_unpacking(is_enabled):
+    """
+    While services sending the old marker dicts (ex. {'__decimal__': True, ...})
+    are still running, decode them as well as the extension types. Every map
+    received is checked for the markers, so only enable it during a rollout.
+    is_enabled::bool
     """
-    return unpackb(packb_obj, object_hook=custom_decode, raw=False)
+    global LEGACY_UNPACKING
+    LEGACY_UNPACKING = is_enabled
@@ -0,0 +1,255 @@
+""" File to house the polling functions used by the service loop """
+
+import time
+import zmq
+from service_framework.utils.logging_utils import get_logger
+
+LOG = get_logger()
+QUEUEING_DELAY_METRICS = {}
+
+
+def get_socket_map(polling_list):
+    """
+    Build the map used to go from a polled socket to the item containing
+    the functions to trigger. Built once so each ready socket is an O(1) lookup.
+    polling_list = [{
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        ...
+    }]
+    return::{zmq.Context.Socket: {}}
+    """
+    socket_map = {}
+
+    for item in polling_list:
+        socket = item['inbound_socket']
+
+        if socket in socket_map:
+            err = 'Socket for item "{}" is already being polled!'.format(item)
+            LOG.error(err)
+            raise ValueError(err)
+
+        socket_map[socket] = item
+
+    return socket_map
+
+
+def get_ready_items(poller, socket_map, timeout_ms=0):
+    """
+    Poll every registered socket exactly once and return only the items
+    whose sockets have a message ready.
+    poller::zmq.Poller
+    socket_map::{zmq.Context.Socket: {}}
+    timeout_ms::int Time to block waiting for a ready socket (None blocks forever)
+    return::[{}] The items of each ready socket
+    """
+    ready_items = []
+
+    for socket, event in poller.poll(timeout_ms):
+        if not event & zmq.POLLIN:
+            LOG.debug('Polled socket for item "%s" not zmq.POLLIN!', socket_map[socket])
+            continue
+
+        ready_items.append(socket_map[socket])
+
+    return ready_items
+
+
+def get_priority_sorted_items(ready_items):
+    """
+    Order the ready items so higher priority classes are handled first.
+    Items of the same priority keep their polled order.
+    ready_items::[{}]
+    return::[{}]
+    """
+    return sorted(ready_items, key=lambda item: -item.get('priority', 0))
+
+
+def get_queueing_delay_metrics():
+    """
+    Get the queueing delay of each priority class recorded in this process.
+    The delay is the time between the poll returning with the message's socket
+    ready and the service loop handling the message. Time the message spent
+    in zmq's buffers before that poll isn't included, so this measures how long
+    a class waits behind the other classes' messages, not end to end latency.
+    return = {
+        priority::int: {
+            'num_messages': int,
+            'mean_delay_s': float,
+            'max_delay_s': float,
+        },
+    }
+    """
+    return {
+        priority: {
+            'num_messages': metrics['num_messages'],
+            'mean_delay_s': metrics['total_delay_s'] / metrics['num_messages'],
+            'max_delay_s': metrics['max_delay_s'],
+        }
+        for priority, metrics in QUEUEING_DELAY_METRICS.items()
+    }
+
+
+def get_queueing_delay_metrics_logger(log_interval_s=60):
+    """
+    Create the function the service loop calls to periodically log (and then
+    reset) the queueing delay metrics. The metrics live in the service's own
+    process, so logging them is how they are seen from outside of it.
+    log_interval_s::float Time between each log of the metrics
+    return::def(now) Where now is time.monotonic()
+    """
+    local_state = {'last_log_time': time.monotonic()}
+
+    def log_queueing_delay_metrics(now):
+        """
+        Log the metrics if at least log_interval_s has passed since the last log.
+        now::float time.monotonic()
+        """
+        if now - local_state['last_log_time'] < log_interval_s:
+            return
+
+        local_state['last_log_time'] = now
+
+        if QUEUEING_DELAY_METRICS:
+            LOG.info('Queueing delay by priority: %s', get_queueing_delay_metrics())
+            reset_queueing_delay_metrics()
+
+    return log_queueing_delay_metrics
+
+
+def get_scheduler_state(polling_list):
+    """
+    Create the state used to schedule the ready items of the polling list
+    with deficit round robin.
+    polling_list = [{
+        'inbound_socket': zmq.Context.Socket,
+        'priority': int,
+        ...
+    }]
+    return = {
+        'deficits': {zmq.Context.Socket: float},
+        'higher_priority_sockets': {zmq.Context.Socket: [zmq.Context.Socket]},
+        'ready_time': float,
+    }
+    """
+    return {
+        'deficits': {item['inbound_socket']: 0.0 for item in polling_list},
+        'higher_priority_sockets': {
+            item['inbound_socket']: [
+                other['inbound_socket'] for other in polling_list
+                if other.get('priority', 0) > item.get('priority', 0)
+            ]
+            for item in polling_list
+        },
+        'ready_time': time.monotonic(),
+    }
+
+
+def is_any_socket_ready(sockets):
+    """
+    Check, without polling, if any of the provided sockets has a message waiting.
+    sockets::[zmq.Context.Socket]
+    return::bool
+    """
+    for socket in sockets:
+        if socket.get(zmq.EVENTS) & zmq.POLLIN:
+            return True
+    return False
+
+
+def record_queueing_delay(priority, delay_s):
+    """
+    Record how long a message of the provided priority class waited to be handled.
+    priority::int
+    delay_s::float
+    """
+    metrics = QUEUEING_DELAY_METRICS.get(priority)
+
+    if metrics is None:
+        metrics = {'num_messages': 0, 'total_delay_s': 0.0, 'max_delay_s': 0.0}
+        QUEUEING_DELAY_METRICS[priority] = metrics
+
+    metrics['num_messages'] += 1
+    metrics['total_delay_s'] += delay_s
+    metrics['max_delay_s'] = max(metrics['max_delay_s'], delay_s)
+
+
+def reset_queueing_delay_metrics():
+    """
+    Clear all of the recorded queueing delay metrics.
+    """
+    QUEUEING_DELAY_METRICS.clear()
+
+
+def get_timer_functions(polling_list):
+    """
+    polling_list = [{
+        'timer_function': def(now) -> timeout_ms, # Only on timed connections
+        ...
+    }]
+    return::[def(now) -> timeout_ms] The timer function of each timed item
+    """
+    return [item['timer_function'] for item in polling_list if item.get('timer_function')]
+
+
+def fire_due_timers(timer_functions, timeout_ms, now):
+    """
+    Fire every due timer (which makes its socket ready) and shorten the poll
+    timeout so the poll returns in time for the next fire.
+    timer_functions::[def(now) -> timeout_ms] From "get_timer_functions"
+    timeout_ms::int The poll timeout of the wait strategy
+    now::float time.monotonic()
+    return::int
+    """
+    for timer_function in timer_functions:
+        timer_timeout_ms = timer_function(now)
+
+        if timer_timeout_ms < timeout_ms:
+            timeout_ms = timer_timeout_ms
+
+    return timeout_ms
+
+
+def get_wait_strategy(wait_strategy='block', block_timeout_ms=100, spin_time_s=0.001):
+    """
+    Create the function the service loop calls to decide how long the next
+    poll should block for.
+    'spin': Never block (lowest latency, 100% CPU while idle)
+    'block': Block in poll until a message arrives (~0% CPU while idle)
+    'adaptive': Spin while traffic is flowing, block once idle for spin_time_s
+    wait_strategy::str One of 'spin', 'block' or 'adaptive'
+    block_timeout_ms::int Max time to block so the loop can check if it should stop
+    spin_time_s::float Time without traffic before 'adaptive' starts blocking
+    return::def(had_ready_items) -> timeout_ms
+    """
+    if wait_strategy == 'spin':
+        return lambda had_ready_items: 0
+
+    if wait_strategy == 'block':
+        return lambda had_ready_items: block_timeout_ms
+
+    if wait_strategy != 'adaptive':
+        err = 'Wait strategy "{}" not one of "spin", "block" or "adaptive"!'.format(wait_strategy)
+        LOG.error(err)
+        raise ValueError(err)
+
+    local_state = {'last_ready_time': 0}
+
+    def get_adaptive_timeout_ms(had_ready_items):
+        """
+        Spin right after traffic so the next message is picked up as soon
+        as possible, otherwise block so an idle service doesn't burn CPU.
+        had_ready_items::bool If the last poll returned any ready items
+        """
+        now = time.monotonic()
+
+        if had_ready_items:
+            local_state['last_ready_time'] = now
+            return 0
+
+        if now - local_state['last_ready_time'] < spin_time_s:
+            return 0
+
+        return block_timeout_ms
+
+    return get_adaptive_timeout_ms
@@ -1,19 +1,27 @@
 """ File to house service utility functions """
 
+import inspect
 import threading
 import time
 import uuid
 import zmq
 from service_framework.utils import (
+    asyncio_service_utils,
     connection_utils,
+    handler_utils,
+    ingress_utils,
     logging_utils,
+    polling_utils,
     socket_utils,
+    thread_pool_service_utils,
     utils,
-    validation_utils
+    validation_utils,
+    watchdog_utils
 )
 
 LOG = logging_utils.get_logger()
 RUN_FLAG = True
+SERVICE_LOOP_ENGINES = ('sync', 'asyncio', 'threads', 'pipelined')
 
 
 def entrance_point(
@@ -22,7 +30,7 @@ def entrance_point(
         addresses,
         logger_args_dict,
         is_main=False,
-        min_wait_time_s=0):
+        service_loop_args_dict=None):
     """
     service_path::obj Either a string -> to then import the service file or an object itself.
     addresses = {
@@ -43,8 +51,17 @@ def entrance_point(
         file_loglevel: str,
         backup_count: int,
     }
+    service_loop_args_dict = {
+        min_wait_time_s: float,
+        wait_strategy: str,
+        engine: str,
+        num_worker_threads: int,
+        earliest_deadline_first: bool,
+        stall_threshold_s: float,
+    }
     """
-    logging_utils.setup_package_logger(**logger_args_dict)
+    logging_utils.reset_package_logger(**logger_args_dict)
+    service_loop_args_dict = service_loop_args_dict if service_loop_args_dict else {}
 
     if isinstance(service_definition, str):
         service_definition = utils.import_python_file_from_cwd(service_definition)
@@ -68,50 +85,115 @@ def entrance_point(
             connections,
             config,
             logger_args_dict,
-            min_wait_time_s
+            service_loop_args_dict
         )
     else:
         run_service(
             connections,
             config,
             logger_args_dict,
-            min_wait_time_s
+            **service_loop_args_dict
         )
 
 
-def get_all_new_payloads(polling_list, poller):
+def get_all_new_payloads(ready_items, scheduler_state=None):
     """
-    polling_list = [{
+    Receive the waiting messages of each ready item without blocking.
+    Higher priority items are handled first, and within a priority class each
+    item gets "weight * max_messages_per_poll" messages per pass (deficit round
+    robin). Before each item is drained the higher priority sockets are checked,
+    and the pass ends early if any of them has a message waiting.
+    Payloads are yielded one at a time so each one is handled before the next
+    receive. (Needed by sockets that must reply before receiving again)
+    Messages decoded to None (malformed) are dropped.
+    Items with an ingress queue first receive every waiting message into it
+    (see "ingress_utils.ingest") and are then handled from the queue.
+    ready_items = [{
         'inbound_socket': zmq.Context.Socket,
-        'decode_message': def(bytes) -> payload,
+        'decode_message': def([bytes]) -> payload, # [zmq.Frame] if 'zero_copy'
+        'zero_copy': bool, # Receive without copying the frames' memory
+        'max_messages_per_poll': int,
+        'priority': int,
+        'weight': float,
+        'ingress_queue': deque, # Only on items with an ingress queue
         'args_validator': def(args),
         'connection_function': def(args) -> args or None,
         'model_function': def(args, to_send, conifg) -> return_args or None,
         'return_validator': def(return_args)
         'return_function': def(return_args),
     }]
-    poller::zmq.Poller
+    scheduler_state::{} From polling_utils.get_scheduler_state (Carries deficits across calls)
+    return::generator(({}, payload)) Each ready item and a payload received on it
     """
-    payloads = []
-
-    for idx, item in enumerate(polling_list):
-        polled_socket = dict(poller.poll(idx))
-        current_socket = item['inbound_socket']
-
-        if not current_socket in polled_socket:
-            payloads.append(None)
-            continue
-
-        if polled_socket[current_socket] != zmq.POLLIN:
-            LOG.debug('Current socket from item "%s" not zmq.POLLIN!', item)
-            payload.append(None)
-            continue
+    if scheduler_state is None:
+        scheduler_state = polling_utils.get_scheduler_state(ready_items)
+
+    deficits = scheduler_state['deficits']
+    ready_time = scheduler_state['ready_time']
+
+    for item in polling_utils.get_priority_sorted_items(ready_items):
+        socket = item['inbound_socket']
+        priority = item.get('priority', 0)
+        higher_priority_sockets = scheduler_state['higher_priority_sockets'][socket]
+
+        if polling_utils.is_any_socket_ready(higher_priority_sockets):
+            if logging_utils.DEBUG_ENABLED:
+                LOG.debug('Higher priority socket ready, ending pass early...')
+            return
+
+        quantum = item.get('weight', 1.0) * item.get('max_messages_per_poll', 1)
+        deficit = deficits[socket] + quantum
+        ingress_queue = item.get('ingress_queue')
+        copy = not item.get('zero_copy', False)
+
+        if ingress_queue is not None:
+            ingress_utils.ingest(item)
+
+        try:
+            while deficit >= 1:
+                if ingress_queue is not None:
+                    if not ingress_queue:
+                        deficit = 0.0
+                        break
+                    frames = ingress_queue.popleft()
+                else:
+                    try:
+                        frames = socket.recv_multipart(zmq.NOBLOCK, copy=copy)
+                    except zmq.Again:
+                        deficit = 0.0
+                        break
+
+                deficit -= 1
+                polling_utils.record_queueing_delay(priority, time.monotonic() - ready_time)
+                payload = item['decode_message'](frames)
+
+                if payload is not None:
+                    yield item, payload
+
+        finally: # Also saved if the caller stops iterating early
+            deficits[socket] = deficit
+
+
+def get_return_payload(payload, return_args):
+    """
+    Create the payload sent back through an inbound connection's return function.
+    payload = {
+        'args': {},
+        'workflow_id': str,
+        'envelope': [bytes], # Only on connections that route replies
+    }
+    return_args::{}
+    return::{}
+    """
+    return_payload = {
+        'return_args': return_args,
+        'workflow_id': payload.get('workflow_id'),
+    }
 
-        binary_message = current_socket.recv()
-        payload = item['decode_message'](binary_message)
-        payloads.append(payload)
+    if 'envelope' in payload:
+        return_payload['envelope'] = payload['envelope']
 
-    return payloads
+    return return_payload
 
 
 def get_polling_list(connections):
@@ -126,7 +208,7 @@ def get_polling_list(connections):
     }
     return::[{
         'inbound_socket': zmq.Context.Socket,
-        'decode_message': def(bytes) -> payload,
+        'decode_message': def([bytes]) -> payload,
         'args_validator': def(args),
         'connection_function': def(args) -> args or None,
         'model_function': def(args, to_send, conifg) -> return_args or None,
@@ -143,7 +225,9 @@ def get_polling_list(connections):
         if side in connections:
             for connection_name, connection in connections[side].items():
                 LOG.debug('Getting all sockets and function from %s', connection_name)
-                polling_list += connection.get_inbound_sockets_and_triggered_functions()
+                for item in connection.get_inbound_sockets_and_triggered_functions():
+                    item['connection_name'] = connection_name
+                    polling_list.append(item)
 
     LOG.debug('Got %s sockets and functions!', len(polling_list))
     return polling_list
@@ -185,7 +269,7 @@ def run_init_function(imported_service, connections, config, logger_args_dict):
         LOG.warning('Could not find "init_function" in service. Skipping...')
 
 
-def run_main(main_func, connections, config, logger_args_dict, min_wait_time_s=0):
+def run_main(main_func, connections, config, logger_args_dict, service_loop_args_dict=None):
     """
     This is used to run a program that will be on the leading edge of a
     Python Service Framework graph or a program that will not respond to
@@ -206,6 +290,14 @@ def run_main(main_func, connections, config, logger_args_dict, min_wait_time_s=0
         file_loglevel: str,
         backup_count: int,
     }
+    service_loop_args_dict = {
+        min_wait_time_s: float,
+        wait_strategy: str,
+        engine: str,
+        num_worker_threads: int,
+        earliest_deadline_first: bool,
+        stall_threshold_s: float,
+    }
     """
     to_send = setup_to_send(
         connections,
@@ -227,9 +319,9 @@ def run_main(main_func, connections, config, logger_args_dict, min_wait_time_s=0
         args=(
             connections,
             config,
-            logger_args_dict,
-            min_wait_time_s
-        )
+            logger_args_dict
+        ),
+        kwargs=service_loop_args_dict if service_loop_args_dict else {}
     )
     service_thread.daemon = True
     service_thread.start()
@@ -239,7 +331,16 @@ def run_main(main_func, connections, config, logger_args_dict, min_wait_time_s=0
     RUN_FLAG = False # Not needed, but makes tests run much faster
 
 
-def run_service(connections, config, logger_args_dict, min_wait_time_s=0):
+def run_service(
+        connections,
+        config,
+        logger_args_dict,
+        min_wait_time_s=0,
+        wait_strategy='block',
+        engine='sync',
+        num_worker_threads=4,
+        earliest_deadline_first=False,
+        stall_threshold_s=None):
     """
     connections = {
         'in': {
@@ -259,72 +360,303 @@ def run_service(connections, config, logger_args_dict, min_wait_time_s=0):
         file_loglevel: str,
         backup_count: int,
     }
+    min_wait_time_s::float Time to sleep between each service loop
+    wait_strategy::str How to wait for new messages ('spin', 'block' or 'adaptive')
+    engine::str Run the service loop by polling ('sync'), on an event loop ('asyncio'),
+        by polling with model functions run on a thread pool ('threads') or by
+        polling with model functions run on one handler thread ('pipelined')
+    num_worker_threads::int Number of threads running model functions ('threads' only)
+    earliest_deadline_first::bool Handle the messages received each pass by deadline
+        instead of by connection (not for 'asyncio')
+    stall_threshold_s::float Log the stack of the service loop once handling one
+        message takes longer than this (None to disable, not for 'asyncio')
     """
+    if engine == 'asyncio':
+        asyncio_service_utils.run_service_async(connections, config, logger_args_dict)
+        return
+
+    if engine == 'threads':
+        thread_pool_service_utils.run_service_threaded(
+            connections,
+            config,
+            logger_args_dict,
+            num_worker_threads=num_worker_threads,
+            min_wait_time_s=min_wait_time_s,
+            wait_strategy=wait_strategy,
+            earliest_deadline_first=earliest_deadline_first,
+            stall_threshold_s=stall_threshold_s
+        )
+        return
+
+    if engine == 'pipelined':
+        thread_pool_service_utils.run_service_pipelined(
+            connections,
+            config,
+            logger_args_dict,
+            min_wait_time_s=min_wait_time_s,
+            wait_strategy=wait_strategy,
+            earliest_deadline_first=earliest_deadline_first,
+            stall_threshold_s=stall_threshold_s
+        )
+        return
+
+    if engine != 'sync':
+        err = 'Service loop engine "{}" not one of {}!'.format(engine, SERVICE_LOOP_ENGINES)
+        LOG.error(err)
+        raise ValueError(err)
+
     LOG.debug('Extracting Sockets to Poll...')
     polling_list = get_polling_list(connections)
+    validate_no_async_model_functions(polling_list, engine)
+    add_handlers(polling_list, connections, config, logger_args_dict)
     sockets = [item['inbound_socket'] for item in polling_list]
     poller = socket_utils.get_poller_socket(sockets)
+    socket_map = polling_utils.get_socket_map(polling_list)
+    scheduler_state = polling_utils.get_scheduler_state(polling_list)
+    get_timeout_ms = polling_utils.get_wait_strategy(wait_strategy)
+    log_queueing_delay_metrics = polling_utils.get_queueing_delay_metrics_logger()
+    log_shed_message_counts = ingress_utils.get_shed_message_counts_logger()
+    queued_items = ingress_utils.add_ingress_queues(polling_list)
+    batch_handlers = handler_utils.get_batch_handlers(polling_list)
+    timer_functions = polling_utils.get_timer_functions(polling_list)
 
     if not polling_list:
         LOG.debug('Not Starting Service Loop due to no polling list...')
         return
 
+    stall_detector = None
+    if stall_threshold_s is not None:
+        stall_detector = watchdog_utils.StallDetector(stall_threshold_s)
+        stall_detector.start()
+
     LOG.debug('Starting Service Loop...')
+    ready_items = []
     global RUN_FLAG
-    while RUN_FLAG:
+    try:
+        while RUN_FLAG:
+
+            if min_wait_time_s:
+                time.sleep(min_wait_time_s)
+
+            has_queued_messages = any(item['ingress_queue'] for item in queued_items)
+            timeout_ms = 0 if has_queued_messages else get_timeout_ms(bool(ready_items))
+            if batch_handlers:
+                timeout_ms = handler_utils.get_batch_timeout_ms(
+                    batch_handlers,
+                    timeout_ms,
+                    time.monotonic()
+                )
+            if timer_functions:
+                timeout_ms = polling_utils.fire_due_timers(
+                    timer_functions,
+                    timeout_ms,
+                    time.monotonic()
+                )
 
-        if min_wait_time_s:
-            time.sleep(min_wait_time_s)
+            ready_items = polling_utils.get_ready_items(poller, socket_map, timeout_ms)
+            ready_items += ingress_utils.get_queued_items(queued_items, ready_items)
+            scheduler_state['ready_time'] = time.monotonic()
+            log_queueing_delay_metrics(scheduler_state['ready_time'])
+            log_shed_message_counts(scheduler_state['ready_time'])
 
-        payloads = get_all_new_payloads(polling_list, poller)
+            new_payloads = get_all_new_payloads(ready_items, scheduler_state)
 
-        for idx, payload in enumerate(payloads):
-            if payload is None:
-                continue
+            if earliest_deadline_first:
+                new_payloads = sorted(new_payloads, key=ingress_utils.get_deadline_sort_key)
 
-            LOG.debug('Got Payload: %s', payload)
-            args = payload.get('args')
-            workflow_id = payload.get('workflow_id')
+            for current_polled, payload in new_payloads:
+                if stall_detector is not None:
+                    stall_detector.start_handling(
+                        current_polled['connection_name'],
+                        payload.get('workflow_id')
+                    )
 
-            logging_utils.set_new_workflow_id_on_logger(workflow_id, logger_args_dict)
-            current_polled = polling_list[idx]
-            LOG.debug('Polled item: %s', current_polled)
+                current_polled['handler'].handle(payload)
+
+                if stall_detector is not None:
+                    stall_detector.finish_handling()
+
+            for handler in batch_handlers:
+                batch = handler.pop_due_batch(time.monotonic())
+                if batch is None:
+                    continue
+
+                if stall_detector is not None:
+                    stall_detector.start_handling(handler.item['connection_name'], None)
+
+                handler.handle_batch(batch)
+
+                if stall_detector is not None:
+                    stall_detector.finish_handling()
+
+        LOG.debug('Stopping Service Loop...')
+        for handler in batch_handlers:
+            if handler.batch:
+                handler.handle_batch(handler.pop_batch())
+
+    finally:
+        if stall_detector is not None:
+            stall_detector.stop()
+
+
+def add_handlers(polling_list, connections, config, logger_args_dict):
+    """
+    Compile each item of the polling list into the handler called for each
+    of its messages. (See "handler_utils.get_handler")
+    polling_list = [{
+        'inbound_socket': zmq.Context.Socket,
+        ...
+    }]
+    See "run_service" for the other arguments.
+    """
+    for item in polling_list:
+        item['handler'] = handler_utils.get_handler(item, connections, config, logger_args_dict)
+
+
+def validate_no_async_model_functions(polling_list, engine):
+    """
+    Make sure no "async def" connection function is used with an engine that
+    can't await it. (It would silently return an un-awaited coroutine)
+    polling_list = [{
+        'model_function': def(args, to_send, conifg) -> return_args or None,
+        ...
+    }]
+    engine::str The service loop engine being used
+    """
+    for item in polling_list:
+        if inspect.iscoroutinefunction(item.get('model_function', None)):
+            err = 'Connection function "{}" is "async def", which needs engine "asyncio" not "{}"!'
+            err = err.format(item['model_function'].__name__, engine)
+            LOG.error(err)
+            raise ValueError(err)
+
+
+def run_triggered_functions(current_polled, payload, connections, config, logger_args_dict):
+    """
+    Run every function triggered by a new payload on a polled socket and
+    send back the returned payload (if applicable).
+    current_polled = {
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        'args_validator': def(args),
+        'connection_function': def(args) -> args or None,
+        'model_function': def(args, to_send, conifg) -> return_args or None,
+        'return_validator': def(return_args)
+        'return_function': def(return_args),
+    }
+    payload = {
+        'args': {},
+        'workflow_id': str,
+    }
+    See "get_triggered_return_payload" for the other arguments.
+    """
+    return_payload = get_triggered_return_payload(
+        current_polled,
+        payload,
+        connections,
+        config,
+        logger_args_dict
+    )
+
+    if return_payload is not None:
+        current_polled['return_function'](return_payload)
+
+
+def get_triggered_return_payload(current_polled, payload, connections, config, logger_args_dict):
+    """
+    Run every function triggered by a new payload on a polled socket, without
+    sending anything back. Safe to call off of the thread polling the socket.
+    current_polled = {
+        'inbound_socket': zmq.Context.Socket,
+        'decode_message': def([bytes]) -> payload,
+        'args_validator': def(args),
+        'connection_function': def(args) -> args or None,
+        'model_function': def(args, to_send, conifg) -> return_args or None,
+        'return_validator': def(return_args)
+        'return_function': def(return_args),
+    }
+    payload = {
+        'args': {},
+        'workflow_id': str,
+    }
+    connections = {
+        'in': {
+            'connection_name': BaseInConnector(),
+        }
+        'out': {
+            'connection_name': BaseOutConnector(),
+        },
+    }
+    config = {
+        'config_1': 'thingy',
+        'config_2': 12345
+    }
+    logger_args_dict = {
+        console_loglevel: str,
+        log_path: str,
+        file_loglevel: str,
+        backup_count: int,
+    }
+    return::{} The payload for the return function (None if no return function)
+    """
+    debug_enabled = logging_utils.DEBUG_ENABLED
+
+    if debug_enabled:
+        LOG.debug('Got Payload: %s', payload)
+    if ingress_utils.is_expired(payload):
+        return ingress_utils.get_expired_return_payload(current_polled, payload)
 
+    args = payload.get('args')
+    workflow_id = payload.get('workflow_id')
+
+    token = logging_utils.set_new_workflow_id_on_logger(
+        workflow_id,
+        logger_args_dict,
+        current_polled.get('connection_name')
+    )
+
+    try:
+        if debug_enabled:
+            LOG.debug('Polled item: %s', current_polled)
             LOG.debug('Validating Args for the model function: %s', args)
-            if current_polled.get('args_validator', None):
-                current_polled['args_validator'](args)
+        if current_polled.get('args_validator', None):
+            current_polled['args_validator'](args)
 
+        if debug_enabled:
             LOG.debug('Running Connection/State Function (if applicable)')
-            post_func = current_polled.get('connection_function', None)
-            args = args if post_func is None else post_func(args)
+        post_func = current_polled.get('connection_function', None)
+        args = args if post_func is None else post_func(args)
+        if debug_enabled:
             LOG.debug('Finished Running Connection/State Function args: %s', args)
 
-            return_args = args
-            if current_polled.get('model_function', None):
-                to_send = setup_to_send(
-                    connections,
-                    logger_args_dict,
-                    workflow_id=workflow_id,
-                    increment_id=True
-                )
+        return_args = args
+        if current_polled.get('model_function', None):
+            to_send = setup_to_send(
+                connections,
+                logger_args_dict,
+                workflow_id=workflow_id,
+                increment_id=True,
+                deadline=payload.get('deadline')
+            )
 
-                return_args = current_polled['model_function'](
-                    args,
-                    to_send,
-                    config
-                )
+            return_args = current_polled['model_function'](
+                args,
+                to_send,
+                config
+            )
 
-            if current_polled.get('return_function', None):
-                if current_polled.get('return_validator', None):
+        return_payload = None
+        if current_polled.get('return_function', None):
+            if current_polled.get('return_validator', None):
+                if debug_enabled:
                     LOG.debug('Validating Returned Args: %s', return_args)
-                    current_polled['return_validator'](return_args)
+                current_polled['return_validator'](return_args)
 
-                current_polled['return_function']({
-                    'return_args': return_args,
-                    'workflow_id': payload.get('workflow_id'),
-                })
+            return_payload = get_return_payload(payload, return_args)
+    finally:
+        logging_utils.reset_workflow_id_on_logger(token)
 
-            logging_utils.set_new_workflow_id_on_logger(None, logger_args_dict)
+    return return_payload
 
 
 def setup_addresses(addresses, imported_service, config):
@@ -431,6 +763,32 @@ def setup_service_connections(addresses, imported_service, config):
         LOG.warning('No "connection_models" in Service File! Skipping connection setup...')
         return {}
 
+    return connection_utils.setup_connections(
+        get_connection_models(imported_service, config),
+        addresses
+    )
+
+
+def get_connection_models(imported_service, config):
+    """
+    Get the service's connection models, after "setup_connection_models" (if any).
+    imported_service::module The imported service python file
+    config = {
+        'config_key_1': 'config_val_1'
+    }
+    return = {
+        'in': {
+            'connection_name': {
+                'connection_type': 'replyer | subscriber | etc',
+                ...
+            },
+        },
+        'out': {},
+    }
+    """
+    if not hasattr(imported_service, 'connection_models'):
+        return {}
+
     LOG.debug('Found "connection_models", Setting up Connections...')
     connection_models = imported_service.connection_models
 
@@ -446,13 +804,16 @@ def setup_service_connections(addresses, imported_service, config):
             LOG.error(err)
             raise ValueError(err)
 
-    return connection_utils.setup_connections(
-        connection_models,
-        addresses
-    )
+    return connection_models
 
 
-def setup_to_send(connections, logger_args_dict, workflow_id=None, increment_id=True):
+def setup_to_send(
+        connections,
+        logger_args_dict,
+        workflow_id=None,
+        increment_id=True,
+        is_async=False,
+        deadline=None):
     """
     Setup the function that the service will call to make external calls.
     connections = {
@@ -471,94 +832,171 @@ def setup_to_send(connections, logger_args_dict, workflow_id=None, increment_id=
     }
     workflow_id::str
     increment_id::bool
-    return def(connection_name, args)
+    is_async::bool If the returned to_send should be a coroutine function
+    deadline::float Epoch seconds the handled request must be answered by (if any)
+    return def(connection_name, args, ttl_s=None)
     """
-    local_state = {
-        'num_calls': 0,
-        'workflow_id': uuid.uuid4() if not workflow_id and increment_id else workflow_id,
-    }
+    to_send = ToSend(connections, logger_args_dict, workflow_id, increment_id, deadline)
+    return to_send.send_async if is_async else to_send
+
+
+class ToSend:
+    """
+    The "to_send" passed to model functions. Used to wrap external service
+    calls for testing/documentation/readability. A slotted object, since a
+    new one is created for every handled message.
+    """
+    __slots__ = (
+        'connections',
+        'logger_args_dict',
+        'workflow_id',
+        'increment_id',
+        'num_calls',
+        'deadline',
+    )
+
+    def __init__(self,
+                 connections,
+                 logger_args_dict,
+                 workflow_id=None,
+                 increment_id=True,
+                 deadline=None):
+        """
+        See "setup_to_send" for the arguments.
+        """
+        self.deadline = deadline
+        self.connections = connections
+        self.logger_args_dict = logger_args_dict
+        self.workflow_id = uuid.uuid4() if not workflow_id and increment_id else workflow_id
+        self.increment_id = increment_id
+        self.num_calls = 0
+
+    def __call__(self, connection_name, args, ttl_s=None):
+        """
+        Needs to be callable so when it's passed to the model function the
+        end user can simply call it. Without having to do additional
+        instantiations.
+        connection_name::str Either the connections name
+        args::{} Arguments to pass to the connectionn
+        ttl_s::float Time the downstream service has to answer (if any)
+        """
+        output_to, payload = self._get_output_to_and_payload(connection_name, args, ttl_s)
+        token = logging_utils.set_new_workflow_id_on_logger(
+            payload['workflow_id'],
+            self.logger_args_dict,
+            connection_name
+        )
 
-    def get_current_workflow_id():
+        try:
+            if logging_utils.DEBUG_ENABLED:
+                LOG.debug('Sending payload: %s', payload)
+            response = output_to.send(payload)
+            return self._handle_response(output_to, response)
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+    async def send_async(self, connection_name, args, ttl_s=None):
+        """
+        Same as calling to_send but awaitable. Used by the asyncio service
+        loop so slow downstream calls don't block the other handlers.
+        connection_name::str Either the connections name
+        args::{} Arguments to pass to the connectionn
+        ttl_s::float Time the downstream service has to answer (if any)
+        """
+        output_to, payload = self._get_output_to_and_payload(connection_name, args, ttl_s)
+        token = logging_utils.set_new_workflow_id_on_logger(
+            payload['workflow_id'],
+            self.logger_args_dict,
+            connection_name
+        )
+
+        try:
+            if logging_utils.DEBUG_ENABLED:
+                LOG.debug('Async sending payload: %s', payload)
+            response = await output_to.send_async(payload)
+            return self._handle_response(output_to, response)
+        finally:
+            logging_utils.reset_workflow_id_on_logger(token)
+
+    def _get_current_workflow_id(self):
         """
         Update the current workflow id based on the number of calls done by
         the service.
         """
-        cur_workflow_id = local_state['workflow_id']
+        cur_workflow_id = self.workflow_id
         cur_workflow_id = cur_workflow_id if cur_workflow_id else uuid.uuid4()
 
-        if local_state['num_calls'] > 0:
-            cur_workflow_id = '{}_{}'.format(cur_workflow_id, local_state['num_calls'])
+        if self.num_calls > 0:
+            cur_workflow_id = '{}_{}'.format(cur_workflow_id, self.num_calls)
 
-        if increment_id:
-            local_state['num_calls'] += 1
+        if self.increment_id:
+            self.num_calls += 1
 
         return cur_workflow_id
 
-    def create_out_payload(args, cur_workflow_id):
+    def _get_output_to_and_payload(self, connection_name, args, ttl_s=None):
         """
-        Method to create the proper payload prior to sending the payload.
-        Mainly used to increment the workflow id for multiple branching
-        calls.
+        Validate the args and create the proper payload prior to sending it.
+        Mainly used to increment the workflow id for multiple branching calls.
+        The deadline sent is the earliest of the handled request's deadline
+        and the ttl of this call, so deadlines propagate down the service graph.
+        connection_name::str
         args::{}
-        return::{}
+        ttl_s::float
+        return::(BaseConnection, {}) The connection to send to and the payload
         """
-        return {
+        deadline = self.deadline
+        if ttl_s is not None:
+            ttl_deadline = time.time() + ttl_s
+            deadline = ttl_deadline if deadline is None else min(deadline, ttl_deadline)
+
+        cur_workflow_id = self._get_current_workflow_id()
+
+        if logging_utils.DEBUG_ENABLED:
+            LOG.debug(
+                'Sending to connection_name "%s" args "%s" with workflow id "%s"',
+                connection_name,
+                args,
+                cur_workflow_id
+            )
+
+        output_to = self.connections['out'][connection_name]
+        output_to.args_validator(args)
+
+        payload = {
             'args': args,
             'workflow_id': cur_workflow_id
         }
 
-    def parse_out_response(response):
-        """
-        Method to set response after sending the payload.
-        response::{}
-        return::{}
-        """
-        if response is None:
-            return {}
-        return response.get('return_args')
+        if deadline is not None:
+            payload['deadline'] = deadline
 
-    def to_send(connection_name, args):
+        return output_to, payload
+
+    def _handle_response(self, output_to, response):
         """
-        Used to wrap external service calls for testing/documentation/readability.
-        Needs to be a function so when it's passed to the model function the
-        end user can simply call this function. Without having to do additional
-        instantiations.
-        connection_name::str Either the connections name
-        args::{} Arguments to pass to the connectionn
+        Parse and validate the response of a send.
+        output_to::BaseConnection The connection that was sent to
+        response::{}
+        return::{} The returned arguments
         """
-        cur_workflow_id = get_current_workflow_id()
-        logging_utils.set_new_workflow_id_on_logger(cur_workflow_id, logger_args_dict)
-
-        LOG.debug(
-            'Sending to connection_name "%s" args "%s"',
-            connection_name,
-            args
-        )
-
-        output_to = connections['out'][connection_name]
+        debug_enabled = logging_utils.DEBUG_ENABLED
 
-        LOG.debug('Checking args to send')
-        output_to.args_validator(args)
-
-        LOG.debug('Creating payload to send')
-        payload = create_out_payload(args, cur_workflow_id)
-
-        LOG.debug('Sending payload: %s', payload)
-        response = output_to.send(payload)
+        if debug_enabled:
+            LOG.debug('Parsing returned Response: %s', response)
+        if response is not None and 'error' in response:
+            err = 'Connection returned an error: {}'.format(response['error'])
+            LOG.error(err)
+            raise RuntimeError(err)
 
-        LOG.debug('Parsing returned Response: %s', response)
-        returned_args = parse_out_response(response)
+        returned_args = {} if response is None else response.get('return_args')
 
-        LOG.debug('Validating response from send function')
         output_to.return_validator(returned_args)
 
-        LOG.debug('Returning Response arguments: %s', returned_args)
-        logging_utils.set_new_workflow_id_on_logger(None, logger_args_dict)
-
+        if debug_enabled:
+            LOG.debug('Returning Response arguments: %s', returned_args)
         return returned_args
 
-    return to_send
-
 
 def setup_sig_handler_funcs(imported_service, config, to_send):
     """
@@ -1,8 +1,11 @@
 """ File to house socket creation functions """
 
+import os
+import threading
 import time
 import zmq
 
+from service_framework.utils.constants import WORKER_READY_MESSAGE
 from service_framework.utils.logging_utils import get_logger
 from service_framework.utils.msgpack_utils import msg_pack
 
@@ -22,6 +25,19 @@ def get_poller_socket(sockets_to_poll):
     return poller
 
 
+def get_dealer_socket(address, context):
+    """
+    Dealer sockets are used by requesters that need several requests
+    in flight at once.
+    address::str ex. "127.0.0.1:5001"
+    context::zmq.Context()
+    """
+    socket = context.socket(zmq.DEALER)
+    uri = 'tcp://%s' % address
+    socket.connect(uri)
+    return socket
+
+
 def get_publisher_socket(address, context, is_x_pub=False, wait_after_creation_s=0.15):
     """
     address::str ex. "127.0.0.1:5001"
@@ -67,6 +83,44 @@ def get_replyer_socket(address, context):
     return socket
 
 
+def get_router_socket(address, context):
+    """
+    Router sockets are used by replyers so several requests can be received
+    before replying and replies can be sent in any order.
+    address::str ex. "127.0.0.1:5001"
+    context::zmq.Context()
+    """
+    socket = context.socket(zmq.ROUTER)
+    port = address.split(':')[-1]
+    uri = 'tcp://*:%s' % port
+    socket.bind(uri)
+    return socket
+
+
+def get_worker_socket(backend_uri, context):
+    """
+    Worker sockets are used by the replyers of a worker pool's workers to
+    get requests from the pool's broker. Tells the broker it's ready once connected.
+    Identified by the worker's pid, so the broker knows which requests a dead worker had.
+    backend_uri::str ex. "ipc:///tmp/pool/reply.ipc"
+    context::zmq.Context()
+    """
+    socket = context.socket(zmq.DEALER)
+    socket.setsockopt(zmq.IDENTITY, get_worker_identity(os.getpid()))
+    socket.connect(backend_uri)
+    socket.send(WORKER_READY_MESSAGE)
+    return socket
+
+
+def get_worker_identity(pid):
+    """
+    The identity a worker's sockets connect to the pool's brokers with.
+    pid::int Of the worker process
+    return::bytes
+    """
+    return str(pid).encode()
+
+
 def get_subscriber_socket(address, context, tag='', is_binder=False):
     """
     address::str ex. "127.0.0.1:5001"
@@ -91,3 +145,49 @@ def get_subscriber_socket(address, context, tag='', is_binder=False):
         socket.connect(uri)
 
     return socket
+
+
+class ThreadSockets:
+    """
+    Lazily creates one socket per calling thread, since zmq sockets can't be
+    shared by threads. (The context they're made from can be)
+    Sockets are closed with "close", not when their thread exits, so this is
+    meant for long lived threads. (ex. The main thread, service loop and workers)
+    """
+    __slots__ = ('create_socket', 'local', 'sockets', 'lock')
+
+    def __init__(self, create_socket):
+        """
+        create_socket::def() -> zmq.Context.Socket
+        """
+        self.create_socket = create_socket
+        self.local = threading.local()
+        self.sockets = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        """
+        return::zmq.Context.Socket The calling thread's socket
+        """
+        socket = getattr(self.local, 'socket', None)
+
+        if socket is None:
+            LOG.debug('Creating socket for thread "%s"', threading.current_thread().name)
+            socket = self.create_socket()
+            self.local.socket = socket
+
+            with self.lock:
+                self.sockets.append(socket)
+
+        return socket
+
+    def close(self):
+        """
+        Close every thread's socket.
+        """
+        with self.lock:
+            for socket in self.sockets:
+                socket.close()
+            self.sockets = []
+
+        self.local = threading.local()
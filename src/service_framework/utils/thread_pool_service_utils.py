@@ -0,0 +1,285 @@
+""" File to house the thread pool service loop """
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import time
+from service_framework.utils import (
+    handler_utils,
+    ingress_utils,
+    logging_utils,
+    polling_utils,
+    service_utils,
+    socket_utils,
+    watchdog_utils
+)
+
+LOG = logging_utils.get_logger()
+PIPELINE_DEPTH = 16
+
+
+def run_service_pipelined(connections,
+                          config,
+                          logger_args_dict,
+                          min_wait_time_s=0,
+                          wait_strategy='block',
+                          earliest_deadline_first=False,
+                          stall_threshold_s=None,
+                          pipeline_depth=PIPELINE_DEPTH):
+    """
+    Run the service loop as a two stage pipeline. This thread receives and
+    decodes messages (pyzmq and msgpack spend little time holding the GIL)
+    while a single handler thread runs the model functions in order, so
+    decoding the next message overlaps handling the current one.
+    The handed over messages form a bounded queue: once "pipeline_depth" are
+    waiting (or being handled) this thread stops receiving until one is done.
+    See "run_service_threaded" for the other arguments.
+    pipeline_depth::int Max decoded messages waiting for the handler thread
+    """
+    run_service_threaded(
+        connections,
+        config,
+        logger_args_dict,
+        num_worker_threads=1,
+        min_wait_time_s=min_wait_time_s,
+        wait_strategy=wait_strategy,
+        earliest_deadline_first=earliest_deadline_first,
+        stall_threshold_s=stall_threshold_s,
+        max_in_flight=pipeline_depth
+    )
+
+
+def run_service_threaded(connections,
+                         config,
+                         logger_args_dict,
+                         num_worker_threads=4,
+                         min_wait_time_s=0,
+                         wait_strategy='block',
+                         earliest_deadline_first=False,
+                         stall_threshold_s=None,
+                         max_in_flight=None):
+    """
+    Run the service loop with every model function handled on a bounded
+    pool of worker threads. The loop thread keeps receiving and decoding
+    messages while the workers run, and is the only thread that touches the
+    inbound sockets. Finished replies are queued back to it and sent on the
+    (routed) socket they came from, so they can go out in any order.
+    connections = {
+        'in': {
+            'connection_name': BaseInConnector(),
+        }
+        'out': {
+            'connection_name': BaseOutConnector(),
+        },
+    }
+    config = {
+        'config_1': 'thingy',
+        'config_2': 12345
+    }
+    logger_args_dict = {
+        console_loglevel: str,
+        log_path: str,
+        file_loglevel: str,
+        backup_count: int,
+    }
+    num_worker_threads::int Number of threads running model functions
+    min_wait_time_s::float Time to sleep between each service loop
+    wait_strategy::str How to wait for new messages ('spin', 'block' or 'adaptive')
+    earliest_deadline_first::bool Submit the messages received each pass by deadline
+        (Every received message is submitted, even past the in flight limit)
+    stall_threshold_s::float Log the stack of a worker once handling one message
+        takes longer than this (None to disable)
+    max_in_flight::int Max messages handed to the workers and not yet replied to
+        (Defaults to twice the number of workers)
+    """
+    LOG.debug('Extracting Sockets to Poll...')
+    polling_list = service_utils.get_polling_list(connections)
+    service_utils.validate_no_async_model_functions(polling_list, 'threads')
+    service_utils.add_handlers(polling_list, connections, config, logger_args_dict)
+
+    if not polling_list:
+        LOG.debug('Not Starting Threaded Service Loop due to no polling list...')
+        return
+
+    max_in_flight = max_in_flight if max_in_flight else 2 * num_worker_threads
+    wakeup_read_fd, wakeup_write_fd = os.pipe()
+    os.set_blocking(wakeup_read_fd, False)
+    wakeup_item = {'inbound_socket': wakeup_read_fd}
+    sockets = [item['inbound_socket'] for item in polling_list]
+
+    poller = socket_utils.get_poller_socket(sockets + [wakeup_read_fd])
+    wakeup_poller = socket_utils.get_poller_socket([wakeup_read_fd])
+    socket_map = polling_utils.get_socket_map(polling_list + [wakeup_item])
+    scheduler_state = polling_utils.get_scheduler_state(polling_list)
+    get_timeout_ms = polling_utils.get_wait_strategy(wait_strategy)
+    log_queueing_delay_metrics = polling_utils.get_queueing_delay_metrics_logger()
+    log_shed_message_counts = ingress_utils.get_shed_message_counts_logger()
+    queued_items = ingress_utils.add_ingress_queues(polling_list)
+    batch_handlers = handler_utils.get_batch_handlers(polling_list)
+    timer_functions = polling_utils.get_timer_functions(polling_list)
+
+    completed = queue.SimpleQueue()
+    local_state = {'in_flight': 0}
+
+    stall_detector = None
+    if stall_threshold_s is not None:
+        stall_detector = watchdog_utils.StallDetector(stall_threshold_s)
+
+    def handle_payload(item, payload):
+        """
+        Run on a worker thread. Queue the return payload (or the error) for
+        the loop thread and wake it up.
+        """
+        if stall_detector is not None:
+            stall_detector.start_handling(item['connection_name'], payload.get('workflow_id'))
+
+        try:
+            return_payload = item['handler'].get_return_payload(payload)
+            completed.put((item, [return_payload], None))
+        except Exception as error: # pylint: disable=broad-except
+            completed.put((item, [], error))
+
+        if stall_detector is not None:
+            stall_detector.finish_handling()
+
+        os.write(wakeup_write_fd, b'\0')
+
+    def handle_batch(item, batch):
+        """
+        Run on a worker thread. Same as "handle_payload" for a whole batch.
+        """
+        if stall_detector is not None:
+            stall_detector.start_handling(item['connection_name'], None)
+
+        try:
+            completed.put((item, item['handler'].get_return_payloads(batch), None))
+        except Exception as error: # pylint: disable=broad-except
+            completed.put((item, [], error))
+
+        if stall_detector is not None:
+            stall_detector.finish_handling()
+
+        os.write(wakeup_write_fd, b'\0')
+
+    def submit(item, payload):
+        """
+        Run on the loop thread. Hand the payload to a worker, or add it to
+        its item's batch (handing the batch to a worker once full).
+        """
+        if isinstance(item['handler'], handler_utils.BatchHandler):
+            batch = item['handler'].add(payload)
+            if batch is not None:
+                local_state['in_flight'] += 1
+                executor.submit(handle_batch, item, batch)
+            return
+
+        local_state['in_flight'] += 1
+        executor.submit(handle_payload, item, payload)
+
+    def submit_due_batches():
+        """
+        Run on the loop thread. Hand every batch that has waited long enough to a worker.
+        """
+        for handler in batch_handlers:
+            batch = handler.pop_due_batch(time.monotonic())
+            if batch is not None:
+                local_state['in_flight'] += 1
+                executor.submit(handle_batch, handler.item, batch)
+
+    def send_completed_replies():
+        """
+        Run on the loop thread. Send every reply finished by the workers.
+        """
+        try:
+            os.read(wakeup_read_fd, max_in_flight)
+        except BlockingIOError:
+            pass
+
+        while True:
+            try:
+                item, return_payloads, error = completed.get_nowait()
+            except queue.Empty:
+                return
+
+            local_state['in_flight'] -= 1
+
+            if error is not None:
+                raise error
+
+            for return_payload in return_payloads:
+                if return_payload is not None:
+                    item['handler'].return_function(return_payload)
+
+    LOG.debug('Starting Threaded Service Loop with %s workers...', num_worker_threads)
+    executor = ThreadPoolExecutor(max_workers=num_worker_threads)
+    ready_items = []
+    if stall_detector is not None:
+        stall_detector.start()
+
+    try:
+        while service_utils.RUN_FLAG:
+
+            if min_wait_time_s:
+                time.sleep(min_wait_time_s)
+
+            if local_state['in_flight'] >= max_in_flight:
+                if logging_utils.DEBUG_ENABLED:
+                    LOG.debug('All workers busy, only waiting for replies...')
+                ready_items = polling_utils.get_ready_items(
+                    wakeup_poller,
+                    socket_map,
+                    get_timeout_ms(False)
+                )
+            else:
+                has_queued_messages = any(item['ingress_queue'] for item in queued_items)
+                timeout_ms = 0 if has_queued_messages else get_timeout_ms(bool(ready_items))
+                if batch_handlers:
+                    timeout_ms = handler_utils.get_batch_timeout_ms(
+                        batch_handlers,
+                        timeout_ms,
+                        time.monotonic()
+                    )
+                if timer_functions:
+                    timeout_ms = polling_utils.fire_due_timers(
+                        timer_functions,
+                        timeout_ms,
+                        time.monotonic()
+                    )
+
+                ready_items = polling_utils.get_ready_items(poller, socket_map, timeout_ms)
+                ready_items += ingress_utils.get_queued_items(queued_items, ready_items)
+            scheduler_state['ready_time'] = time.monotonic()
+            log_queueing_delay_metrics(scheduler_state['ready_time'])
+            log_shed_message_counts(scheduler_state['ready_time'])
+
+            if wakeup_item in ready_items:
+                ready_items.remove(wakeup_item)
+                send_completed_replies()
+
+            new_payloads = service_utils.get_all_new_payloads(ready_items, scheduler_state)
+
+            if earliest_deadline_first:
+                new_payloads = sorted(new_payloads, key=ingress_utils.get_deadline_sort_key)
+
+            for current_polled, payload in new_payloads:
+                submit(current_polled, payload)
+
+                if local_state['in_flight'] >= max_in_flight and not earliest_deadline_first:
+                    break
+
+            submit_due_batches()
+
+        LOG.debug('Stopping Threaded Service Loop...')
+        for handler in batch_handlers:
+            if handler.batch:
+                local_state['in_flight'] += 1
+                executor.submit(handle_batch, handler.item, handler.pop_batch())
+        executor.shutdown(wait=True)
+        send_completed_replies()
+
+    finally:
+        executor.shutdown(wait=False)
+        if stall_detector is not None:
+            stall_detector.stop()
+        os.close(wakeup_read_fd)
+        os.close(wakeup_write_fd)
@@ -3,6 +3,7 @@
 from inspect import signature
 import logging
 from types import FunctionType
+from service_framework.utils import logging_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -13,7 +14,8 @@ def validate_args(new_args, required_args, optional_args):
     required_args::{set, dict}
     optional_args::{set, dict}
     """
-    LOG.debug('NEW ARGS %s, REQUIRED %s, OPTIONAL %s', new_args, required_args, optional_args)
+    if logging_utils.DEBUG_ENABLED:
+        LOG.debug('NEW ARGS %s, REQUIRED %s, OPTIONAL %s', new_args, required_args, optional_args)
 
     if isinstance(new_args, dict):
         validate_required_arg(new_args, required_args)
@@ -38,7 +40,8 @@ def validate_optional_arg(non_required_arg, optional_type):
     non_required_arg::obj
     optional_type::obj
     """
-    LOG.debug('non_required_arg: %s, optional_type: %s', non_required_arg, optional_type)
+    if logging_utils.DEBUG_ENABLED:
+        LOG.debug('non_required_arg: %s, optional_type: %s', non_required_arg, optional_type)
     if isinstance(non_required_arg, dict):
         for key, val in non_required_arg.items():
             if type(key) in optional_type:
@@ -137,7 +140,8 @@ def validate_required_arg(new_arg, required_type):
     required_type::obj
     return::bool
     """
-    LOG.debug('new_arg: %s, required_type: %s', new_arg, required_type)
+    if logging_utils.DEBUG_ENABLED:
+        LOG.debug('new_arg: %s, required_type: %s', new_arg, required_type)
     if (isinstance(required_type, dict)
             and len(required_type.keys()) == 1
             and len(required_type.values()) == 1
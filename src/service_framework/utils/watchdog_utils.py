@@ -0,0 +1,172 @@
+""" File to house the service loop's stall detector """
+
+from bisect import bisect_left
+import sys
+import threading
+import time
+import traceback
+from service_framework.utils.logging_utils import get_logger
+
+LOG = get_logger()
+ITERATION_TIME_BUCKETS_S = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+ITERATION_TIME_COUNTS = [0] * (len(ITERATION_TIME_BUCKETS_S) + 1)
+ITERATION_TIME_LOCK = threading.Lock()
+
+
+def get_iteration_time_histogram():
+    """
+    Get the histogram of the time taken to handle each message in this
+    process. Each bucket counts the messages that took up to its time.
+    return = {
+        '<=0.0001s': int,
+        ...
+        '>5s': int,
+    }
+    """
+    labels = ['<={}s'.format(bound) for bound in ITERATION_TIME_BUCKETS_S]
+    labels.append('>{}s'.format(ITERATION_TIME_BUCKETS_S[-1]))
+    return dict(zip(labels, ITERATION_TIME_COUNTS))
+
+
+def record_iteration_time(iteration_time_s):
+    """
+    iteration_time_s::float Time taken to handle a message
+    """
+    bucket_idx = bisect_left(ITERATION_TIME_BUCKETS_S, iteration_time_s)
+
+    with ITERATION_TIME_LOCK:
+        ITERATION_TIME_COUNTS[bucket_idx] += 1
+
+
+def reset_iteration_time_histogram():
+    """
+    Clear all of the iteration time counts.
+    """
+    with ITERATION_TIME_LOCK:
+        ITERATION_TIME_COUNTS[:] = [0] * len(ITERATION_TIME_COUNTS)
+
+
+class StallDetector:
+    """
+    Watchdog thread for the threads handling messages. Each handling thread
+    marks when it starts and finishes handling a message, and the watchdog
+    logs the stack of any thread that has been handling one message for
+    longer than "stall_threshold_s", along with the message's connection
+    name and workflow id. The time to handle each message is also recorded
+    in the iteration time histogram, which the watchdog logs every
+    "log_interval_s".
+    """
+    __slots__ = (
+        'stall_threshold_s',
+        'log_interval_s',
+        'handling',
+        'stop_event',
+        'thread',
+    )
+
+    def __init__(self, stall_threshold_s, log_interval_s=60):
+        """
+        stall_threshold_s::float Time handling one message after which it's logged as a stall
+        log_interval_s::float Time between each log of the iteration time histogram
+        """
+        if stall_threshold_s <= 0:
+            err = 'Stall threshold must be positive, got "{}"!'.format(stall_threshold_s)
+            LOG.error(err)
+            raise ValueError(err)
+
+        self.stall_threshold_s = stall_threshold_s
+        self.log_interval_s = log_interval_s
+        # {thread_id: [start_time, connection_name, workflow_id, is_reported]}
+        self.handling = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._watch, name='StallDetector', daemon=True)
+
+    def start(self):
+        """
+        Start the watchdog thread.
+        """
+        LOG.debug('Starting stall detector with a %ss threshold...', self.stall_threshold_s)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the watchdog thread and wait for it to exit.
+        """
+        self.stop_event.set()
+        self.thread.join()
+
+    def start_handling(self, connection_name, workflow_id):
+        """
+        Called by a handling thread right before it handles a message.
+        connection_name::str Name of the connection the message came from
+        workflow_id::str Workflow id of the message
+        """
+        self.handling[threading.get_ident()] = [
+            time.monotonic(),
+            connection_name,
+            workflow_id,
+            False,
+        ]
+
+    def finish_handling(self):
+        """
+        Called by a handling thread right after it handled a message.
+        """
+        start_time, connection_name, workflow_id, is_reported = self.handling.pop(
+            threading.get_ident()
+        )
+        iteration_time_s = time.monotonic() - start_time
+        record_iteration_time(iteration_time_s)
+
+        if is_reported:
+            LOG.warning(
+                'Stalled message from "%s" (workflow id "%s") finished after %.3fs',
+                connection_name,
+                workflow_id,
+                iteration_time_s
+            )
+
+    def _watch(self):
+        """
+        Run on the watchdog thread until stopped. Wakes often enough for
+        both stalls and the histogram log, whichever is due sooner.
+        """
+        last_log_time = time.monotonic()
+        wait_s = min(self.stall_threshold_s / 2, self.log_interval_s)
+
+        while not self.stop_event.wait(wait_s):
+            now = time.monotonic()
+            self._report_stalls(now)
+
+            if now - last_log_time >= self.log_interval_s:
+                last_log_time = now
+                LOG.info('Iteration times: %s', get_iteration_time_histogram())
+                reset_iteration_time_histogram()
+
+    def _report_stalls(self, now):
+        """
+        Log the stack of each thread handling a message for longer than the threshold.
+        Each message is only logged once.
+        now::float time.monotonic()
+        """
+        frames = None
+
+        for thread_id, handling in list(self.handling.items()):
+            start_time, connection_name, workflow_id, is_reported = handling
+
+            if is_reported or now - start_time < self.stall_threshold_s:
+                continue
+
+            handling[3] = True
+            frames = frames if frames is not None else sys._current_frames() # pylint: disable=protected-access
+            frame = frames.get(thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+
+            LOG.warning(
+                'Service loop stalled for %.3fs handling a message from "%s" '
+                '(workflow id "%s"), at:\n%s',
+                now - start_time,
+                connection_name,
+                workflow_id,
+                stack
+            )
@@ -0,0 +1,385 @@
+""" File to house the multi-process worker pool """
+
+from multiprocessing import Process
+import copy
+import os
+import signal
+import tempfile
+import time
+import zmq
+from service_framework.utils import logging_utils, service_utils, socket_utils, utils
+from service_framework.utils.codec_utils import (
+    decode_payload,
+    encode_payload,
+    get_codec_name,
+    get_compact_schemas
+)
+from service_framework.utils.constants import WORKER_READY_MESSAGE
+from service_framework.utils.ingress_utils import get_error_return_payload
+
+LOG = logging_utils.get_logger()
+WORKER_DIED_ERROR = 'Worker process died, request dropped!'
+LIVENESS_CHECK_INTERVAL_S = 0.1
+
+
+def entrance_point(
+        service_definition,
+        config,
+        addresses,
+        logger_args_dict,
+        num_workers,
+        service_loop_args_dict=None):
+    """
+    Run the service on a pool of worker processes behind the service's
+    addresses. Each replyer address is bound once by a broker (this process)
+    that hands every request to the least loaded worker, so a CPU bound
+    service can use every core without changing its addresses or service file.
+    service_definition::obj Either a string -> to then import the service file or an object itself.
+    addresses = {
+        'in': {
+            'connection_name': {
+                'socket_name': str
+            },
+        },
+        'out': {},
+    }
+    config = {
+        'config_1': 'thingy',
+        'config_2': 12345
+    }
+    logger_args_dict = {
+        console_loglevel: str,
+        log_path: str,
+        file_loglevel: str,
+        backup_count: int,
+    }
+    num_workers::int Number of worker processes to run the service on
+    service_loop_args_dict = {
+        min_wait_time_s: float,
+        wait_strategy: str,
+        engine: str,
+        num_worker_threads: int,
+        earliest_deadline_first: bool,
+        stall_threshold_s: float,
+    }
+    """
+    logging_utils.reset_package_logger(**logger_args_dict)
+    imported_service = service_definition
+
+    if isinstance(imported_service, str):
+        imported_service = utils.import_python_file_from_cwd(imported_service)
+
+    setup_config = service_utils.setup_config(config if config is not None else {}, imported_service)
+    setup_addresses = service_utils.setup_addresses(addresses, imported_service, setup_config)
+    connection_models = service_utils.get_connection_models(imported_service, setup_config)
+
+    backend_dir = tempfile.mkdtemp(prefix='service_framework_')
+    backend_uris = get_backend_uris(connection_models, backend_dir)
+    worker_addresses = get_worker_addresses(addresses, backend_uris)
+
+    context = zmq.Context()
+    brokers = [
+        get_broker(
+            setup_addresses['in'][connection_name]['replyer'],
+            backend_uri,
+            context,
+            connection_models['in'][connection_name]
+        )
+        for connection_name, backend_uri in backend_uris.items()
+    ]
+
+    workers = [
+        Process(
+            target=service_utils.entrance_point,
+            args=(
+                service_definition,
+                config,
+                worker_addresses,
+                logger_args_dict,
+                False,
+                service_loop_args_dict
+            ),
+            daemon=True
+        )
+        for _ in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    local_state = {'run': True}
+
+    def sig_handler(signum, _):
+        LOG.debug('Got signal "%s"! Stopping worker pool...', signum)
+        local_state['run'] = False
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    try:
+        run_brokers(brokers, lambda: local_state['run'], workers)
+    finally:
+        LOG.debug('Stopping %s workers...', len(workers))
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+        context.destroy(linger=0)
+        for backend_uri in backend_uris.values():
+            remove_ipc_file(backend_uri)
+        os.rmdir(backend_dir)
+
+
+def get_backend_uris(connection_models, backend_dir):
+    """
+    Get the uri each replyer's broker binds for its workers. Only replyers
+    can be shared by a pool, other inbound connections (ex. subscribers)
+    would get every message in every worker.
+    connection_models = {
+        'in': {
+            'connection_name': {
+                'connection_type': 'replyer',
+                ...
+            },
+        },
+        'out': {},
+    }
+    backend_dir::str Folder to put the ipc files in
+    return::{connection_name: backend_uri}
+    """
+    backend_uris = {}
+
+    for connection_name, model in connection_models.get('in', {}).items():
+        if model['connection_type'] != 'replyer':
+            err = 'Worker pools only support inbound "replyer" connections, "{}" is a "{}"!'
+            err = err.format(connection_name, model['connection_type'])
+            LOG.error(err)
+            raise ValueError(err)
+
+        backend_uris[connection_name] = 'ipc://{}/{}.ipc'.format(backend_dir, connection_name)
+
+    return backend_uris
+
+
+def get_worker_addresses(addresses, backend_uris):
+    """
+    Get the addresses each worker runs with. Each replyer connects to its
+    broker's backend instead of binding the public address.
+    addresses = {
+        'in': {
+            'connection_name': {
+                'replyer': str,
+            },
+        },
+        'out': {},
+    }
+    backend_uris::{connection_name: backend_uri}
+    return::{} The addresses with a "worker_backend" on each replyer
+    """
+    worker_addresses = copy.deepcopy(addresses) if addresses else {}
+    in_addresses = worker_addresses.setdefault('in', {})
+
+    for connection_name, backend_uri in backend_uris.items():
+        in_addresses.setdefault(connection_name, {})['worker_backend'] = backend_uri
+
+    return worker_addresses
+
+
+def get_broker(address, backend_uri, context, model):
+    """
+    Create the sockets and state used to broker a replyer's requests.
+    address::str The public address of the replyer ex. "127.0.0.1:5001"
+    backend_uri::str ex. "ipc:///tmp/pool/reply.ipc"
+    context::zmq.Context()
+    model::{} The replyer's connection model (To reply with errors in its codec)
+    return = {
+        'frontend': zmq.Context.Socket,
+        'backend': zmq.Context.Socket,
+        'loads': {worker_identity::bytes: int}, # Requests in flight per worker
+        'in_flight': {worker_identity::bytes: {envelope_key::tuple: [[zmq.Frame]]}},
+        'codec_name': str,
+        'compact_schemas': {},
+    }
+    """
+    backend = context.socket(zmq.ROUTER)
+    backend.bind(backend_uri)
+
+    return {
+        'frontend': socket_utils.get_router_socket(address, context),
+        'backend': backend,
+        'loads': {},
+        'in_flight': {},
+        'codec_name': get_codec_name(model),
+        'compact_schemas': get_compact_schemas(model),
+    }
+
+
+def run_brokers(brokers, should_run, workers=()):
+    """
+    Pass requests from each broker's frontend to its least loaded worker and
+    replies back to the frontend. A frontend is only polled once one of its
+    workers is ready, so requests wait in zmq's queues until then. Workers
+    are checked for liveness between polls, a dead worker is no longer sent
+    requests and its requests in flight are replied to with an error.
+    brokers::[{}] From "get_broker"
+    should_run::def() -> bool
+    workers::[multiprocessing.Process] The worker processes of the pool
+    """
+    poller = zmq.Poller()
+    socket_map = {}
+    live_workers = list(workers)
+    next_liveness_check = time.monotonic() + LIVENESS_CHECK_INTERVAL_S
+
+    for broker in brokers:
+        poller.register(broker['backend'], zmq.POLLIN)
+        socket_map[broker['backend']] = broker
+        socket_map[broker['frontend']] = broker
+
+    LOG.debug('Starting Worker Pool Broker...')
+    while should_run():
+        for socket, _ in poller.poll(100):
+            broker = socket_map[socket]
+
+            if socket is broker['frontend']:
+                send_to_least_loaded_worker(broker)
+                continue
+
+            worker_identity, *frames = broker['backend'].recv_multipart(copy=False)
+            worker_identity = worker_identity.bytes
+
+            if len(frames) == 1 and frames[0].bytes == WORKER_READY_MESSAGE:
+                LOG.debug('Worker "%s" ready', worker_identity)
+                if not broker['loads']:
+                    poller.register(broker['frontend'], zmq.POLLIN)
+                broker['loads'][worker_identity] = 0
+                broker['in_flight'][worker_identity] = {}
+                continue
+
+            if worker_identity not in broker['loads']:
+                LOG.warning('Dropping reply from removed worker "%s"', worker_identity)
+                continue
+
+            broker['loads'][worker_identity] -= 1
+            pop_in_flight(broker['in_flight'][worker_identity], frames)
+            broker['frontend'].send_multipart(frames, copy=False)
+
+        if time.monotonic() < next_liveness_check:
+            continue
+
+        next_liveness_check = time.monotonic() + LIVENESS_CHECK_INTERVAL_S
+        for worker in [worker for worker in live_workers if not worker.is_alive()]:
+            LOG.error('Worker process %s died with exit code %s!', worker.pid, worker.exitcode)
+            live_workers.remove(worker)
+
+            for broker in brokers:
+                remove_worker(broker, socket_utils.get_worker_identity(worker.pid), poller)
+
+
+def send_to_least_loaded_worker(broker):
+    """
+    Pass a request from the broker's frontend to the worker with the fewest
+    requests in flight. The routing envelope is kept so the reply can be
+    passed back to the right requester. The frames are passed on without a copy.
+    broker::{} From "get_broker"
+    """
+    frames = broker['frontend'].recv_multipart(copy=False)
+    loads = broker['loads']
+    worker_identity = min(loads, key=loads.get)
+
+    loads[worker_identity] += 1
+    broker['in_flight'][worker_identity].setdefault(get_envelope_key(frames), []).append(frames)
+    broker['backend'].send_multipart([worker_identity] + frames, copy=False)
+
+
+def remove_worker(broker, worker_identity, poller):
+    """
+    Stop sending requests to a dead worker and reply to each of its requests
+    in flight with an error, so their requesters aren't left waiting. The
+    frontend is no longer polled once no worker is left.
+    broker::{} From "get_broker"
+    worker_identity::bytes
+    poller::zmq.Poller
+    """
+    if worker_identity not in broker['loads']:
+        return
+
+    del broker['loads'][worker_identity]
+    in_flight = broker['in_flight'].pop(worker_identity)
+
+    for requests in in_flight.values():
+        for frames in requests:
+            reply_with_error(broker, frames, WORKER_DIED_ERROR)
+
+    if not broker['loads']:
+        LOG.error('No workers left to handle requests!')
+        poller.unregister(broker['frontend'])
+
+
+def reply_with_error(broker, frames, error):
+    """
+    Reply to a request with an error, in the codec of the broker's replyer.
+    broker::{} From "get_broker"
+    frames::[zmq.Frame] ex. [requester_identity, b'', *codec_frames]
+    error::str
+    """
+    delimiter_idx = len(get_envelope_key(frames))
+
+    if delimiter_idx == len(frames):
+        return
+
+    payload = decode_payload(frames[delimiter_idx + 1:], broker['codec_name'], broker['compact_schemas'])
+    return_payload = get_error_return_payload(payload, error)
+
+    broker['frontend'].send_multipart(
+        frames[:delimiter_idx + 1] + encode_payload(
+            return_payload,
+            broker['codec_name'],
+            broker['compact_schemas']
+        ),
+        copy=False
+    )
+
+
+def pop_in_flight(in_flight, frames):
+    """
+    Forget the request a reply is for. Requests from the same requester are
+    told apart only by their envelope, which is all a dead worker's
+    remaining requests need to be replied to.
+    in_flight::{envelope_key::tuple: [[zmq.Frame]]} Of the replying worker
+    frames::[zmq.Frame] The reply
+    """
+    envelope_key = get_envelope_key(frames)
+    requests = in_flight.get(envelope_key)
+
+    if not requests:
+        return
+
+    requests.pop(0)
+    if not requests:
+        del in_flight[envelope_key]
+
+
+def get_envelope_key(frames):
+    """
+    frames::[zmq.Frame] ex. [requester_identity, b'', *codec_frames]
+    return::(bytes) The routing envelope (every frame before the empty delimiter)
+    """
+    envelope_key = []
+
+    for frame in frames:
+        if not len(frame):
+            break
+        envelope_key.append(frame.bytes)
+
+    return tuple(envelope_key)
+
+
+def remove_ipc_file(uri):
+    """
+    Remove the file left behind by a bound ipc uri (if any).
+    uri::str ex. "ipc:///tmp/pool/reply.ipc"
+    """
+    path = uri[len('ipc://'):]
+
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,109 @@
+""" File to test the Timer Connection """
+
+from datetime import datetime
+import threading
+import time
+import pytest
+from service_framework.utils import connection_utils, service_utils, utils
+
+TIMER_MODULE = utils.import_python_file_from_module('service_framework.connections.in.timer')
+
+
+@pytest.mark.parametrize('engine', ['sync', 'threads', 'asyncio'])
+def test_timer__interval__fires_on_schedule_without_drift(engine):
+    """
+    Make sure an interval timer fires its connection function from the
+    service loop, with scheduled times exactly one interval apart.
+    """
+    ticks = []
+
+    def on_tick(args, to_send, config):
+        ticks.append(args)
+        time.sleep(0.01)
+
+    connections = connection_utils.setup_connections(
+        {
+            'in': {
+                'tick': {
+                    'connection_type': 'timer',
+                    'required_creation_arguments': {'connection_function': on_tick},
+                    'optional_creation_arguments': {'interval_s': 0.05},
+                },
+            },
+        },
+        {}
+    )
+    service_thread = threading.Thread(
+        target=service_utils.run_service,
+        args=(connections, {}, {}),
+        kwargs={'engine': engine}
+    )
+    service_thread.start()
+    time.sleep(0.33)
+
+    service_utils.RUN_FLAG = False
+    service_thread.join()
+    service_utils.RUN_FLAG = True
+
+    assert len(ticks) >= 5
+    for last_tick, tick in zip(ticks, ticks[1:]):
+        assert tick['scheduled_time'] - last_tick['scheduled_time'] == pytest.approx(0.05)
+        assert tick['fire_time'] >= tick['scheduled_time']
+
+
+@pytest.mark.parametrize('optional_creation_arguments', [
+    {},
+    {'interval_s': 1.0, 'cron': '* * * * *'},
+    {'interval_s': 0.0},
+    {'cron': '* * *'},
+    {'cron': '61 * * * *'},
+])
+def test_timer__invalid_schedules_raise(optional_creation_arguments):
+    """
+    Make sure a timer needs exactly one valid schedule.
+    """
+    with pytest.raises(ValueError):
+        TIMER_MODULE.Timer(
+            {
+                'connection_type': 'timer',
+                'required_creation_arguments': {
+                    'connection_function': lambda args, to_send, config: None,
+                },
+                'optional_creation_arguments': optional_creation_arguments,
+            },
+            {}
+        )
+
+
+def test_timer__interval__whole_seconds_accepted():
+    """
+    Make sure an interval doesn't have to be written as a float.
+    """
+    timer = TIMER_MODULE.Timer(
+        {
+            'connection_type': 'timer',
+            'required_creation_arguments': {
+                'connection_function': lambda args, to_send, config: None,
+            },
+            'optional_creation_arguments': {'interval_s': 5},
+        },
+        {}
+    )
+    assert timer.interval_s == 5
+
+
+@pytest.mark.parametrize('cron, after, expected', [
+    ('* * * * *', datetime(2024, 1, 1, 12, 30, 15), datetime(2024, 1, 1, 12, 31)),
+    ('*/15 * * * *', datetime(2024, 1, 1, 12, 31), datetime(2024, 1, 1, 12, 45)),
+    ('0 9-17 * * 1-5', datetime(2024, 1, 5, 17, 0), datetime(2024, 1, 8, 9, 0)),
+    ('30 2 29 2 *', datetime(2024, 3, 1), datetime(2028, 2, 29, 2, 30)),
+    ('0 0 1 * 0', datetime(2024, 1, 1, 0, 0), datetime(2024, 1, 7, 0, 0)),
+])
+def test_timer__get_next_cron_time__next_matching_minute(cron, after, expected):
+    """
+    Make sure the next time of a cron schedule is the first matching minute
+    after the given time. (A day matching either restricted day field is used)
+    """
+    cron_fields = TIMER_MODULE.parse_cron(cron)
+    next_time = TIMER_MODULE.get_next_cron_time(cron_fields, after.timestamp())
+    assert datetime.fromtimestamp(next_time) == expected
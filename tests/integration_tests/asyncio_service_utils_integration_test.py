@@ -0,0 +1,115 @@
+""" File to house integration tests for the asyncio service loop """
+
+import asyncio
+import threading
+import time
+import zmq
+from service_framework.utils import connection_utils, msgpack_utils, service_utils
+
+
+async def on_new_slow_request(args, to_send, config):
+    """
+    Async connection function that waits on a slow call before calling downstream.
+    """
+    await asyncio.sleep(0.2)
+    response = await to_send('downstream', {'to_echo': args['to_echo']})
+    return {'echoed': response['echoed']}
+
+
+def on_new_downstream_request(args, to_send, config):
+    """
+    Regular connection function that still works with the asyncio loop.
+    """
+    return {'echoed': args['to_echo'] + '!'}
+
+
+def test_asyncio_service_utils__run_service_async__requests_handled_concurrently():
+    """
+    Make sure slow "async def" connection functions are handled concurrently,
+    awaiting to_send, and that every reply goes back to the right requester.
+    """
+    upstream_connections = connection_utils.setup_connections(
+        get_connection_models(on_new_slow_request, with_downstream=True),
+        {
+            'in': {'reply': {'replyer': UPSTREAM_ADDRESS}},
+            'out': {'downstream': {'requester': DOWNSTREAM_ADDRESS}},
+        }
+    )
+    downstream_connections = connection_utils.setup_connections(
+        get_connection_models(on_new_downstream_request),
+        {'in': {'reply': {'replyer': DOWNSTREAM_ADDRESS}}}
+    )
+
+    threads = [
+        threading.Thread(
+            target=service_utils.run_service,
+            args=(upstream_connections, {}, {}),
+            kwargs={'engine': 'asyncio'}
+        ),
+        threading.Thread(
+            target=service_utils.run_service,
+            args=(downstream_connections, {}, {}),
+            kwargs={'engine': 'asyncio'}
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+
+    context = zmq.Context()
+    requesters = []
+    for _ in range(NUM_REQUESTS):
+        requester = context.socket(zmq.REQ)
+        requester.connect(f'tcp://{UPSTREAM_ADDRESS}')
+        requesters.append(requester)
+
+    start = time.time()
+    for idx, requester in enumerate(requesters):
+        requester.send(msgpack_utils.msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+
+    responses = [msgpack_utils.msg_unpack(requester.recv()) for requester in requesters]
+    elapsed = time.time() - start
+    context.destroy(linger=0)
+
+    service_utils.RUN_FLAG = False
+    for thread in threads:
+        thread.join()
+    service_utils.RUN_FLAG = True
+
+    for idx, response in enumerate(responses):
+        assert response == {'return_args': {'echoed': f'{idx}!'}, 'workflow_id': idx}
+
+    assert elapsed < 0.2 * NUM_REQUESTS / 2
+
+
+def get_connection_models(connection_function, with_downstream=False):
+    """
+    Get the connection models for an echo service.
+    """
+    models = {
+        'in': {
+            'reply': {
+                'connection_type': 'replyer',
+                'required_creation_arguments': {
+                    'connection_function': connection_function,
+                },
+                'required_arguments': {'to_echo': str},
+                'required_return_arguments': {'echoed': str},
+            },
+        },
+    }
+
+    if with_downstream:
+        models['out'] = {
+            'downstream': {
+                'connection_type': 'requester',
+                'required_arguments': {'to_echo': str},
+                'required_return_arguments': {'echoed': str},
+            },
+        }
+
+    return models
+
+
+NUM_REQUESTS = 10
+UPSTREAM_ADDRESS = '127.0.0.1:13331'
+DOWNSTREAM_ADDRESS = '127.0.0.1:13332'
@@ -0,0 +1,38 @@
+""" File to house a slow replyer service run on a worker pool """
+
+import os
+import time
+
+
+def on_new_request(args, to_send, config):
+    """
+    Method triggered when a new request is recieved from
+    a requester. Replies with the id of the worker process.
+    """
+    if args.get('crash'):
+        os._exit(1)
+
+    time.sleep(0.2)
+    return {'echoed': args['to_echo'], 'pid': os.getpid()}
+
+
+connection_models = {
+    'in': {
+        'reply': {
+            'connection_type': 'replyer',
+            'required_creation_arguments': {
+                'connection_function': on_new_request,
+            },
+            'required_arguments': {
+                'to_echo': str,
+            },
+            'optional_arguments': {
+                'crash': bool,
+            },
+            'required_return_arguments': {
+                'echoed': str,
+                'pid': int,
+            }
+        }
+    }
+}
@@ -0,0 +1,144 @@
+""" File to test the ingress queues """
+
+import pytest
+import zmq
+from service_framework.utils import ingress_utils, service_utils
+
+CONTEXT = zmq.Context()
+
+
+def get_queued_item(name, overflow_policy, num_messages=5, max_queue_size=2):
+    """
+    Get an item with an ingress queue and num_messages waiting on its socket.
+    return::{}
+    """
+    receiver = CONTEXT.socket(zmq.PAIR)
+    receiver.bind(f'inproc://ingress_{name}')
+    sender = CONTEXT.socket(zmq.PAIR)
+    sender.connect(f'inproc://ingress_{name}')
+
+    for msg_num in range(num_messages):
+        sender.send(str(msg_num).encode())
+
+    item = {
+        'connection_name': name,
+        'inbound_socket': receiver,
+        'decode_message': lambda frames: {'args': frames[0].decode(), 'workflow_id': 'id'},
+        'max_queue_size': max_queue_size,
+        'overflow_policy': overflow_policy,
+        'sender': sender,
+    }
+    ingress_utils.add_ingress_queues([item])
+    return item
+
+
+@pytest.mark.parametrize('overflow_policy, queued, num_shed', [
+    ('block', ['0', '1'], 0),
+    ('drop_oldest', ['3', '4'], 3),
+    ('drop_newest', ['0', '1'], 3),
+])
+def test_ingress_utils__ingest__overflow_policies(overflow_policy, queued, num_shed):
+    """
+    Make sure each overflow policy keeps the right messages once the queue is full.
+    """
+    ingress_utils.reset_shed_message_counts()
+    item = get_queued_item(overflow_policy, overflow_policy)
+
+    for _ in range(3):
+        ingress_utils.ingest(item)
+
+    assert [frames[0].decode() for frames in item['ingress_queue']] == queued
+    assert ingress_utils.get_shed_message_counts().get(overflow_policy, 0) == num_shed
+
+
+def test_ingress_utils__ingest__block_leaves_messages_in_zmq():
+    """
+    Make sure the block policy leaves the messages it can't queue on the socket.
+    """
+    item = get_queued_item('block_leftover', 'block')
+
+    payloads = [payload['args'] for _, payload in service_utils.get_all_new_payloads([item])]
+    assert payloads == ['0']
+
+    ingress_utils.ingest(item)
+    assert [frames[0].decode() for frames in item['ingress_queue']] == ['1', '2']
+
+
+def test_ingress_utils__ingest__reject_replies_with_an_error():
+    """
+    Make sure rejected messages are answered with an error instead of being handled.
+    """
+    replies = []
+    item = get_queued_item('reject', 'reject', num_messages=3)
+    item['return_function'] = replies.append
+
+    ingress_utils.ingest(item)
+    ingress_utils.ingest(item)
+
+    assert len(item['ingress_queue']) == 2
+    assert replies == [{'error': ingress_utils.REJECTED_ERROR, 'workflow_id': 'id'}]
+
+
+@pytest.mark.parametrize('overflow_policy, rejected', [
+    ('drop_oldest', ['0', '1']),
+    ('drop_newest', ['2', '3']),
+])
+def test_ingress_utils__ingest__shed_requests_replied_to(overflow_policy, rejected):
+    """
+    Make sure requests shed by the drop policies are still answered with an
+    error, so their requesters aren't left waiting for a reply.
+    """
+    replies = []
+    item = get_queued_item(f'{overflow_policy}_replies', overflow_policy, num_messages=4)
+    item['decode_message'] = lambda frames: {'args': frames[0].decode(), 'workflow_id': frames[0].decode()}
+    item['return_function'] = replies.append
+
+    ingress_utils.ingest(item)
+    ingress_utils.ingest(item)
+
+    assert [reply['workflow_id'] for reply in replies] == rejected
+    assert all(reply['error'] == ingress_utils.REJECTED_ERROR for reply in replies)
+
+
+def test_ingress_utils__ingest__receives_at_most_max_queue_size_each_call():
+    """
+    Make sure a socket that never empties doesn't keep the service loop
+    draining it forever.
+    """
+    item = get_queued_item('capped', 'drop_oldest', num_messages=5, max_queue_size=2)
+
+    ingress_utils.ingest(item)
+    assert [frames[0].decode() for frames in item['ingress_queue']] == ['0', '1']
+
+    ingress_utils.ingest(item)
+    assert [frames[0].decode() for frames in item['ingress_queue']] == ['2', '3']
+    assert item['inbound_socket'].poll(0)
+
+
+def test_ingress_utils__get_queued_items__only_items_left_with_messages():
+    """
+    Make sure items with messages left in their queue are handled even if
+    their sockets weren't polled ready.
+    """
+    queued = get_queued_item('queued_left', 'block', num_messages=0)
+    queued['ingress_queue'].append([b'left over'])
+    empty = get_queued_item('queued_empty', 'block', num_messages=0)
+
+    assert ingress_utils.get_queued_items([queued, empty], []) == [queued]
+    assert ingress_utils.get_queued_items([queued, empty], [queued]) == []
+
+
+def test_ingress_utils__get_deadline_sort_key__earliest_deadline_first():
+    """
+    Make sure payloads sort by deadline, with payloads without one last.
+    """
+    item = get_queued_item('deadline_sort', 'block', num_messages=0)
+    item_and_payloads = [
+        (item, {'args': 'none'}),
+        (item, {'args': 'late', 'deadline': 20.0}),
+        (item, {'args': 'early', 'deadline': 10.0}),
+    ]
+
+    in_order = sorted(item_and_payloads, key=ingress_utils.get_deadline_sort_key)
+
+    assert [payload['args'] for _, payload in in_order] == ['early', 'late', 'none']
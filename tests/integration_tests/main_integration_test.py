@@ -60,7 +60,7 @@ def test_main__main__inbound_connections_function_properly():
         if time.time() - start > 1:
             break
 
-        if not os.path.exists(OUTBOUND_LOG_PATH):
+        if not os.path.exists(INBOUND_LOG_PATH):
             continue
 
         with open(INBOUND_LOG_PATH, 'r') as requester_log:
@@ -0,0 +1,67 @@
+""" File to test the polling utils """
+
+import pytest
+import zmq
+from service_framework.utils import polling_utils, socket_utils
+
+CONTEXT = zmq.Context()
+
+
+def get_socket_pairs(num_pairs, name):
+    """
+    Create num_pairs of connected inproc PAIR sockets.
+    return::[(zmq.Context.Socket, zmq.Context.Socket)] (sender, receiver)
+    """
+    pairs = []
+
+    for idx in range(num_pairs):
+        receiver = CONTEXT.socket(zmq.PAIR)
+        receiver.bind(f'inproc://{name}_{idx}')
+        sender = CONTEXT.socket(zmq.PAIR)
+        sender.connect(f'inproc://{name}_{idx}')
+        pairs.append((sender, receiver))
+
+    return pairs
+
+
+def test_polling_utils__get_socket_map__duplicate_sockets_raise():
+    """
+    Make sure the same socket can't be registered twice.
+    """
+    _, receiver = get_socket_pairs(1, 'duplicate')[0]
+    polling_list = [{'inbound_socket': receiver}, {'inbound_socket': receiver}]
+
+    with pytest.raises(ValueError):
+        polling_utils.get_socket_map(polling_list)
+
+
+def test_polling_utils__get_ready_items__only_ready_items_returned():
+    """
+    Make sure that with many idle sockets registered a single poll only
+    returns the items of the sockets with a message waiting.
+    """
+    pairs = get_socket_pairs(200, 'ready_items')
+    polling_list = [
+        {'inbound_socket': receiver, 'idx': idx}
+        for idx, (_, receiver) in enumerate(pairs)
+    ]
+    poller = socket_utils.get_poller_socket([item['inbound_socket'] for item in polling_list])
+    socket_map = polling_utils.get_socket_map(polling_list)
+
+    for idx in (3, 150):
+        pairs[idx][0].send(b'Hello!')
+
+    ready_items = polling_utils.get_ready_items(poller, socket_map, timeout_ms=100)
+    assert sorted(item['idx'] for item in ready_items) == [3, 150]
+
+
+def test_polling_utils__get_ready_items__no_ready_items_returns_empty():
+    """
+    Make sure nothing is returned when no socket is ready.
+    """
+    pairs = get_socket_pairs(5, 'no_ready_items')
+    polling_list = [{'inbound_socket': receiver} for _, receiver in pairs]
+    poller = socket_utils.get_poller_socket([item['inbound_socket'] for item in polling_list])
+    socket_map = polling_utils.get_socket_map(polling_list)
+
+    assert polling_utils.get_ready_items(poller, socket_map) == []
@@ -2,7 +2,11 @@
 
 import os
 import time
+import pytest
+import zmq
 from service_framework import Service
+from service_framework.utils import worker_pool_utils
+from service_framework.utils.msgpack_utils import msg_pack, msg_unpack
 from service_framework.utils.utils import import_python_file_from_cwd
 
 
@@ -121,12 +125,94 @@ def test_service__services_can_be_run_with_imported_modules():
 
 
 
+def test_service__worker_pool__requests_spread_over_worker_processes():
+    """
+    Make sure a service run on a worker pool binds its address once and
+    spreads concurrent requests over its worker processes.
+    """
+    service = Service(
+        WORKER_POOL_PATH,
+        addresses=WORKER_POOL_ADDRS,
+        console_loglevel=None,
+        num_worker_processes=2
+    )
+    service.run_service()
+
+    context = zmq.Context()
+    requesters = []
+    for _ in range(4):
+        requester = context.socket(zmq.REQ)
+        requester.connect('tcp://{}'.format(WORKER_POOL_ADDRS['in']['reply']['replyer']))
+        requesters.append(requester)
+
+    for idx, requester in enumerate(requesters):
+        requester.send(msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+
+    responses = []
+    for requester in requesters:
+        if requester.poll(5000):
+            responses.append(msg_unpack(requester.recv())['return_args'])
+
+    service.stop_service() # Make sure to stop service!
+    context.destroy(linger=0)
+
+    assert [response['echoed'] for response in responses] == ['0', '1', '2', '3']
+    assert len({response['pid'] for response in responses}) == 2
+
+
+def test_service__worker_pool__dead_worker_requests_replied_to_with_an_error():
+    """
+    Make sure the requests of a worker that died are answered with an error
+    and new requests go to the workers left.
+    """
+    service = Service(
+        WORKER_POOL_PATH,
+        addresses=DEAD_WORKER_POOL_ADDRS,
+        console_loglevel=None,
+        num_worker_processes=2
+    )
+    service.run_service()
+
+    context = zmq.Context()
+    requesters = []
+    for _ in range(2):
+        requester = context.socket(zmq.REQ)
+        requester.connect('tcp://{}'.format(DEAD_WORKER_POOL_ADDRS['in']['reply']['replyer']))
+        requesters.append(requester)
+
+    requesters[0].send(msg_pack({'args': {'to_echo': '0', 'crash': True}, 'workflow_id': 0}))
+    crashed_response = msg_unpack(requesters[0].recv()) if requesters[0].poll(5000) else None
+
+    responses = []
+    for idx in range(3):
+        requesters[1].send(msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+        if requesters[1].poll(5000):
+            responses.append(msg_unpack(requesters[1].recv())['return_args'])
+
+    service.stop_service() # Make sure to stop service!
+    context.destroy(linger=0)
+
+    assert crashed_response == {'error': worker_pool_utils.WORKER_DIED_ERROR, 'workflow_id': 0}
+    assert [response['echoed'] for response in responses] == ['0', '1', '2']
+    assert len({response['pid'] for response in responses}) == 1
+
+
+def test_service__worker_pool__can_not_run_as_main():
+    """
+    Make sure a worker pool isn't used to run a main function once per worker.
+    """
+    service = Service(DO_NOTHING_PATH, num_worker_processes=2)
+
+    with pytest.raises(RuntimeError):
+        service.run_service_as_main()
+
 
 BASE_DIR = './tests/integration_tests'
 BASE_LOG_DIR = f'{BASE_DIR}/logs/service_integration_test/service_can_be_run_programmatically'
 
 DO_NOTHING_PATH = f'{BASE_DIR}/data/service_integration_test/do_nothing_service.py'
 REPLYER_PATH = f'{BASE_DIR}/data/service_integration_test/replyer_service.py'
+WORKER_POOL_PATH = f'{BASE_DIR}/data/service_integration_test/worker_pool_service.py'
 REQUESTER_PATH = f'{BASE_DIR}/data/service_integration_test/requester_service.py'
 
 REPLYER_ADDRS = {
@@ -145,6 +231,22 @@ REQUESTER_ADDRS = {
     }
 }
 
+WORKER_POOL_ADDRS = {
+    "in": {
+        "reply": {
+            "replyer": "127.0.0.1:18778"
+        }
+    }
+}
+
+DEAD_WORKER_POOL_ADDRS = {
+    "in": {
+        "reply": {
+            "replyer": "127.0.0.1:18779"
+        }
+    }
+}
+
 REQUESTER_CONFIG = {
     'num_req_to_send': 2
 }
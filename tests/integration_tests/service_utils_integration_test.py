@@ -1,11 +1,19 @@
 """ File to house integration tests for the service utils """
 
 import os
+import threading
 import time
 import uuid
 import pytest
+import zmq
 from service_framework import Service
-from service_framework.utils import service_utils, utils
+from service_framework.utils import (
+    connection_utils,
+    msgpack_utils,
+    polling_utils,
+    service_utils,
+    utils
+)
 
 
 def test_service_utils__setup_service_connections__no_connection_models_case():
@@ -228,6 +236,54 @@ def test_service_utils__setup_to_send__to_send_validates_returned_args_case():
         to_send('out_connection_1', PROPER_ARGS)
 
 
+def test_service_utils__setup_to_send__to_send_raises_on_error_reply():
+    """
+    Make sure an error reply (ex. from an overloaded service) is raised.
+    """
+    imported_service = utils.import_python_file_from_cwd(SERVICE_PATH)
+    config = {}
+    cur_addresses = utils.get_json_from_rel_path(ADDRESSES_PATH)
+    addresses = service_utils.setup_addresses(cur_addresses, imported_service, config)
+    connections = service_utils.setup_service_connections(addresses, imported_service, config)
+    to_send = service_utils.setup_to_send(connections, {})
+
+    connections['out']['out_connection_1'].send = lambda payload: {'error': 'Overloaded!'}
+
+    with pytest.raises(RuntimeError):
+        to_send('out_connection_1', PROPER_ARGS)
+
+
+def test_service_utils__setup_to_send__earliest_deadline_propagated():
+    """
+    Make sure the deadline of the handled request is sent on, unless the
+    ttl of the call is earlier.
+    """
+    imported_service = utils.import_python_file_from_cwd(SERVICE_PATH)
+    config = {}
+    cur_addresses = utils.get_json_from_rel_path(ADDRESSES_PATH)
+    addresses = service_utils.setup_addresses(cur_addresses, imported_service, config)
+    connections = service_utils.setup_service_connections(addresses, imported_service, config)
+    deadline = time.time() + 10
+    to_send = service_utils.setup_to_send(connections, {}, deadline=deadline)
+    sent = []
+
+    def send(payload):
+        sent.append(payload)
+        return RETURN_PAYLOAD
+
+    connections['out']['out_connection_1'].send = send
+    to_send('out_connection_1', PROPER_ARGS)
+    to_send('out_connection_1', PROPER_ARGS, ttl_s=100)
+    to_send('out_connection_1', PROPER_ARGS, ttl_s=1)
+
+    assert sent[0]['deadline'] == deadline
+    assert sent[1]['deadline'] == deadline
+    assert sent[2]['deadline'] < deadline
+
+    service_utils.setup_to_send(connections, {})('out_connection_1', PROPER_ARGS)
+    assert 'deadline' not in sent[3]
+
+
 def test_service_utils__setup_to_send__to_send_returns_proper_args():
     """
     Make sure the to_send function properly sends arguments and
@@ -294,6 +350,229 @@ def test_service_utils__run_init_function__init_function_runs_properly():
         raise RuntimeError('Test failed, figure it out!')
 
 
+def test_service_utils__get_all_new_payloads__drains_up_to_max_messages_per_poll():
+    """
+    Make sure a burst on a ready socket is drained up to the connection's
+    "max_messages_per_poll" without starving the other ready sockets.
+    """
+    context = zmq.Context()
+    items = []
+
+    for idx in range(2):
+        receiver = context.socket(zmq.PAIR)
+        receiver.bind(f'inproc://drain_test_{idx}')
+        sender = context.socket(zmq.PAIR)
+        sender.connect(f'inproc://drain_test_{idx}')
+
+        for msg_num in range(5):
+            sender.send(f'{idx}_{msg_num}'.encode())
+
+        items.append({
+            'inbound_socket': receiver,
+            'decode_message': lambda frames: frames[0].decode(),
+            'max_messages_per_poll': 3,
+            'sender': sender,
+        })
+
+    payloads = [payload for _, payload in service_utils.get_all_new_payloads(items)]
+    assert payloads == ['0_0', '0_1', '0_2', '1_0', '1_1', '1_2']
+
+    payloads = [payload for _, payload in service_utils.get_all_new_payloads(items)]
+    assert payloads == ['0_3', '0_4', '1_3', '1_4']
+
+
+def test_service_utils__get_all_new_payloads__priority_and_weights_are_respected():
+    """
+    Make sure higher priority items are handled first and items in the same
+    priority class get messages in proportion to their weights.
+    """
+    context = zmq.Context()
+    items = []
+
+    for name, priority, weight in (('low', 0, 1.0), ('heavy', 1, 2.0), ('light', 1, 1.0)):
+        receiver = context.socket(zmq.PAIR)
+        receiver.bind(f'inproc://priority_test_{name}')
+        sender = context.socket(zmq.PAIR)
+        sender.connect(f'inproc://priority_test_{name}')
+
+        for msg_num in range(4):
+            sender.send(f'{name}_{msg_num}'.encode())
+
+        items.append({
+            'inbound_socket': receiver,
+            'decode_message': lambda frames: frames[0].decode(),
+            'priority': priority,
+            'weight': weight,
+            'sender': sender,
+        })
+
+    scheduler_state = polling_utils.get_scheduler_state(items)
+    payloads = [
+        payload for _, payload in service_utils.get_all_new_payloads(items, scheduler_state)
+    ]
+    assert payloads == ['heavy_0', 'heavy_1', 'light_0']
+
+    polling_utils.reset_queueing_delay_metrics()
+    payloads = [
+        payload for _, payload in service_utils.get_all_new_payloads(items, scheduler_state)
+    ]
+    assert payloads == ['heavy_2', 'heavy_3', 'light_1']
+    assert polling_utils.get_queueing_delay_metrics()[1]['num_messages'] == 3
+
+
+def test_service_utils__get_all_new_payloads__deficit_saved_when_stopped_early():
+    """
+    Make sure the deficit round robin state isn't lost when the caller stops
+    taking payloads part way through a pass. (ex. the thread pool is full)
+    """
+    context = zmq.Context()
+    receiver = context.socket(zmq.PAIR)
+    receiver.bind('inproc://deficit_test')
+    sender = context.socket(zmq.PAIR)
+    sender.connect('inproc://deficit_test')
+
+    for msg_num in range(5):
+        sender.send(str(msg_num).encode())
+
+    items = [{
+        'inbound_socket': receiver,
+        'decode_message': lambda frames: frames[0].decode(),
+        'max_messages_per_poll': 3,
+    }]
+    scheduler_state = polling_utils.get_scheduler_state(items)
+
+    payloads = service_utils.get_all_new_payloads(items, scheduler_state)
+    assert next(payloads)[1] == '0'
+    payloads.close()
+
+    assert scheduler_state['deficits'][receiver] == 2
+    context.destroy(linger=0)
+
+
+def test_service_utils__get_all_new_payloads__malformed_replyer_messages_dropped():
+    """
+    Make sure a message without an envelope delimiter (ex. from a raw dealer)
+    is dropped instead of stopping the service loop.
+    """
+    connections = connection_utils.setup_connections(
+        {
+            'in': {
+                'reply': {
+                    'connection_type': 'replyer',
+                    'required_creation_arguments': {
+                        'connection_function': lambda args, to_send, config: args,
+                    },
+                    'optional_creation_arguments': {'max_messages_per_poll': 10},
+                },
+            },
+        },
+        {'in': {'reply': {'replyer': MALFORMED_ADDRESS}}}
+    )
+    polling_list = service_utils.get_polling_list(connections)
+
+    context = zmq.Context()
+    dealer = context.socket(zmq.DEALER)
+    dealer.connect(f'tcp://{MALFORMED_ADDRESS}')
+    dealer.send(b'no delimiter here')
+    requester = context.socket(zmq.REQ)
+    requester.connect(f'tcp://{MALFORMED_ADDRESS}')
+    requester.send(msgpack_utils.msg_pack({'args': {}, 'workflow_id': 'valid'}))
+
+    payloads = []
+    for _ in range(50):
+        payloads += [payload for _, payload in service_utils.get_all_new_payloads(polling_list)]
+        if payloads:
+            break
+        time.sleep(0.01)
+
+    context.destroy(linger=0)
+    assert [payload['workflow_id'] for payload in payloads] == ['valid']
+
+
+def test_service_utils__run_service__async_model_function_needs_asyncio_engine():
+    """
+    Make sure an "async def" connection function isn't silently run (and
+    never awaited) by the sync engine.
+    """
+    async def on_new_request(args, to_send, config):
+        return args
+
+    connections = connection_utils.setup_connections(
+        {
+            'in': {
+                'reply': {
+                    'connection_type': 'replyer',
+                    'required_creation_arguments': {'connection_function': on_new_request},
+                },
+            },
+        },
+        {'in': {'reply': {'replyer': ASYNC_FUNCTION_ADDRESS}}}
+    )
+
+    with pytest.raises(ValueError):
+        service_utils.run_service(connections, {}, {})
+
+
+@pytest.mark.parametrize('engine', ['sync', 'threads'])
+def test_service_utils__run_service__batch_connection_function_gets_micro_batches(engine):
+    """
+    Make sure a batch connection function is called with the args of
+    several requests, and every requester gets its own reply.
+    """
+    address = BATCH_ADDRESSES[engine]
+    batch_sizes = []
+
+    def on_new_batch(args_list, to_send, config):
+        batch_sizes.append(len(args_list))
+        return [{'echoed': args['to_echo'] + '!'} for args in args_list]
+
+    connections = connection_utils.setup_connections(
+        {
+            'in': {
+                'reply': {
+                    'connection_type': 'replyer',
+                    'required_creation_arguments': {
+                        'connection_function': lambda args, to_send, config: True,
+                    },
+                    'optional_creation_arguments': {
+                        'batch_connection_function': on_new_batch,
+                        'max_batch_size': 4,
+                        'max_batch_wait_us': 50000,
+                    },
+                    'required_arguments': {'to_echo': str},
+                    'required_return_arguments': {'echoed': str},
+                },
+            },
+        },
+        {'in': {'reply': {'replyer': address}}}
+    )
+    service_thread = threading.Thread(
+        target=service_utils.run_service,
+        args=(connections, {}, {}),
+        kwargs={'engine': engine}
+    )
+    service_thread.start()
+
+    context = zmq.Context()
+    requesters = [context.socket(zmq.REQ) for _ in range(6)]
+    for idx, requester in enumerate(requesters):
+        requester.connect(f'tcp://{address}')
+        requester.send(msgpack_utils.msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+
+    responses = [msgpack_utils.msg_unpack(requester.recv()) for requester in requesters]
+    context.destroy(linger=0)
+
+    service_utils.RUN_FLAG = False
+    service_thread.join()
+    service_utils.RUN_FLAG = True
+
+    for idx, response in enumerate(responses):
+        assert response == {'return_args': {'echoed': f'{idx}!'}, 'workflow_id': idx}
+
+    assert sum(batch_sizes) == 6
+    assert max(batch_sizes) > 1
+
+
 BASE_DIR = './tests/integration_tests'
 BASE_DATA_DIR = f'{BASE_DIR}/data/service_utils_integration_test'
 BASE_LOG_DIR = f'{BASE_DIR}/logs/service_utils_integration_test'
@@ -334,3 +613,10 @@ REQUESTER_ADDRS = {
 REQUESTER_CONFIG = {
     'num_req_to_send': 2
 }
+
+MALFORMED_ADDRESS = '127.0.0.1:13351'
+ASYNC_FUNCTION_ADDRESS = '127.0.0.1:13352'
+BATCH_ADDRESSES = {
+    'sync': '127.0.0.1:13353',
+    'threads': '127.0.0.1:13354',
+}
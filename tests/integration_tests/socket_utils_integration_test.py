@@ -1,8 +1,10 @@
 """ File to test socket utils """
 
+import threading
 import time
+import numpy
 import zmq
-from service_framework.utils import socket_utils
+from service_framework.utils import codec_utils, connection_utils, msgpack_utils, socket_utils
 
 CONTEXT = zmq.Context()
 REPLYER_ADDRESS = '127.0.0.1:9988'
@@ -46,3 +48,181 @@ def test_socket_utils__get_poller_socket__proper_poller_provided():
 
     assert replyer in polled_socket
     assert polled_socket[replyer] == zmq.POLLIN
+
+
+def test_socket_utils__thread_sockets__one_socket_per_thread():
+    """
+    Make sure each thread gets (and keeps) its own socket, and that they're all closed.
+    """
+    thread_sockets = socket_utils.ThreadSockets(lambda: CONTEXT.socket(zmq.DEALER))
+    main_socket = thread_sockets.get()
+    other_sockets = []
+
+    other_thread = threading.Thread(target=lambda: other_sockets.append(thread_sockets.get()))
+    other_thread.start()
+    other_thread.join()
+
+    assert thread_sockets.get() is main_socket
+    assert other_sockets[0] is not main_socket
+
+    thread_sockets.close()
+    assert main_socket.closed and other_sockets[0].closed
+
+
+def test_socket_utils__thread_sockets__requester_sends_from_many_threads_at_once():
+    """
+    Make sure threads sending on the same requester at once each get their own reply.
+    """
+    connections = connection_utils.setup_connections(
+        {'out': {'request': {'connection_type': 'requester'}}},
+        {'out': {'request': {'requester': THREADED_REQUESTER_ADDRESS}}}
+    )
+    requester = connections['out']['request']
+    router = socket_utils.get_router_socket(THREADED_REQUESTER_ADDRESS, CONTEXT)
+    responses = {}
+
+    def send(idx):
+        responses[idx] = requester.send({'args': {'idx': idx}})
+
+    threads = [threading.Thread(target=send, args=(idx,)) for idx in range(4)]
+    for thread in threads:
+        thread.start()
+
+    for _ in threads:
+        identity, delimiter, binary_message = router.recv_multipart()
+        router.send_multipart([identity, delimiter, binary_message])
+
+    for thread in threads:
+        thread.join()
+
+    router.close(linger=0)
+    assert responses == {idx: {'args': {'idx': idx}} for idx in range(4)}
+
+
+def test_socket_utils__requester_replyer__numpy_ndarrays_sent_as_frames():
+    """
+    Make sure numpy arrays keep their dtype and shape from a requester to a
+    replyer and back, with each array sent as its own frame.
+    """
+    connections = connection_utils.setup_connections(
+        {
+            'in': {'reply': {
+                'connection_type': 'replyer',
+                'required_creation_arguments': {'connection_function': lambda args, to_send, config: {}},
+            }},
+            'out': {'request': {'connection_type': 'requester'}},
+        },
+        {
+            'in': {'reply': {'replyer': NUMPY_REPLYER_ADDRESS}},
+            'out': {'request': {'requester': NUMPY_REPLYER_ADDRESS}},
+        }
+    )
+    replyer = connections['in']['reply']
+    features = numpy.arange(12, dtype='float32').reshape(3, 4)
+    responses = []
+
+    thread = threading.Thread(
+        target=lambda: responses.append(connections['out']['request'].send({'args': {'x': features}}))
+    )
+    thread.start()
+
+    frames = replyer.socket.recv_multipart(copy=False)
+    payload = replyer.decode_message(frames)
+    replyer.return_to_requester({
+        'return_args': {'doubled': payload['args']['x'] * 2},
+        'envelope': payload['envelope'],
+    })
+    thread.join()
+
+    assert len(frames) == 4 # Identity, delimiter, payload and the array
+    assert payload['args']['x'].dtype == numpy.float32
+    numpy.testing.assert_array_equal(payload['args']['x'], features)
+    numpy.testing.assert_array_equal(responses[0]['return_args']['doubled'], features * 2)
+    assert responses[0]['return_args']['doubled'].shape == (3, 4)
+
+
+def test_socket_utils__requester_replyer__codec_selected_by_creation_argument():
+    """
+    Make sure a requester and replyer both with the "pickle5" codec send
+    each other payloads with it.
+    """
+    connections = connection_utils.setup_connections(
+        {
+            'in': {'reply': {
+                'connection_type': 'replyer',
+                'required_creation_arguments': {'connection_function': lambda args, to_send, config: {}},
+                'optional_creation_arguments': {'codec': 'pickle5'},
+            }},
+            'out': {'request': {
+                'connection_type': 'requester',
+                'optional_creation_arguments': {'codec': 'pickle5'},
+            }},
+        },
+        {
+            'in': {'reply': {'replyer': CODEC_REPLYER_ADDRESS}},
+            'out': {'request': {'requester': CODEC_REPLYER_ADDRESS}},
+        }
+    )
+    replyer = connections['in']['reply']
+    responses = []
+
+    thread = threading.Thread(
+        target=lambda: responses.append(connections['out']['request'].send({'args': {'x': (1, 2)}}))
+    )
+    thread.start()
+
+    frames = replyer.socket.recv_multipart(copy=False)
+    payload = replyer.decode_message(frames)
+    replyer.return_to_requester({
+        'return_args': {'x': payload['args']['x']},
+        'envelope': payload['envelope'],
+    })
+    thread.join()
+
+    assert frames[2].bytes == codec_utils.CODEC_HEADER_MARKER + b'pickle5'
+    assert payload['args']['x'] == (1, 2) # Tuples are kept by pickle
+    assert responses[0]['return_args']['x'] == (1, 2)
+
+
+def test_socket_utils__publisher_subscriber__compact_args_derived_from_models():
+    """
+    Make sure a publisher and subscriber with compact args derive the same
+    field order from their models (written in different orders).
+    """
+    connections = connection_utils.setup_connections(
+        {
+            'in': {'quotes': {
+                'connection_type': 'subscriber',
+                'required_creation_arguments': {'connection_function': lambda args, to_send, config: {}},
+                'optional_creation_arguments': {'topic': 'quotes', 'compact_args': True},
+                'required_arguments': {'price': float, 'size': int},
+            }},
+            'out': {'quotes': {
+                'connection_type': 'publisher',
+                'optional_creation_arguments': {'topic': 'quotes', 'compact_args': True},
+                'required_arguments': {'size': int, 'price': float},
+            }},
+        },
+        {
+            'in': {'quotes': {'subscriber': COMPACT_PUBLISHER_ADDRESS}},
+            'out': {'quotes': {'publisher': COMPACT_PUBLISHER_ADDRESS}},
+        }
+    )
+    subscriber = connections['in']['quotes']
+    to_send = {'args': {'price': 101.25, 'size': 300}, 'workflow_id': 'id'}
+
+    # Resend until the subscription reaches the publisher
+    for _ in range(50):
+        connections['out']['quotes'].send(to_send)
+        if subscriber.socket.poll(100):
+            break
+
+    frames = subscriber.socket.recv_multipart(copy=False)
+    assert len(frames[0].bytes) < len(msgpack_utils.msg_pack('quotes') + msgpack_utils.msg_pack(to_send))
+    assert subscriber.get_inbound_sockets_and_triggered_functions()[0]['decode_message'](frames) == to_send
+
+
+COMPACT_PUBLISHER_ADDRESS = '127.0.0.1:13364'
+CODEC_REPLYER_ADDRESS = '127.0.0.1:13363'
+NUMPY_REPLYER_ADDRESS = '127.0.0.1:13362'
+THREADED_REQUESTER_ADDRESS = '127.0.0.1:13361'
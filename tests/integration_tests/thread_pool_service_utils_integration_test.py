@@ -0,0 +1,191 @@
+""" File to house integration tests for the thread pool service loop """
+
+import threading
+import time
+import pytest
+import zmq
+from service_framework.utils import (
+    connection_utils,
+    msgpack_utils,
+    service_utils,
+    thread_pool_service_utils
+)
+
+
+def on_new_slow_request(args, to_send, config):
+    """
+    Connection function that waits on a slow call (releasing the GIL) before
+    calling downstream.
+    """
+    time.sleep(0.2)
+    response = to_send('downstream', {'to_echo': args['to_echo']})
+    return {'echoed': response['echoed']}
+
+
+def on_new_downstream_request(args, to_send, config):
+    """
+    Connection function that answers right away.
+    """
+    return {'echoed': args['to_echo'] + '!'}
+
+
+def on_new_failing_request(args, to_send, config):
+    """
+    Connection function that always fails.
+    """
+    raise RuntimeError('Failed on purpose!')
+
+
+def test_thread_pool_service_utils__run_service_threaded__requests_handled_in_parallel():
+    """
+    Make sure slow connection functions are run in parallel on the thread pool,
+    and that every reply goes back to the right requester.
+    """
+    upstream_connections = connection_utils.setup_connections(
+        get_connection_models(on_new_slow_request, with_downstream=True),
+        {
+            'in': {'reply': {'replyer': UPSTREAM_ADDRESS}},
+            'out': {'downstream': {'requester': DOWNSTREAM_ADDRESS}},
+        }
+    )
+    downstream_connections = connection_utils.setup_connections(
+        get_connection_models(on_new_downstream_request),
+        {'in': {'reply': {'replyer': DOWNSTREAM_ADDRESS}}}
+    )
+
+    threads = [
+        threading.Thread(
+            target=service_utils.run_service,
+            args=(upstream_connections, {}, {}),
+            kwargs={'engine': 'threads', 'num_worker_threads': NUM_REQUESTS}
+        ),
+        threading.Thread(
+            target=service_utils.run_service,
+            args=(downstream_connections, {}, {})
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+
+    context = zmq.Context()
+    requesters = []
+    for _ in range(NUM_REQUESTS):
+        requester = context.socket(zmq.REQ)
+        requester.connect(f'tcp://{UPSTREAM_ADDRESS}')
+        requesters.append(requester)
+
+    start = time.time()
+    for idx, requester in enumerate(requesters):
+        requester.send(msgpack_utils.msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+
+    responses = [msgpack_utils.msg_unpack(requester.recv()) for requester in requesters]
+    elapsed = time.time() - start
+    context.destroy(linger=0)
+
+    service_utils.RUN_FLAG = False
+    for thread in threads:
+        thread.join()
+    service_utils.RUN_FLAG = True
+
+    for idx, response in enumerate(responses):
+        assert response == {'return_args': {'echoed': f'{idx}!'}, 'workflow_id': idx}
+
+    assert elapsed < 0.2 * NUM_REQUESTS / 2
+
+
+def test_thread_pool_service_utils__run_service_threaded__worker_errors_are_raised():
+    """
+    Make sure an error raised on a worker thread stops the service loop.
+    """
+    connections = connection_utils.setup_connections(
+        get_connection_models(on_new_failing_request),
+        {'in': {'reply': {'replyer': FAILING_ADDRESS}}}
+    )
+
+    context = zmq.Context()
+    requester = context.socket(zmq.REQ)
+    requester.connect(f'tcp://{FAILING_ADDRESS}')
+    requester.send(msgpack_utils.msg_pack({'args': {'to_echo': 'fail'}, 'workflow_id': 1}))
+
+    with pytest.raises(RuntimeError):
+        thread_pool_service_utils.run_service_threaded(connections, {}, {})
+
+    context.destroy(linger=0)
+
+
+def test_thread_pool_service_utils__run_service_pipelined__handled_on_one_handler_thread():
+    """
+    Make sure the pipelined engine replies to every request, with every
+    connection function run on one thread other than the loop's.
+    """
+    handler_threads = set()
+
+    def on_new_request(args, to_send, config):
+        handler_threads.add(threading.get_ident())
+        return {'echoed': args['to_echo'] + '!'}
+
+    connections = connection_utils.setup_connections(
+        get_connection_models(on_new_request),
+        {'in': {'reply': {'replyer': PIPELINED_ADDRESS}}}
+    )
+    loop_thread = threading.Thread(
+        target=service_utils.run_service,
+        args=(connections, {}, {}),
+        kwargs={'engine': 'pipelined'}
+    )
+    loop_thread.start()
+
+    context = zmq.Context()
+    requesters = [context.socket(zmq.REQ) for _ in range(NUM_REQUESTS)]
+    for idx, requester in enumerate(requesters):
+        requester.connect(f'tcp://{PIPELINED_ADDRESS}')
+        requester.send(msgpack_utils.msg_pack({'args': {'to_echo': str(idx)}, 'workflow_id': idx}))
+
+    responses = [msgpack_utils.msg_unpack(requester.recv()) for requester in requesters]
+    context.destroy(linger=0)
+
+    service_utils.RUN_FLAG = False
+    loop_thread.join()
+    service_utils.RUN_FLAG = True
+
+    for idx, response in enumerate(responses):
+        assert response == {'return_args': {'echoed': f'{idx}!'}, 'workflow_id': idx}
+
+    assert len(handler_threads) == 1
+    assert loop_thread.ident not in handler_threads
+
+
+def get_connection_models(connection_function, with_downstream=False):
+    """
+    Get the connection models for an echo service.
+    """
+    models = {
+        'in': {
+            'reply': {
+                'connection_type': 'replyer',
+                'required_creation_arguments': {
+                    'connection_function': connection_function,
+                },
+                'required_arguments': {'to_echo': str},
+                'required_return_arguments': {'echoed': str},
+            },
+        },
+    }
+
+    if with_downstream:
+        models['out'] = {
+            'downstream': {
+                'connection_type': 'requester',
+                'required_arguments': {'to_echo': str},
+                'required_return_arguments': {'echoed': str},
+            },
+        }
+
+    return models
+
+
+NUM_REQUESTS = 8
+UPSTREAM_ADDRESS = '127.0.0.1:13341'
+DOWNSTREAM_ADDRESS = '127.0.0.1:13342'
+FAILING_ADDRESS = '127.0.0.1:13343'
+PIPELINED_ADDRESS = '127.0.0.1:13344'
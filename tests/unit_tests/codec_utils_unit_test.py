@@ -0,0 +1,195 @@
+""" Test the Codec Utils """
+
+import struct
+import numpy
+import pytest
+from service_framework.utils import codec_utils, msgpack_utils
+
+
+def test_codec_utils__encode_payload__default_codec_has_no_header():
+    """
+    Make sure msgpack messages are the same as before codecs, so services
+    without a codec selected can still talk to older services.
+    """
+    frames = codec_utils.encode_payload(PAYLOAD, 'msgpack')
+    assert frames == msgpack_utils.msg_pack_frames(PAYLOAD)
+    assert codec_utils.decode_payload(frames, 'msgpack') == PAYLOAD
+
+
+@pytest.mark.parametrize('codec_name', ['bytes', 'json', 'pickle5'])
+def test_codec_utils__decode_payload__decodes_each_codec(codec_name):
+    """
+    Make sure each codec's frames start with its header frame and decode
+    back to the payload.
+    """
+    frames = codec_utils.encode_payload(PAYLOAD, codec_name)
+
+    assert frames[0] == codec_utils.CODEC_HEADER_MARKER + codec_name.encode()
+    assert codec_utils.decode_payload(frames, codec_name) == PAYLOAD
+
+
+def test_codec_utils__decode_payload__safe_codecs_decoded_by_any_connection():
+    """
+    Make sure a connection can decode a codec other than its own, unless
+    the codec is trusted only.
+    """
+    assert codec_utils.decode_payload(codec_utils.encode_payload(PAYLOAD, 'json'), 'msgpack') == PAYLOAD
+
+    with pytest.raises(ValueError):
+        codec_utils.decode_payload(codec_utils.encode_payload(PAYLOAD, 'pickle5'), 'msgpack')
+
+
+def test_codec_utils__bytes_encode__blobs_sent_as_frames():
+    """
+    Make sure bytes args are their own frames, untouched.
+    """
+    blob = b'\x00' * 1024
+    to_test = {'return_args': {'blob': blob, 'size': 1024}, 'workflow_id': 'id'}
+    frames = codec_utils.encode_payload(to_test, 'bytes')
+
+    assert len(frames) == 3
+    assert frames[2] is blob
+    assert codec_utils.decode_payload(frames, 'bytes') == to_test
+
+
+def test_codec_utils__pickle5_encode__numpy_ndarrays_sent_as_frames():
+    """
+    Make sure arrays are pickled out of band, each as its own frame.
+    """
+    array = numpy.arange(12, dtype='float32').reshape(3, 4)
+    frames = codec_utils.encode_payload({'args': {'x': array}}, 'pickle5')
+    decoded = codec_utils.decode_payload(frames, 'pickle5')
+
+    assert len(frames) == 3
+    assert numpy.shares_memory(decoded['args']['x'], array)
+    numpy.testing.assert_array_equal(decoded['args']['x'], array)
+
+
+def test_codec_utils__get_codec_name__unknown_codec_raises():
+    """
+    Make sure a connection can't select a codec that isn't registered.
+    """
+    assert codec_utils.get_codec_name({'connection_type': 'requester'}) == 'msgpack'
+
+    with pytest.raises(ValueError):
+        codec_utils.get_codec_name({
+            'connection_type': 'requester',
+            'optional_creation_arguments': {'codec': 'xml'},
+        })
+
+
+def test_codec_utils__get_compact_schemas__fields_sorted_required_first():
+    """
+    Make sure both ends get the same field order, whatever order their
+    models were written in.
+    """
+    schemas = codec_utils.get_compact_schemas({
+        'connection_type': 'publisher',
+        'optional_creation_arguments': {'compact_args': True},
+        'required_arguments': {'symbol': str, 'price': float},
+        'optional_arguments': {'venue': str, 'size': int},
+    })
+
+    assert schemas['args']['fields'] == ['price', 'symbol', 'size', 'venue']
+    assert schemas['args']['struct'] is None
+    assert 'return_args' not in schemas
+    assert codec_utils.get_compact_schemas({'connection_type': 'publisher'}) is None
+
+
+def test_codec_utils__encode_payload__compact_args_sent_as_list():
+    """
+    Make sure compact args are sent without their keys, with missing
+    optional args marked (or left off the end).
+    """
+    schemas = codec_utils.get_compact_schemas(COMPACT_MODEL)
+    to_test = {'args': {'symbol': 'ABC', 'price': 1.5, 'venue': 'X'}, 'workflow_id': 'id'}
+    frames = codec_utils.encode_payload(to_test, 'msgpack', schemas)
+
+    assert msgpack_utils.msg_unpack(frames[0])['args'] == [1.5, 'ABC', codec_utils.MISSING, 'X']
+    assert codec_utils.decode_payload(frames, 'msgpack', schemas) == to_test
+
+    to_test = {'args': {'symbol': 'ABC', 'price': 1.5}, 'workflow_id': 'id'}
+    frames = codec_utils.encode_payload(to_test, 'msgpack', schemas)
+
+    assert msgpack_utils.msg_unpack(frames[0])['args'] == [1.5, 'ABC']
+    assert codec_utils.decode_payload(frames, 'msgpack', schemas) == to_test
+
+
+def test_codec_utils__decode_payload__optional_numpy_ndarray_compact_args():
+    """
+    Make sure an optional numpy array arg isn't compared element-wise when
+    looking for missing optional args.
+    """
+    schemas = codec_utils.get_compact_schemas({
+        'connection_type': 'publisher',
+        'optional_creation_arguments': {'compact_args': True},
+        'required_arguments': {'symbol': str},
+        'optional_arguments': {'prices': numpy.ndarray, 'venue': str},
+    })
+    prices = numpy.arange(4, dtype='float64')
+    to_test = {'args': {'symbol': 'ABC', 'prices': prices, 'venue': 'X'}, 'workflow_id': 'id'}
+    decoded = codec_utils.decode_payload(
+        codec_utils.encode_payload(to_test, 'msgpack', schemas),
+        'msgpack',
+        schemas
+    )
+
+    assert decoded['args']['symbol'] == 'ABC'
+    assert decoded['args']['venue'] == 'X'
+    numpy.testing.assert_array_equal(decoded['args']['prices'], prices)
+
+
+def test_codec_utils__encode_payload__numeric_compact_args_struct_packed():
+    """
+    Make sure args that are all required bools, ints and floats are sent as
+    a struct packed record, and return args are compacted too.
+    """
+    schemas = codec_utils.get_compact_schemas({
+        'connection_type': 'replyer',
+        'optional_creation_arguments': {'compact_args': True},
+        'required_arguments': {'price': float, 'size': int, 'is_buy': bool},
+        'required_return_arguments': {'filled': int},
+    })
+    to_test = {'args': {'price': 1.5, 'size': 100, 'is_buy': True}, 'workflow_id': 'id'}
+    frames = codec_utils.encode_payload(to_test, 'msgpack', schemas)
+
+    assert msgpack_utils.msg_unpack(frames[0])['args'] == struct.pack('<?dq', True, 1.5, 100)
+    assert codec_utils.decode_payload(frames, 'msgpack', schemas) == to_test
+
+    to_test = {'return_args': {'filled': 100}, 'workflow_id': 'id'}
+    frames = codec_utils.encode_payload(to_test, 'msgpack', schemas)
+    assert codec_utils.decode_payload(frames, 'msgpack', schemas) == to_test
+
+
+def test_codec_utils__decode_payload__args_dicts_left_as_is():
+    """
+    Make sure a connection with compact args still decodes args sent as a dict.
+    """
+    schemas = codec_utils.get_compact_schemas(COMPACT_MODEL)
+    frames = codec_utils.encode_payload(PAYLOAD, 'msgpack')
+    assert codec_utils.decode_payload(frames, 'msgpack', schemas) == PAYLOAD
+
+
+def test_codec_utils__get_compact_schemas__type_keys_raise():
+    """
+    Make sure args without a name for each arg can't be compacted.
+    """
+    with pytest.raises(ValueError):
+        codec_utils.get_compact_schemas({
+            'connection_type': 'publisher',
+            'optional_creation_arguments': {'compact_args': True},
+            'required_arguments': {str: int},
+        })
+
+
+COMPACT_MODEL = {
+    'connection_type': 'publisher',
+    'optional_creation_arguments': {'compact_args': True},
+    'required_arguments': {'symbol': str, 'price': float},
+    'optional_arguments': {'size': int, 'venue': str},
+}
+PAYLOAD = {
+    'args': {'name': 'test', 'values': [1, 2.5, None]},
+    'workflow_id': 'id',
+    'deadline': 1700000000.5,
+}
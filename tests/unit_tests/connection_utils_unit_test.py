@@ -259,3 +259,49 @@ def test_connection_utils__validate_connection_model__error_thrown_on_illegal_ar
 
     with pytest.raises(ValueError):
         connection_utils.validate_connection_model(model)
+
+
+def test_connection_utils__get_polling_options__defaults_used():
+    """
+    Make sure the default polling options are used when none are provided.
+    """
+    assert connection_utils.get_polling_options({}) == connection_utils.POLLING_OPTION_DEFAULTS
+
+
+@pytest.mark.parametrize('polling_option', [
+    {'weight': 0.0},
+    {'weight': -1.0},
+    {'max_messages_per_poll': 0},
+    {'max_queue_size': -1},
+    {'overflow_policy': 'explode'},
+])
+def test_connection_utils__get_polling_options__invalid_options_raise(polling_option):
+    """
+    Make sure invalid options (ex. ones that would stop a socket from ever
+    being read) are rejected.
+    """
+    with pytest.raises(ValueError):
+        connection_utils.get_polling_options({'optional_creation_arguments': polling_option})
+
+
+def test_connection_utils__get_batch_options__no_batch_function_by_default():
+    """
+    Make sure connections aren't batched unless given a batch connection function.
+    """
+    assert connection_utils.get_batch_options({}) == {
+        'batch_model_function': None,
+        'max_batch_size': 64,
+        'max_batch_wait_us': 0,
+    }
+
+
+@pytest.mark.parametrize('batch_option', [
+    {'max_batch_size': 0},
+    {'max_batch_wait_us': -1},
+])
+def test_connection_utils__get_batch_options__invalid_options_raise(batch_option):
+    """
+    Make sure batches that could never be handled are rejected.
+    """
+    with pytest.raises(ValueError):
+        connection_utils.get_batch_options({'optional_creation_arguments': batch_option})
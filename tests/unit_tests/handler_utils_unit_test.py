@@ -0,0 +1,245 @@
+""" File to test the handler utils """
+
+import time
+import pytest
+from service_framework.utils import handler_utils, ingress_utils, logging_utils, service_utils
+
+
+def get_item(with_return=True, connection_function=None):
+    """
+    Get a polling list item that records every hook called.
+    return::({}, [str]) The item and the names of the hooks called
+    """
+    called = []
+
+    def model_function(args, to_send, config):
+        called.append('model_function')
+        return {'echoed': args['to_echo']}
+
+    item = {
+        'args_validator': lambda args: called.append('args_validator'),
+        'connection_function': connection_function,
+        'model_function': model_function,
+        'return_validator': lambda return_args: called.append('return_validator'),
+        'return_function': lambda payload: called.append(('return_function', payload)),
+    }
+
+    if not with_return:
+        item['return_validator'] = None
+        item['return_function'] = None
+
+    return item, called
+
+
+@pytest.mark.parametrize('with_return, connection_function, handler_class', [
+    (True, None, handler_utils.ReplyHandler),
+    (False, None, handler_utils.ModelHandler),
+    (True, lambda args: args, handler_utils.GenericHandler),
+])
+def test_handler_utils__get_handler__fast_path_picked_for_present_hooks(
+        with_return,
+        connection_function,
+        handler_class):
+    """
+    Make sure the handler made for the present hooks is picked.
+    """
+    item, _ = get_item(with_return, connection_function)
+    assert isinstance(handler_utils.get_handler(item, {}, {}, {}), handler_class)
+
+
+@pytest.mark.parametrize('with_return', [True, False])
+def test_handler_utils__handle__same_hooks_called_as_run_triggered_functions(with_return):
+    """
+    Make sure the fast paths call the same hooks, in the same order, as the
+    regular service loop path.
+    """
+    payload = {'args': {'to_echo': 'hi'}, 'workflow_id': 'workflow_1'}
+
+    item, called = get_item(with_return)
+    service_utils.run_triggered_functions(item, dict(payload), {}, {}, {})
+
+    fast_item, fast_called = get_item(with_return)
+    handler_utils.get_handler(fast_item, {}, {}, {}).handle(dict(payload))
+
+    assert fast_called == called
+
+
+@pytest.mark.parametrize('with_return_validator, connection_function', [
+    (True, lambda args: dict(args, to_echo='changed')),
+    (False, None),
+])
+def test_handler_utils__generic_handler__same_hooks_called_as_run_triggered_functions(
+        with_return_validator,
+        connection_function):
+    """
+    Make sure the generic handler calls the same hooks, in the same order,
+    as the regular service loop path, whatever hooks are missing.
+    """
+    payload = {'args': {'to_echo': 'hi'}, 'workflow_id': 'workflow_1'}
+
+    item, called = get_item(True, connection_function)
+    if not with_return_validator:
+        item['return_validator'] = None
+    service_utils.run_triggered_functions(item, dict(payload), {}, {}, {})
+
+    generic_item, generic_called = get_item(True, connection_function)
+    if not with_return_validator:
+        generic_item['return_validator'] = None
+    handler = handler_utils.get_handler(generic_item, {}, {}, {})
+    handler.handle(dict(payload))
+
+    assert isinstance(handler, handler_utils.GenericHandler)
+    assert generic_called == called
+
+
+def test_handler_utils__base_handler__can_not_be_instantiated():
+    """
+    Make sure every handler has to implement "get_return_payload".
+    """
+    item, _ = get_item()
+
+    with pytest.raises(TypeError):
+        handler_utils.BaseHandler(item, {}, {}, {})
+
+
+def test_handler_utils__get_return_payload__envelope_kept_for_routed_replies():
+    """
+    Make sure the envelope of a routed request is put on the reply.
+    """
+    item, _ = get_item()
+    handler = handler_utils.get_handler(item, {}, {}, {})
+    payload = {'args': {'to_echo': 'hi'}, 'workflow_id': 'workflow_1', 'envelope': [b'id']}
+
+    assert handler.get_return_payload(payload) == {
+        'return_args': {'echoed': 'hi'},
+        'workflow_id': 'workflow_1',
+        'envelope': [b'id'],
+    }
+
+
+@pytest.mark.parametrize('with_return, connection_function', [
+    (True, None),
+    (False, None),
+    (True, lambda args: args),
+])
+def test_handler_utils__handle__expired_payloads_not_handled(with_return, connection_function):
+    """
+    Make sure a payload past its deadline is dropped (with a timeout reply
+    if the connection replies) instead of being handled.
+    """
+    item, called = get_item(with_return, connection_function)
+    item['connection_name'] = 'expired'
+    ingress_utils.reset_shed_message_counts()
+    payload = {'args': {'to_echo': 'hi'}, 'workflow_id': 'workflow_1', 'deadline': time.time() - 1}
+
+    handler_utils.get_handler(item, {}, {}, {}).handle(payload)
+
+    expected = [('return_function', {
+        'error': ingress_utils.DEADLINE_EXCEEDED_ERROR,
+        'workflow_id': 'workflow_1',
+    })]
+    assert called == (expected if with_return else [])
+    assert ingress_utils.get_shed_message_counts() == {'expired': 1}
+
+
+@pytest.mark.parametrize('with_return, connection_function', [
+    (True, None),
+    (False, None),
+    (True, lambda args: args),
+])
+def test_handler_utils__handle__workflow_id_restored_if_model_function_raises(
+        with_return,
+        connection_function):
+    """
+    Make sure a failed message doesn't leave its workflow id on the logs
+    of whatever the thread handles next.
+    """
+    def model_function(args, to_send, config):
+        raise RuntimeError('Model function failed!')
+
+    item, _ = get_item(with_return, connection_function)
+    item['model_function'] = model_function
+    handler = handler_utils.get_handler(item, {}, {}, {})
+    payload = {'args': {'to_echo': 'hi'}, 'workflow_id': 'failed_workflow'}
+    workflow_id = logging_utils.WORKFLOW_ID.get()
+
+    with pytest.raises(RuntimeError):
+        handler.handle(dict(payload))
+    assert logging_utils.WORKFLOW_ID.get() == workflow_id
+
+    with pytest.raises(RuntimeError):
+        service_utils.run_triggered_functions(item, dict(payload), {}, {}, {})
+    assert logging_utils.WORKFLOW_ID.get() == workflow_id
+
+
+def get_batch_item(with_return=True, max_batch_size=3, max_batch_wait_us=0):
+    """
+    Get a polling list item with a batch model function recording each batch.
+    return::({}, [[{}]], [{}]) The item, the args list of each call and the replies
+    """
+    batches = []
+    replies = []
+
+    def batch_model_function(args_list, to_send, config):
+        batches.append(args_list)
+        return [{'echoed': args['to_echo']} for args in args_list]
+
+    item = {
+        'args_validator': lambda args: None,
+        'model_function': None,
+        'batch_model_function': batch_model_function,
+        'max_batch_size': max_batch_size,
+        'max_batch_wait_us': max_batch_wait_us,
+        'return_validator': lambda return_args: None,
+        'return_function': replies.append if with_return else None,
+    }
+    return item, batches, replies
+
+
+def test_handler_utils__batch_handler__full_batches_split_into_replies():
+    """
+    Make sure a full batch is handled with one call, and each message gets its own reply.
+    """
+    item, batches, replies = get_batch_item()
+    handler = handler_utils.get_handler(item, {}, {}, {})
+    assert isinstance(handler, handler_utils.BatchHandler)
+
+    for idx in range(4):
+        handler.handle({'args': {'to_echo': str(idx)}, 'workflow_id': idx, 'envelope': [b'id']})
+
+    assert batches == [[{'to_echo': '0'}, {'to_echo': '1'}, {'to_echo': '2'}]]
+    assert replies == [
+        {'return_args': {'echoed': str(idx)}, 'workflow_id': idx, 'envelope': [b'id']}
+        for idx in range(3)
+    ]
+    assert handler.pop_batch() == [
+        {'args': {'to_echo': '3'}, 'workflow_id': 3, 'envelope': [b'id']}
+    ]
+
+
+def test_handler_utils__batch_handler__partial_batch_due_after_max_wait():
+    """
+    Make sure a partial batch is only handed out once its first message waited long enough.
+    """
+    item, _, _ = get_batch_item(max_batch_wait_us=50000)
+    handler = handler_utils.get_handler(item, {}, {}, {})
+    handler.handle({'args': {'to_echo': 'hi'}, 'workflow_id': 1})
+    start_time = handler.batch_start_time
+
+    assert handler.pop_due_batch(start_time + 0.01) is None
+    assert 39 <= handler_utils.get_batch_timeout_ms([handler], 100, start_time + 0.01) <= 40
+    assert handler.pop_due_batch(start_time + 0.05) == [{'args': {'to_echo': 'hi'}, 'workflow_id': 1}]
+    assert handler_utils.get_batch_timeout_ms([handler], 100, start_time + 0.05) == 100
+
+
+def test_handler_utils__batch_handler__wrong_number_of_return_args_raise():
+    """
+    Make sure a batch reply that can't be split back into one reply per request raises.
+    """
+    item, _, _ = get_batch_item(max_batch_size=2)
+    item['batch_model_function'] = lambda args_list, to_send, config: [{'echoed': 'one'}]
+    handler = handler_utils.get_handler(item, {}, {}, {})
+    handler.handle({'args': {'to_echo': '0'}, 'workflow_id': 0})
+
+    with pytest.raises(ValueError):
+        handler.handle({'args': {'to_echo': '1'}, 'workflow_id': 1})
@@ -0,0 +1,275 @@
+""" File to test the logging utils """
+
+from types import SimpleNamespace
+import json
+import logging
+import os
+import threading
+import time
+import msgpack
+import pytest
+from service_framework.utils import logging_utils, service_utils
+
+
+def test_logging_utils__set_new_workflow_id_on_logger__workflow_id_is_per_thread():
+    """
+    Make sure each thread logs its own workflow id and the package
+    logger's handlers aren't rebuilt.
+    """
+    logging_utils.setup_package_logger()
+    handlers = list(logging_utils.get_logger().handlers)
+    workflow_id_filter = logging_utils.WorkflowIdFilter()
+    barrier = threading.Barrier(4)
+    logged_workflow_ids = {}
+
+    def set_and_log_workflow_id(idx):
+        logging_utils.set_new_workflow_id_on_logger(f'workflow_{idx}', {})
+        barrier.wait()
+        record = logging.LogRecord('test', logging.INFO, __file__, 0, 'msg', None, None)
+        workflow_id_filter.filter(record)
+        logged_workflow_ids[idx] = record.workflow_id
+
+    threads = [threading.Thread(target=set_and_log_workflow_id, args=(idx,)) for idx in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert logged_workflow_ids == {idx: f'workflow_{idx}' for idx in range(4)}
+    assert logging_utils.get_logger().handlers == handlers
+
+
+def test_logging_utils__reset_workflow_id_on_logger__to_send_restores_handled_id():
+    """
+    Make sure the workflow id is the sent message's while a to_send is in
+    flight, and goes back to the handled message's once it returns (or raises).
+    """
+    sent_workflow_ids = []
+
+    def send(payload):
+        sent_workflow_ids.append((payload['workflow_id'], logging_utils.WORKFLOW_ID.get()))
+        return {'error': 'Failed!'} if payload['args'].get('fail') else {'return_args': {}}
+
+    out_connection = SimpleNamespace(
+        args_validator=lambda args: None,
+        return_validator=lambda return_args: None,
+        send=send
+    )
+    to_send = service_utils.setup_to_send({'out': {'out': out_connection}}, {}, 'handled')
+    token = logging_utils.set_new_workflow_id_on_logger('handled', {})
+
+    to_send('out', {})
+    assert logging_utils.WORKFLOW_ID.get() == 'handled'
+
+    with pytest.raises(RuntimeError):
+        to_send('out', {'fail': True})
+    assert logging_utils.WORKFLOW_ID.get() == 'handled'
+
+    logging_utils.reset_workflow_id_on_logger(token)
+    assert logging_utils.WORKFLOW_ID.get() is None
+    assert sent_workflow_ids == [('handled', 'handled'), ('handled_1', 'handled_1')]
+
+
+def test_logging_utils__setup_package_logger__async_logging_writes_on_listener_thread(tmp_path):
+    """
+    Make sure async logging writes each record (with the workflow id of the
+    thread that logged it) from the listener's thread.
+    """
+    log_path = str(tmp_path / 'service.log')
+    logger = logging_utils.reset_package_logger(
+        console_loglevel=None,
+        log_path=log_path,
+        async_logging=True
+    )
+    token = logging_utils.set_new_workflow_id_on_logger('async_workflow', {})
+
+    logger.info('Logged asynchronously')
+    logging_utils.reset_workflow_id_on_logger(token)
+    logging_utils.reset_package_logger()
+
+    with open(log_path) as log_file:
+        log_lines = log_file.read().splitlines()
+
+    assert len(log_lines) == 1
+    assert ' - async_workflow - INFO - Logged asynchronously' in log_lines[0]
+
+
+def test_logging_utils__dropping_queue_handler__full_queue_drops_and_reports():
+    """
+    Make sure records are dropped (and counted) instead of blocking once the
+    queue is full, and the number dropped is logged once there's room.
+    """
+    written_messages = []
+    is_writing = threading.Event()
+    can_write = threading.Event()
+
+    class BlockingHandler(logging.Handler):
+        def emit(self, record):
+            is_writing.set()
+            can_write.wait()
+            written_messages.append(record.getMessage())
+
+    handler = logging_utils.DroppingQueueHandler(
+        logging_utils.queue.Queue(2),
+        [BlockingHandler()]
+    )
+    handler.addFilter(logging_utils.WorkflowIdFilter(name='workflow_id'))
+
+    def log(msg):
+        handler.handle(logging.LogRecord('test', logging.INFO, __file__, 0, msg, None, None))
+
+    log('first')
+    assert is_writing.wait(5)
+    for idx in range(4):
+        log(f'queued_{idx}')
+
+    assert handler.num_dropped == 2
+    can_write.set()
+    handler.listener.queue.join()
+    log('after')
+    handler.close()
+
+    assert written_messages == [
+        'first',
+        'queued_0',
+        'queued_1',
+        'Log queue full, dropped 2 log records!',
+        'after',
+    ]
+
+
+def test_logging_utils__setup_package_logger__level_from_handler_levels(tmp_path):
+    """
+    Make sure the package logger's level is the lowest of its handlers', so
+    debug logs are only built when a handler writes them.
+    """
+    logger = logging_utils.reset_package_logger(console_loglevel='INFO')
+    assert logger.level == logging.INFO
+    assert not logging_utils.DEBUG_ENABLED
+
+    logger = logging_utils.reset_package_logger(
+        console_loglevel='WARNING',
+        log_path=str(tmp_path / 'service.log'),
+        file_loglevel='DEBUG'
+    )
+    assert logger.level == logging.DEBUG
+    assert logging_utils.DEBUG_ENABLED
+
+    logging_utils.reset_package_logger()
+    assert not logging_utils.DEBUG_ENABLED
+
+
+def get_record(msg, level=logging.INFO, lineno=1):
+    """
+    Create a log record from this file at the line number.
+    """
+    return logging.LogRecord('test', level, __file__, lineno, msg, None, None)
+
+
+def test_logging_utils__log_sampling_filter__whole_workflows_sampled():
+    """
+    Make sure 1 in N workflows are logged, with every record of the workflow
+    (and the workflows it sends to) kept together.
+    """
+    log_filter = logging_utils.LogSamplingFilter(workflow_sample_rate=4)
+    sampled_workflows = []
+
+    for idx in range(400):
+        is_kept = []
+        for workflow_id in (f'workflow-{idx}', f'workflow-{idx}_1', f'workflow-{idx}_1_2'):
+            token = logging_utils.WORKFLOW_ID.set(workflow_id)
+            is_kept.append(log_filter.filter(get_record('msg')))
+            logging_utils.WORKFLOW_ID.reset(token)
+
+        assert len(set(is_kept)) == 1
+        sampled_workflows += is_kept[:1] if is_kept[0] else []
+
+    assert 50 <= len(sampled_workflows) <= 150
+    assert log_filter.filter(get_record('no workflow'))
+    assert log_filter.filter(get_record('warning', level=logging.WARNING))
+
+
+def test_logging_utils__log_sampling_filter__call_sites_rate_limited(caplog):
+    """
+    Make sure each call site only logs its burst, then its rate, and the
+    suppressed counts are logged once the summary interval passes.
+    """
+    log_filter = logging_utils.LogSamplingFilter(rate_limit_per_s=5, summary_interval_s=0.5)
+
+    assert [log_filter.filter(get_record('msg', lineno=1)) for _ in range(10)].count(True) == 5
+    assert log_filter.filter(get_record('other site', lineno=2))
+    assert log_filter.filter(get_record('warning', level=logging.WARNING, lineno=1))
+
+    time.sleep(0.6)
+    with caplog.at_level(logging.WARNING, logger=logging_utils.PACKAGE_LOGGER_NAME):
+        assert [log_filter.filter(get_record('msg', lineno=1)) for _ in range(10)].count(True) == 3
+
+    summaries = [record.getMessage() for record in caplog.records if 'Suppressed' in record.getMessage()]
+    assert len(summaries) == 1
+    assert "{}:1': 5".format(__file__) in summaries[0]
+
+
+@pytest.mark.parametrize('async_logging', [False, True])
+def test_logging_utils__setup_package_logger__child_logger_records_sampled(tmp_path, async_logging):
+    """
+    Make sure records of the package's child loggers (ex. a connection's
+    module logger) are sampled, and only take one token whatever the number
+    of handlers writing them.
+    """
+    log_path = str(tmp_path / 'service.log')
+    logging_utils.reset_package_logger(
+        console_loglevel='INFO',
+        log_path=log_path,
+        async_logging=async_logging,
+        log_rate_limit_per_s=2
+    )
+    child_logger = logging.getLogger(logging_utils.PACKAGE_LOGGER_NAME + '.child')
+
+    for idx in range(10):
+        child_logger.info('Child message %s', idx)
+
+    logging_utils.reset_package_logger()
+
+    with open(log_path) as log_file:
+        messages = [line for line in log_file if 'Child message' in line]
+
+    assert len(messages) == 2
+
+
+@pytest.mark.parametrize('log_format', ['json', 'msgpack'])
+def test_logging_utils__setup_package_logger__structured_log_file(tmp_path, log_format):
+    """
+    Make sure each structured record has the service, connection and
+    workflow id of the thread logging, and is buffered until flushed.
+    """
+    log_path = str(tmp_path / 'service.log')
+    logger = logging_utils.reset_package_logger(
+        console_loglevel=None,
+        log_path=log_path,
+        log_format=log_format,
+        service_name='test_service'
+    )
+    token = logging_utils.set_new_workflow_id_on_logger('workflow', {}, 'reply')
+
+    logger.info('Structured %s', 'message')
+    logging_utils.reset_workflow_id_on_logger(token)
+    logger.info('No workflow')
+
+    assert os.path.getsize(log_path) == 0
+    logging_utils.reset_package_logger()
+
+    with open(log_path, 'rb') as log_file:
+        if log_format == 'json':
+            records = [json.loads(line) for line in log_file]
+        else:
+            records = list(msgpack.Unpacker(log_file, raw=False))
+
+    assert [
+        (record['service'], record['connection'], record['workflow_id'], record['message'])
+        for record in records
+    ] == [
+        ('test_service', 'reply', 'workflow', 'Structured message'),
+        ('test_service', None, None, 'No workflow'),
+    ]
+    assert records[0]['level'] == 'INFO'
+    assert records[0]['monotonic'] <= records[1]['monotonic']
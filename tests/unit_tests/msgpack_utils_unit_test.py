@@ -1,9 +1,12 @@
 """ Test the Message Pack Utils """
 
 from decimal import Decimal
+import threading
 from uuid import uuid4
 
+from msgpack import ExtType, packb
 import numpy
+import pytest
 from service_framework.utils import msgpack_utils
 
 
@@ -13,7 +16,7 @@ def test_msgpack_utils__custom_encode__can_encode_decimals():
     """
     to_test = Decimal('123.456')
     encoded = msgpack_utils.custom_encode(to_test)
-    assert encoded == {'__decimal__': True, 'as_str': str(to_test)}
+    assert encoded == ExtType(msgpack_utils.DECIMAL_EXT_CODE, b'123.456')
 
 
 def test_msgpack_utils__custom_encode__can_encode_sets():
@@ -22,7 +25,7 @@ def test_msgpack_utils__custom_encode__can_encode_sets():
     """
     to_test = set(['hi', 'bye'])
     encoded = msgpack_utils.custom_encode(to_test)
-    assert encoded == {'__set__': True, 'value': list(to_test)}
+    assert encoded == ExtType(msgpack_utils.SET_EXT_CODE, msgpack_utils.msg_pack(list(to_test)))
 
 
 def test_msgpack_utils__custom_encode__can_encode_uuids():
@@ -31,7 +34,7 @@ def test_msgpack_utils__custom_encode__can_encode_uuids():
     """
     to_test = uuid4()
     encoded = msgpack_utils.custom_encode(to_test)
-    assert encoded == {'__uuid__': True, 'as_str': str(to_test)}
+    assert encoded == ExtType(msgpack_utils.UUID_EXT_CODE, to_test.bytes)
 
 
 def test_msgpack_utils__custom_encode__can_encode_numpy_ndarray():
@@ -40,7 +43,8 @@ def test_msgpack_utils__custom_encode__can_encode_numpy_ndarray():
     """
     to_test = numpy.ndarray([1, 2, 3, 4, 5])
     encoded = msgpack_utils.custom_encode(to_test)
-    assert encoded == {'__numpy.ndarray__': True, 'as_bytes': to_test.tobytes()}
+    header = packb(['<f8', [1, 2, 3, 4, 5]])
+    assert encoded == ExtType(msgpack_utils.NUMPY_NDARRAY_EXT_CODE, header + to_test.tobytes())
 
 
 def test_msgpack_utils__custom_encode__do_nothing_for_regular_obj():
@@ -141,3 +145,111 @@ def test_msgpack_utils__msg_pack__will_pack_and_unpack_numpy_ndarray():
     encoded = msgpack_utils.msg_pack(to_test)
     decoded = msgpack_utils.msg_unpack(encoded)
     assert to_test == decoded
+
+
+def test_msgpack_utils__msg_pack__will_pack_and_unpack_set_object():
+    """
+    Make sure the function can pack a set object.
+    """
+    to_test = {
+        'regular_key': 'This is a regular obj...',
+        'set_key': {'hi', 'bye', Decimal('1.5')},
+    }
+
+    encoded = msgpack_utils.msg_pack(to_test)
+    decoded = msgpack_utils.msg_unpack(encoded)
+    assert to_test == decoded
+
+
+def test_msgpack_utils__msg_pack__packers_reused_by_each_thread():
+    """
+    Make sure each thread reuses its own packer, and a failed pack doesn't
+    leave anything behind in it.
+    """
+    packers = []
+    thread = threading.Thread(target=lambda: packers.append(msgpack_utils.get_packer()))
+    thread.start()
+    thread.join()
+
+    assert msgpack_utils.get_packer() is msgpack_utils.get_packer()
+    assert packers[0] is not msgpack_utils.get_packer()
+
+    with pytest.raises(TypeError):
+        msgpack_utils.msg_pack({'not_packable': object()})
+
+    assert msgpack_utils.msg_pack({'a': 1}) == packb({'a': 1})
+
+
+def test_msgpack_utils__msg_unpack__maps_decoded_as_is():
+    """
+    Make sure maps that look like the old marker dicts are left alone
+    without legacy unpacking.
+    """
+    to_test = {'__decimal__': True, 'as_str': '1.5'}
+    assert msgpack_utils.msg_unpack(packb(to_test)) == to_test
+
+
+def test_msgpack_utils__set_legacy_unpacking__old_and_new_formats_decoded():
+    """
+    Make sure the old marker dicts and the extension types are both decoded
+    with legacy unpacking.
+    """
+    to_test = uuid4()
+    legacy_encoded = packb({'uuid_key': {'__uuid__': True, 'as_str': str(to_test)}})
+    encoded = msgpack_utils.msg_pack({'uuid_key': to_test})
+
+    msgpack_utils.set_legacy_unpacking(True)
+    try:
+        assert msgpack_utils.msg_unpack(legacy_encoded) == {'uuid_key': to_test}
+        assert msgpack_utils.msg_unpack(encoded) == {'uuid_key': to_test}
+    finally:
+        msgpack_utils.set_legacy_unpacking(False)
+
+
+NUMPY_ARRAYS = {
+    'int16_matrix': numpy.arange(12, dtype='int16').reshape(3, 4),
+    'fortran_order': numpy.asfortranarray(numpy.arange(6, dtype='float32').reshape(2, 3)),
+    'strided': numpy.arange(10)[::3],
+    'empty': numpy.zeros((0, 2), dtype='uint8'),
+    'structured': numpy.array([(1, 2.5, b'ab'), (3, 4.5, b'cd')], dtype=[('i', '<i4'), ('f', '<f8'), ('s', 'S2')]),
+    'nested_padded': numpy.zeros(3, dtype=numpy.dtype({
+        'names': ['pos', 'id'],
+        'formats': [numpy.dtype([('x', '<f4'), ('y', '<f4', (2,))]), '<u2'],
+        'offsets': [0, 16],
+        'itemsize': 24,
+    })),
+}
+
+
+def test_msgpack_utils__msg_pack__numpy_ndarray_dtype_and_shape_kept():
+    """
+    Make sure packed numpy arrays are unpacked with their dtype and shape.
+    """
+    decoded = msgpack_utils.msg_unpack(msgpack_utils.msg_pack(NUMPY_ARRAYS))
+
+    for name, array in NUMPY_ARRAYS.items():
+        assert decoded[name].dtype == array.dtype
+        numpy.testing.assert_array_equal(decoded[name], array)
+
+
+def test_msgpack_utils__msg_pack_frames__numpy_ndarrays_sent_as_frames():
+    """
+    Make sure each array is its own frame, without a copy of contiguous
+    arrays, and is unpacked over the frame's memory.
+    """
+    to_test = {'args': NUMPY_ARRAYS, 'workflow_id': 'id'}
+    frames = msgpack_utils.msg_pack_frames(to_test)
+
+    assert len(frames) == 1 + len(NUMPY_ARRAYS)
+    assert numpy.shares_memory(frames[1], NUMPY_ARRAYS['int16_matrix'])
+    assert numpy.shares_memory(frames[2], NUMPY_ARRAYS['fortran_order'])
+
+    received = [frames[0]] + [bytearray(frame.tobytes()) for frame in frames[1:]]
+    decoded = msgpack_utils.msg_unpack_frames(received)
+
+    assert decoded['workflow_id'] == 'id'
+    for idx, (name, array) in enumerate(NUMPY_ARRAYS.items()):
+        assert decoded['args'][name].dtype == array.dtype
+        numpy.testing.assert_array_equal(decoded['args'][name], array)
+        if array.size:
+            assert numpy.shares_memory(decoded['args'][name], numpy.frombuffer(received[idx + 1], 'uint8'))
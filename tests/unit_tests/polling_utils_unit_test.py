@@ -0,0 +1,95 @@
+""" File to test the polling utils """
+
+import time
+import pytest
+from service_framework.utils import polling_utils
+
+
+def test_polling_utils__get_wait_strategy__spin_never_blocks():
+    """
+    Make sure the spin strategy never blocks in poll.
+    """
+    get_timeout_ms = polling_utils.get_wait_strategy('spin')
+    assert get_timeout_ms(False) == 0
+    assert get_timeout_ms(True) == 0
+
+
+def test_polling_utils__get_wait_strategy__block_always_blocks():
+    """
+    Make sure the block strategy always blocks for the provided timeout.
+    """
+    get_timeout_ms = polling_utils.get_wait_strategy('block', block_timeout_ms=50)
+    assert get_timeout_ms(False) == 50
+    assert get_timeout_ms(True) == 50
+
+
+def test_polling_utils__get_wait_strategy__adaptive_spins_then_blocks():
+    """
+    Make sure the adaptive strategy spins right after traffic and blocks
+    once the service has been idle for the spin time.
+    """
+    get_timeout_ms = polling_utils.get_wait_strategy(
+        'adaptive',
+        block_timeout_ms=50,
+        spin_time_s=0.01
+    )
+    assert get_timeout_ms(False) == 50
+    assert get_timeout_ms(True) == 0
+    assert get_timeout_ms(False) == 0
+
+    time.sleep(0.02)
+    assert get_timeout_ms(False) == 50
+
+
+def test_polling_utils__get_wait_strategy__unknown_strategy_raises():
+    """
+    Make sure an unknown wait strategy isn't silently accepted.
+    """
+    with pytest.raises(ValueError):
+        polling_utils.get_wait_strategy('sleepy')
+
+
+def test_polling_utils__get_priority_sorted_items__higher_priority_first():
+    """
+    Make sure higher priority items come first and equal priorities keep their order.
+    """
+    ready_items = [
+        {'name': 'a'},
+        {'name': 'b', 'priority': 5},
+        {'name': 'c', 'priority': -1},
+        {'name': 'd'},
+    ]
+    sorted_items = polling_utils.get_priority_sorted_items(ready_items)
+    assert [item['name'] for item in sorted_items] == ['b', 'a', 'd', 'c']
+
+
+def test_polling_utils__record_queueing_delay__metrics_kept_per_priority_class():
+    """
+    Make sure the queueing delay metrics are aggregated per priority class.
+    """
+    polling_utils.reset_queueing_delay_metrics()
+    polling_utils.record_queueing_delay(0, 0.25)
+    polling_utils.record_queueing_delay(0, 0.75)
+    polling_utils.record_queueing_delay(2, 0.1)
+
+    metrics = polling_utils.get_queueing_delay_metrics()
+    assert metrics[0] == {'num_messages': 2, 'mean_delay_s': 0.5, 'max_delay_s': 0.75}
+    assert metrics[2]['num_messages'] == 1
+
+    polling_utils.reset_queueing_delay_metrics()
+    assert polling_utils.get_queueing_delay_metrics() == {}
+
+
+def test_polling_utils__get_queueing_delay_metrics_logger__logs_and_resets_when_due():
+    """
+    Make sure the metrics are only logged (and reset) once the interval has passed.
+    """
+    polling_utils.reset_queueing_delay_metrics()
+    polling_utils.record_queueing_delay(0, 0.5)
+    log_queueing_delay_metrics = polling_utils.get_queueing_delay_metrics_logger(log_interval_s=10)
+
+    log_queueing_delay_metrics(time.monotonic())
+    assert polling_utils.get_queueing_delay_metrics()
+
+    log_queueing_delay_metrics(time.monotonic() + 11)
+    assert polling_utils.get_queueing_delay_metrics() == {}
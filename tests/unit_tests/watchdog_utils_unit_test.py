@@ -0,0 +1,78 @@
+""" File to test the service loop's stall detector """
+
+import logging
+import threading
+import time
+import pytest
+from service_framework.utils import watchdog_utils
+
+
+def slow_model_function(stall_detector):
+    """
+    Stand in for a model function that blocks the service loop.
+    """
+    stall_detector.start_handling('slow_connection', 'workflow_1')
+    time.sleep(0.3)
+    stall_detector.finish_handling()
+
+
+def test_watchdog_utils__stall_detector__stack_logged_for_stalled_message(caplog):
+    """
+    Make sure a message handled for longer than the threshold is logged once,
+    with its connection name, workflow id and where the thread is stuck.
+    """
+    caplog.set_level(logging.WARNING)
+    watchdog_utils.reset_iteration_time_histogram()
+    stall_detector = watchdog_utils.StallDetector(0.05)
+    stall_detector.start()
+
+    handling_thread = threading.Thread(target=slow_model_function, args=(stall_detector,))
+    handling_thread.start()
+    handling_thread.join()
+    stall_detector.stop()
+
+    stall_logs = [record.getMessage() for record in caplog.records if 'stalled for' in record.getMessage()]
+    assert len(stall_logs) == 1
+    assert '"slow_connection"' in stall_logs[0]
+    assert '"workflow_1"' in stall_logs[0]
+    assert 'slow_model_function' in stall_logs[0]
+    assert watchdog_utils.get_iteration_time_histogram()['<=0.5s'] == 1
+
+
+def test_watchdog_utils__stall_detector__fast_messages_only_recorded():
+    """
+    Make sure quick messages are recorded in the histogram without being reported.
+    """
+    watchdog_utils.reset_iteration_time_histogram()
+    stall_detector = watchdog_utils.StallDetector(10)
+
+    for idx in range(3):
+        stall_detector.start_handling('fast_connection', idx)
+        stall_detector.finish_handling()
+
+    stall_detector._report_stalls(time.monotonic())
+    assert stall_detector.handling == {}
+    assert sum(watchdog_utils.get_iteration_time_histogram().values()) == 3
+
+
+def test_watchdog_utils__stall_detector__histogram_logged_each_log_interval(caplog):
+    """
+    Make sure a log interval shorter than the threshold isn't stretched to
+    the threshold.
+    """
+    caplog.set_level(logging.INFO)
+    stall_detector = watchdog_utils.StallDetector(10, log_interval_s=0.05)
+    stall_detector.start()
+    time.sleep(0.3)
+    stall_detector.stop()
+
+    histogram_logs = [record for record in caplog.records if 'Iteration times' in record.getMessage()]
+    assert len(histogram_logs) >= 2
+
+
+def test_watchdog_utils__stall_detector__threshold_must_be_positive():
+    """
+    Make sure a threshold that would report every message is rejected.
+    """
+    with pytest.raises(ValueError):
+        watchdog_utils.StallDetector(0)